@@ -0,0 +1,23 @@
+"""HTTP load tests for the lab services.
+
+An asyncio load generator (loadgen.py) drives each target with a fixed
+number of concurrent keep-alive connections for a fixed time and reports
+throughput and latency percentiles as JSON. Run it from the repo root
+against a running lab:
+
+    python -m bench run                          # every read-only target, 16 connections, 10 s each
+    python -m bench run --include-mutating       # plus POST /promote, which copies images into prod
+    python -m bench run chat-ui                  # /api/chat; select the replay provider first
+    python -m bench run hello-app user-api -c 64 -d 30 -o after.json
+    python -m bench mcp -n 500                   # MCP dispatch overhead, in-process
+    python -m bench compare before.json after.json
+
+Each result file records the commit it was measured at (and whether the
+tree was dirty) next to the settings, so two runs can be compared with
+`compare` across commits. Targets and their default URLs are in
+targets.py; the BENCH_*_URL environment variables point them elsewhere.
+
+`mcp` needs no running lab: it boots the MCP servers in-process with
+their backends stubbed out (mcp_dispatch.py), so it runs with just
+mcp-server's requirements installed.
+"""
@@ -0,0 +1,145 @@
+"""python -m bench run [TARGET ...] | mcp [SERVER ...] | compare OLD NEW"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+from . import loadgen, mcp_dispatch
+from .targets import all_targets
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _git(*args: str) -> str | None:
+    try:
+        out = subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def environment() -> dict:
+    """Where and at which commit the numbers were taken."""
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+async def _run(args) -> dict:
+    targets = all_targets()
+    names = args.targets or [
+        n for n, t in targets.items() if not t.opt_in and (args.include_mutating or not t.mutating)
+    ]
+    unknown = [n for n in names if n not in targets]
+    if unknown:
+        sys.exit(f"unknown target(s): {', '.join(unknown)}; choose from {', '.join(targets)}")
+    mutating = [n for n in names if targets[n].mutating]
+    if mutating and not args.include_mutating:
+        sys.exit(f"{', '.join(mutating)}: changes lab state on every request; pass --include-mutating to load them")
+
+    results = []
+    for name in names:
+        print(f"{name}: {args.concurrency} connections for {args.duration:g}s …", file=sys.stderr)
+        result = await loadgen.run(targets[name], args.concurrency, args.duration, args.warmup)
+        lat = result["latency_ms"]
+        print(f"  {result['rps']} req/s  p50 {lat['p50']} ms  p95 {lat['p95']} ms  p99 {lat['p99']} ms"
+              f"  status {result['status']}  errors {result['errors']}", file=sys.stderr)
+        results.append(result)
+    return {
+        "environment": environment(),
+        "settings": {"concurrency": args.concurrency, "duration_s": args.duration, "warmup_s": args.warmup},
+        "results": results,
+    }
+
+
+async def _mcp(args) -> dict:
+    names = args.servers or list(mcp_dispatch.SERVERS)
+    unknown = [n for n in names if n not in mcp_dispatch.SERVERS]
+    if unknown:
+        sys.exit(f"unknown server(s): {', '.join(unknown)}; choose from {', '.join(mcp_dispatch.SERVERS)}")
+    results = await mcp_dispatch.run(names, args.iterations, args.cassette, args.latency)
+    for result in results:
+        lat, alloc = result["latency_ms"], result["alloc"]
+        print(f"{result['target']:<28} p50 {lat['p50']:>8} ms  p99 {lat['p99']:>8} ms"
+              f"  peak {alloc['peak_kib_per_call']:>8} KiB  held {alloc['retained_bytes_per_call']:>6} B", file=sys.stderr)
+    return {
+        "environment": environment(),
+        "settings": {"iterations": args.iterations, "cassette": args.cassette, "latency": args.latency},
+        "results": results,
+    }
+
+
+def _delta(old, new) -> str:
+    if old is None or new is None:
+        return f"{old} → {new}"
+    change = f" ({(new - old) / old * 100:+.1f}%)" if old else ""
+    return f"{old} → {new}{change}"
+
+
+def compare(old: dict, new: dict) -> str:
+    lines = [f"{(old['environment']['commit'] or '?')[:12]} → {(new['environment']['commit'] or '?')[:12]}"]
+    if old["settings"] != new["settings"]:
+        lines.append(f"warning: settings differ: {old['settings']} vs {new['settings']}")
+    before = {r["target"]: r for r in old["results"]}
+    for r in new["results"]:
+        o = before.get(r["target"])
+        if o is None:
+            lines.append(f"{r['target']}: only in the new run")
+            continue
+        lines.append(f"{r['target']}:")
+        lines.append(f"  rps  {_delta(o['rps'], r['rps'])}")
+        for p in ("p50", "p95", "p99"):
+            lines.append(f"  {p}  {_delta(o['latency_ms'][p], r['latency_ms'][p])} ms")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__)
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="load the targets and print (or write) the results as JSON")
+    run.add_argument("targets", nargs="*",
+                     help=f"default: the read-only ones of {', '.join(all_targets())}, "
+                          "except chat-ui (select the replay provider first)")
+    run.add_argument("--include-mutating", action="store_true",
+                     help="also load targets that change lab state (promotion-service promotes dev → prod)")
+    run.add_argument("-c", "--concurrency", type=int, default=16)
+    run.add_argument("-d", "--duration", type=float, default=10.0, help="seconds measured per target")
+    run.add_argument("--warmup", type=float, default=2.0, help="seconds per target before measuring")
+    run.add_argument("-o", "--out", help="write the JSON here instead of stdout")
+    mcp = sub.add_parser("mcp", help="time MCP dispatch per phase against in-process servers")
+    mcp.add_argument("servers", nargs="*", help=f"default: all of {', '.join(mcp_dispatch.SERVERS)}")
+    mcp.add_argument("-n", "--iterations", type=int, default=200, help="calls per phase")
+    mcp.add_argument("--cassette", help="replay upstream responses recorded with CASSETTE_MODE=record")
+    mcp.add_argument("--latency", default="", help='with --cassette: "recorded", or milliseconds per upstream call')
+    mcp.add_argument("-o", "--out", help="write the JSON here instead of stdout")
+    cmp = sub.add_parser("compare", help="compare two result files")
+    cmp.add_argument("old")
+    cmp.add_argument("new")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.old) as f, open(args.new) as g:
+            print(compare(json.load(f), json.load(g)))
+        return
+
+    report = asyncio.run(_run(args) if args.command == "run" else _mcp(args))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
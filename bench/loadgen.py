@@ -0,0 +1,98 @@
+"""Closed-loop HTTP load generator.
+
+`concurrency` workers share one connection pool of the same size; each
+sends its next request as soon as the previous one is answered. Requests
+started during the warmup are sent but not recorded, so connection setup
+and cold caches don't skew the numbers.
+"""
+
+import asyncio
+import math
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+import httpx
+
+
+@dataclass
+class Target:
+    name: str
+    method: str
+    url: str
+    json: dict | None = None
+    headers: dict[str, str] = field(default_factory=dict)
+    # Changes lab state on every request; only run with --include-mutating.
+    mutating: bool = False
+    # Left out of the default set; runs only when named.
+    opt_in: bool = False
+
+
+def percentile(sorted_values: list[float], pct: float) -> float | None:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(target: Target, concurrency: int, latencies: list[float],
+              statuses: Counter, errors: Counter, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    ms = lambda s: None if s is None else round(s * 1000, 3)  # noqa: E731
+    completed = len(latencies)
+    return {
+        "target": target.name,
+        "method": target.method,
+        "url": target.url,
+        "concurrency": concurrency,
+        "requests": completed,
+        "duration_s": round(elapsed, 3),
+        "rps": round(completed / elapsed, 1) if elapsed > 0 else 0.0,
+        "status": {str(k): v for k, v in sorted(statuses.items())},
+        "errors": dict(errors),
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "mean": ms(sum(latencies) / completed) if completed else None,
+            "max": ms(latencies[-1]) if latencies else None,
+        },
+    }
+
+
+async def run(target: Target, concurrency: int = 16, duration: float = 10.0,
+              warmup: float = 2.0, timeout: float = 30.0) -> dict:
+    """Load `target` and return its summary (see summarize)."""
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    errors: Counter = Counter()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        measure_from = time.perf_counter() + warmup
+        stop_at = measure_from + duration
+        last_done = measure_from
+
+        async def worker() -> None:
+            nonlocal last_done
+            while (start := time.perf_counter()) < stop_at:
+                status = None
+                try:
+                    resp = await client.request(target.method, target.url, json=target.json, headers=target.headers)
+                    status = resp.status_code
+                except httpx.HTTPError as e:
+                    error = type(e).__name__
+                done = time.perf_counter()
+                if start < measure_from:
+                    continue
+                last_done = max(last_done, done)
+                if status is None:
+                    errors[error] += 1
+                else:
+                    statuses[status] += 1
+                    latencies.append(done - start)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    return summarize(target, concurrency, latencies, statuses, errors, last_done - measure_from)
@@ -0,0 +1,215 @@
+"""Per-call overhead of the MCP layer, without the network or the backends.
+
+Each MCP server (server_user, server_gitea, …) is booted in-process: its
+streamable-HTTP ASGI app is driven through httpx.ASGITransport by
+chat-ui's own mcp_client._mcp_request, exactly as chat-ui calls it, and
+every upstream HTTP call the tools make (user-api, Gitea, the registries,
+promotion-service) is answered by a canned in-memory stub. What is left
+is FastMCP's dispatch: JSON-RPC parsing, the per-request stateless
+session, tool lookup and argument validation, result serialisation and
+SSE framing.
+
+Per server it times these phases, each `iterations` times:
+
+  initialize   the handshake
+  tools/list   schema serialisation for every tool
+  tools/call   one cheap read-only tool, against the stub
+  sse_parse    chat-ui parsing the framed tools/list response (no server)
+
+and then repeats them under tracemalloc to report, per call, the peak
+memory allocated while it ran and what was still held afterwards.
+
+With a cassette (mcp-server's CASSETTE_MODE=record output) the upstream
+answers are the recorded ones instead of the canned stub, optionally with
+their recorded latency.
+"""
+
+import importlib
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import httpx
+
+from .loadgen import percentile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (os.path.join(REPO_ROOT, "mcp-server"), os.path.join(REPO_ROOT, "chat-ui")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# server module -> (tool, arguments) for the tools/call phase; None to skip it
+SERVERS = {
+    "server_user": ("list_users", {}),
+    "server_gitea": ("list_gitea_repos", {}),
+    "server_registry": ("list_image_tags", {"image_name": "hello-app"}),
+    "server_promotion": ("list_promotions", {}),
+    "server_runner": None,  # every runner tool drives the container engine
+}
+
+_USERS = [
+    {"id": i, "username": name, "email": f"{name}@example.com", "full_name": name.title(),
+     "role": "admin" if i < 3 else "developer", "is_active": True, "created_at": "2026-01-01T00:00:00"}
+    for i, name in enumerate(["admin", "alice", "bob", "carol", "dave", "eve"], 1)
+]
+
+
+def _upstream(request: httpx.Request) -> httpx.Response:
+    """Canned answers for everything the tools' clients may ask for."""
+    path = request.url.path
+    if path == "/users":
+        return httpx.Response(200, json=_USERS)
+    if path == "/api/v1/repos/search":
+        return httpx.Response(200, json={"ok": True, "data": [
+            {"id": 1, "name": "sample-app", "full_name": "mcpadmin/sample-app", "default_branch": "main"},
+        ]})
+    if path == "/v2/_catalog":
+        return httpx.Response(200, json={"repositories": ["hello-app"]})
+    if path.endswith("/tags/list"):
+        return httpx.Response(200, json={"name": "hello-app", "tags": ["latest", "v1", "v2"]})
+    if path == "/promotions":
+        return httpx.Response(200, json=[])
+    return httpx.Response(404, json={"detail": f"no stub for {path}"})
+
+
+def _stub_upstream() -> None:
+    real_client = httpx.AsyncClient
+
+    class StubbedClient(real_client):
+        def __init__(self, *args, **kwargs):
+            kwargs.setdefault("transport", httpx.MockTransport(_upstream))
+            super().__init__(*args, **kwargs)
+
+    httpx.AsyncClient = StubbedClient
+
+
+def _summary(name: str, url: str, seconds: list[float], peaks: list[int], retained: float) -> dict:
+    seconds = sorted(seconds)
+    ms = lambda s: round(s * 1000, 4)  # noqa: E731
+    total = sum(seconds)
+    return {
+        "target": name,
+        "method": "POST",
+        "url": url,
+        "concurrency": 1,
+        "requests": len(seconds),
+        "duration_s": round(total, 3),
+        "rps": round(len(seconds) / total, 1) if total else 0.0,
+        "latency_ms": {
+            "p50": ms(percentile(seconds, 50)),
+            "p95": ms(percentile(seconds, 95)),
+            "p99": ms(percentile(seconds, 99)),
+            "mean": ms(total / len(seconds)),
+            "max": ms(seconds[-1]),
+        },
+        "alloc": {
+            "peak_kib_per_call": round(statistics.mean(peaks) / 1024, 2),
+            "retained_bytes_per_call": round(retained),
+        },
+    }
+
+
+async def _bench_server(module_name: str, iterations: int) -> list[dict]:
+    from app import mcp_client
+
+    module = importlib.import_module(f"mcp_server.{module_name}")
+    mcp = module.mcp
+    # FastMCP logs every request at INFO; that would be most of what we time.
+    for name in ("mcp", "httpx"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    app = mcp.streamable_http_app()
+    server_url = f"http://{mcp.name}"
+    call = SERVERS[module_name]
+
+    phases = {
+        "initialize": ("initialize", {
+            "protocolVersion": "2024-11-05",
+            "capabilities": {},
+            "clientInfo": {"name": "mcp-lab-bench", "version": "1.0.0"},
+        }),
+        "tools/list": ("tools/list", {}),
+    }
+    if call is not None:
+        phases["tools/call"] = ("tools/call", {"name": call[0], "arguments": call[1]})
+
+    results = []
+    async with mcp.session_manager.run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=server_url) as client:
+
+            async def once(method: str, params: dict) -> dict:
+                data = await mcp_client._mcp_request(server_url, method, params, client=client)
+                if "error" in data or data.get("result", {}).get("isError"):
+                    raise RuntimeError(f"{mcp.name} {method} failed: {json.dumps(data)[:300]}")
+                return data
+
+            for phase, (method, params) in phases.items():
+                for _ in range(max(3, iterations // 10)):  # warm up
+                    await once(method, params)
+                seconds = []
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    await once(method, params)
+                    seconds.append(time.perf_counter() - start)
+                peaks, retained = await _allocations(lambda: once(method, params), iterations)
+                results.append(_summary(f"{mcp.name} {phase}", f"{server_url}/mcp", seconds, peaks, retained))
+
+            # The client half of SSE framing, on a captured tools/list reply.
+            resp = await client.post(
+                f"{server_url}/mcp",
+                json={"jsonrpc": "2.0", "id": 1, "method": "tools/list", "params": {}},
+                headers=mcp_client.HEADERS,
+            )
+            seconds = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                mcp_client._parse_response(resp)
+                seconds.append(time.perf_counter() - start)
+
+            async def parse():
+                mcp_client._parse_response(resp)
+
+            peaks, retained = await _allocations(parse, iterations)
+            results.append(_summary(f"{mcp.name} sse_parse", f"{server_url}/mcp", seconds, peaks, retained))
+    return results
+
+
+async def _allocations(call, iterations: int) -> tuple[list[int], float]:
+    """Peak bytes allocated during each call, and bytes still held per call
+    after all of them."""
+    tracemalloc.start()
+    try:
+        peaks = []
+        base = tracemalloc.get_traced_memory()[0]
+        for _ in range(iterations):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            await call()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        retained = (tracemalloc.get_traced_memory()[0] - base) / iterations
+    finally:
+        tracemalloc.stop()
+    return peaks, retained
+
+
+def _replay(path: str, latency: str) -> None:
+    from mcp_server import config
+
+    config.CASSETTE_MODE = "replay"
+    config.CASSETTE_PATH = path
+    config.CASSETTE_LATENCY = latency
+
+
+async def run(servers: list[str], iterations: int, cassette: str | None = None,
+              latency: str = "") -> list[dict]:
+    if cassette:
+        _replay(cassette, latency)
+    else:
+        _stub_upstream()
+    results = []
+    for name in servers:
+        results.extend(await _bench_server(name, iterations))
+    return results
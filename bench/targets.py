@@ -0,0 +1,54 @@
+"""What `python -m bench run` can load, at the host ports docker-compose
+publishes. Override a service's base URL with its BENCH_*_URL variable.
+"""
+
+import os
+
+from .loadgen import Target
+
+MCP_HEADERS = {"Content-Type": "application/json", "Accept": "application/json, text/event-stream"}
+
+# The MCP servers run stateless, so tools/list needs no initialize first.
+MCP_SERVERS = {
+    "mcp-user": ("BENCH_MCP_USER_URL", "http://localhost:8003"),
+    "mcp-gitea": ("BENCH_MCP_GITEA_URL", "http://localhost:8004"),
+    "mcp-registry": ("BENCH_MCP_REGISTRY_URL", "http://localhost:8005"),
+    "mcp-promotion": ("BENCH_MCP_PROMOTION_URL", "http://localhost:8006"),
+    "mcp-runner": ("BENCH_MCP_RUNNER_URL", "http://localhost:8007"),
+}
+
+
+def _url(var: str, default: str) -> str:
+    return os.environ.get(var, default).rstrip("/")
+
+
+def all_targets() -> dict[str, Target]:
+    targets = [
+        Target("hello-app", "GET", f"{_url('BENCH_HELLO_APP_URL', 'http://localhost:9080')}/"),
+        Target("user-api", "GET", f"{_url('BENCH_USER_API_URL', 'http://localhost:8001')}/users"),
+        # Every call records a promotion and copies the image dev → prod.
+        Target(
+            "promotion-service", "POST", f"{_url('BENCH_PROMOTION_URL', 'http://localhost:8002')}/promote",
+            json={
+                "image_name": os.environ.get("BENCH_PROMOTE_IMAGE", "hello-app"),
+                "tag": os.environ.get("BENCH_PROMOTE_TAG", "latest"),
+                "promoted_by": "admin",
+            },
+            mutating=True,
+        ),
+        # The full turn minus the model, but only with the replay provider
+        # selected (POST /api/provider {"provider": "replay"}); otherwise it
+        # loads the live model. So it only runs when named.
+        Target(
+            "chat-ui", "POST", f"{_url('BENCH_CHAT_URL', 'http://localhost:3001')}/api/chat",
+            json={"message": os.environ.get("BENCH_CHAT_MESSAGE", "Who are the users?"), "history": []},
+            opt_in=True,
+        ),
+    ]
+    for name, (var, default) in MCP_SERVERS.items():
+        targets.append(Target(
+            name, "POST", f"{_url(var, default)}/mcp",
+            json={"jsonrpc": "2.0", "id": 1, "method": "tools/list", "params": {}},
+            headers=MCP_HEADERS,
+        ))
+    return {t.name: t for t in targets}
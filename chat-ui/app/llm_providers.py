@@ -1,6 +1,12 @@
+import asyncio
 import json
+import os
+import random
+import re
+import time
 import httpx
 from abc import ABC, abstractmethod
+from functools import lru_cache
 from .mcp_client import (
     mcp_tools_to_openai_format,
     mcp_tools_to_anthropic_format,
@@ -291,9 +297,223 @@ class GoogleProvider(LLMProvider):
         }
 
 
+# Served when neither the model field nor REPLAY_SCRIPT names a script file.
+# Names in the model field are files under REPLAY_SCRIPTS_DIR (default
+# $CHAT_DATA_DIR/replay); LLM_RECORD_TO should point there to replay them.
+# A script is a list of turns; the first turn whose `match` regex finds the
+# latest user message is played (a turn without `match` matches anything).
+# Each step is one model round trip: either tool calls, which are really
+# made through the MCP servers, or the final reply. `{results}` in a reply
+# expands to the tool results so the verify heuristics have something to
+# check. `latency_ms` and `tokens` are per round trip, at script or turn
+# level: a number, {"mean": .., "stddev": ..} (normal, floored at 0) or
+# "auto" (estimated from the text, about 4 characters a token).
+DEFAULT_REPLAY_SCRIPT = {
+    "latency_ms": 0,
+    "tokens": {"input": "auto", "output": "auto"},
+    "turns": [
+        {"match": r"\buser", "steps": [
+            {"tool_calls": [{"name": "list_users", "arguments": {}}]},
+            {"reply": "Here are the users:\n{results}"},
+        ]},
+        {"match": r"\brepo", "steps": [
+            {"tool_calls": [{"name": "list_gitea_repos", "arguments": {}}]},
+            {"reply": "These repositories are in Gitea:\n{results}"},
+        ]},
+        {"match": r"\b(image|registr)", "steps": [
+            {"tool_calls": [{"name": "list_registry_images", "arguments": {}}]},
+            {"reply": "The registries hold:\n{results}"},
+        ]},
+        {"steps": [{"reply": "This is a scripted reply from the replay provider."}]},
+    ],
+}
+
+
+@lru_cache(maxsize=8)
+def _load_replay_script(path: str, mtime: float) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _replay_scripts_dir() -> str:
+    return os.environ.get("REPLAY_SCRIPTS_DIR") or os.path.join(os.environ.get("CHAT_DATA_DIR", "/app/data"), "replay")
+
+
+def _replay_script_path(name: str) -> str:
+    """The file for script `name`, which must resolve inside REPLAY_SCRIPTS_DIR.
+
+    `name` comes from the request's model field, so it is never trusted as
+    a path on its own; REPLAY_SCRIPT is operator-set and used as given.
+    """
+    if not name.endswith(".json"):
+        return os.environ.get("REPLAY_SCRIPT", "")
+    root = os.path.realpath(_replay_scripts_dir())
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"replay script {name!r} is outside {root}")
+    return path
+
+
+def replay_script(name: str = "") -> dict:
+    """The script named by `name` (in REPLAY_SCRIPTS_DIR), else REPLAY_SCRIPT, else the default."""
+    path = _replay_script_path(name)
+    if not path:
+        return DEFAULT_REPLAY_SCRIPT
+    return _load_replay_script(path, os.path.getmtime(path))
+
+
+# Each request gets a new ReplayProvider, so the RNG lives here, one per
+# script: successive requests draw successive samples, and a seeded script
+# draws the same sequence in every process.
+_replay_rngs: dict[tuple[str, object], random.Random] = {}
+
+
+def _replay_rng(path: str, seed) -> random.Random:
+    key = (path, seed)
+    if key not in _replay_rngs:
+        _replay_rngs[key] = random.Random(seed)
+    return _replay_rngs[key]
+
+
+def _sample(spec, rng: random.Random, auto: float) -> float:
+    if spec is None or spec == "auto":
+        return auto
+    if isinstance(spec, (int, float)):
+        return spec
+    return max(0.0, rng.gauss(spec.get("mean", 0), spec.get("stddev", 0)))
+
+
+class ReplayProvider(LLMProvider):
+    """Plays a scripted conversation instead of calling a model, so the chat
+    pipeline can be load-tested with no model behind it. Tool calls still go
+    to the MCP servers; the model's latency and token usage are simulated."""
+
+    def __init__(self, script: dict, seed: int | None = None, rng: random.Random | None = None):
+        self.script = script
+        self.rng = rng or random.Random(script.get("seed") if seed is None else seed)
+
+    def _turn(self, messages: list[dict]) -> dict | None:
+        text = next((m["content"] for m in reversed(messages)
+                     if m["role"] == "user" and isinstance(m["content"], str)), "")
+        for turn in self.script.get("turns", []):
+            if re.search(turn.get("match", ""), text, re.IGNORECASE):
+                return turn
+        return None
+
+    async def chat(self, messages: list[dict], tools: list[dict]) -> dict:
+        turn = self._turn(messages)
+        if turn is None:
+            return {
+                "reply": "(replay: no scripted turn matches this message)",
+                "tool_calls": [],
+                "token_usage": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0},
+            }
+        latency = turn.get("latency_ms", self.script.get("latency_ms", 0))
+        tokens = {**self.script.get("tokens", {}), **turn.get("tokens", {})}
+        offered = {t["name"] for t in tools}
+        prompt_chars = len(json.dumps(messages)) + len(json.dumps(tools))
+        tool_calls_made = []
+        total_input = 0
+        total_output = 0
+
+        for step in turn.get("steps", [])[:10]:
+            calls = [c for c in step.get("tool_calls", []) if c["name"] in offered]
+            if "reply" not in step and not calls:
+                continue  # a model can't call tools it wasn't given
+            reply = step.get("reply", "").replace(
+                "{results}", "\n".join(tc["result"] for tc in tool_calls_made))
+            await asyncio.sleep(_sample(latency, self.rng, 0) / 1000)
+            total_input += int(_sample(tokens.get("input"), self.rng, prompt_chars / 4))
+            total_output += int(_sample(tokens.get("output"), self.rng, len(reply or json.dumps(calls)) / 4))
+            if "reply" in step:
+                return {
+                    "reply": reply,
+                    "tool_calls": tool_calls_made,
+                    "token_usage": {"input_tokens": total_input, "output_tokens": total_output, "total_tokens": total_input + total_output},
+                }
+            for call in calls:
+                args = call.get("arguments", {})
+                result = await call_tool(call["name"], args)
+                tool_calls_made.append({"name": call["name"], "arguments": args, "result": result})
+                prompt_chars += len(result)
+
+        return {
+            "reply": "Max tool iterations reached.",
+            "tool_calls": tool_calls_made,
+            "token_usage": {"input_tokens": total_input, "output_tokens": total_output, "total_tokens": total_input + total_output},
+        }
+
+
+class RecordingProvider(LLMProvider):
+    """Passes each turn through to a real provider and appends it to a
+    replay script at `path`: the exact user message, the tool calls made and
+    the reply, with the observed latency and tokens per round trip."""
+
+    def __init__(self, inner: LLMProvider, path: str):
+        self.inner = inner
+        self.path = path
+
+    async def chat(self, messages: list[dict], tools: list[dict]) -> dict:
+        text = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        t0 = time.monotonic()
+        result = await self.inner.chat(messages, tools)
+        elapsed = (time.monotonic() - t0) * 1000
+
+        steps = [{"tool_calls": [{"name": tc["name"], "arguments": tc["arguments"]}]}
+                 for tc in result.get("tool_calls", [])]
+        steps.append({"reply": result.get("reply", "")})
+        usage = result.get("token_usage", {})
+        turn = {
+            "match": f"^{re.escape(text)}$" if isinstance(text, str) else "",
+            "latency_ms": round(elapsed / len(steps), 1),
+            "tokens": {
+                "input": usage.get("input_tokens", 0) // len(steps),
+                "output": usage.get("output_tokens", 0) // len(steps),
+            },
+            "steps": steps,
+        }
+        # Concurrent turns each read-modify-write the script; take them one
+        # at a time, and write beside it then swap so a crash can't leave
+        # half a script behind.
+        async with _record_locks.setdefault(self.path, asyncio.Lock()):
+            await asyncio.to_thread(_append_turn, self.path, turn)
+        return result
+
+
+_record_locks: dict[str, asyncio.Lock] = {}
+
+
+def _append_turn(path: str, turn: dict) -> None:
+    try:
+        with open(path) as f:
+            script = json.load(f)
+    except FileNotFoundError:
+        script = {"turns": []}
+    script["turns"].append(turn)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(script, f, indent=2)
+    os.replace(tmp, path)
+
+
 def get_provider(config: dict) -> LLMProvider:
-    """Factory to create the right provider from config."""
+    """Factory to create the right provider from config.
+
+    Setting LLM_RECORD_TO records every turn of a real provider to that
+    file, as a script the replay provider can play back.
+    """
     provider_type = config.get("provider", "ollama")
+    if provider_type == "replay":
+        name = config.get("model") or ""
+        script = replay_script(name)
+        return ReplayProvider(script, rng=_replay_rng(_replay_script_path(name), script.get("seed")))
+    provider = _model_provider(provider_type, config)
+    if os.environ.get("LLM_RECORD_TO"):
+        return RecordingProvider(provider, os.environ["LLM_RECORD_TO"])
+    return provider
+
+
+def _model_provider(provider_type: str, config: dict) -> LLMProvider:
     if provider_type == "ollama":
         return OllamaProvider(
             base_url=config.get("base_url", "http://host.containers.internal:11434"),
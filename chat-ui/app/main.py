@@ -1,3 +1,4 @@
+import asyncio
 import json
 import logging
 import os
@@ -21,10 +22,65 @@ from .mcp_client import (
     get_local_tool,
     register_enable_tools_callback,
 )
-from .llm_providers import get_provider
+from .llm_providers import get_provider, replay_script
 from .model_catalog import list_models, resolve_auto
+# Engine detection, tracing and the registry client are shared with
+# mcp-server: the image copies those mcp_server modules in (see Dockerfile),
+# and tests/conftest.py puts ../mcp-server on sys.path.
+from mcp_server import engine, tracing
+from mcp_server.clients import registry_client
 
 app = FastAPI(title="MCP DevOps Lab Chat UI", version="1.0.0")
+tracing.set_service("chat-ui")
+
+# Requests that get a trace of their own (a root span, continuing the
+# caller's traceparent if it sent one); the trace ID comes back in the
+# X-Trace-Id header and, for chat turns, in the response body.
+_TRACED_ROUTES = {"/api/chat", "/api/chat-compare", "/api/verify"}
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    if not tracing.TRACE_DIR or request.url.path not in _TRACED_ROUTES:
+        return await call_next(request)
+    with tracing.remote(request.headers), tracing.span(
+        f"{request.method} {request.url.path}", "server",
+        **{"http.request.method": request.method, "url.path": request.url.path},
+    ) as span:
+        response = await call_next(request)
+        span.set("http.response.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.fail(f"HTTP {response.status_code}")
+    response.headers["X-Trace-Id"] = span.trace_id
+    return response
+
+
+async def _llm_chat(provider, config: dict, messages: list[dict], tools: list[dict]) -> dict:
+    """provider.chat under an `llm` span. Tool calls the model makes are
+    child spans, so the span's own time is the model's."""
+    with tracing.span(f"llm {config.get('provider') or ''}", **{
+        "gen_ai.system": config.get("provider") or "",
+        "gen_ai.request.model": config.get("model") or "",
+        "chat.tools_offered": len(tools),
+    }) as span:
+        try:
+            result = await provider.chat(messages, tools)
+        except Exception as e:
+            key = config.get("api_key") or ""
+            message = f"{type(e).__name__}: {e}"
+            span.fail(message.replace(key, "***") if key else message)
+            raise
+        usage = result.get("token_usage") or {}
+        span.set("gen_ai.usage.input_tokens", usage.get("input_tokens", 0))
+        span.set("gen_ai.usage.output_tokens", usage.get("output_tokens", 0))
+        span.set("chat.tool_calls", len(result.get("tool_calls") or []))
+    return result
+
+
+def _trace_id() -> str | None:
+    span = tracing.current()
+    return span.trace_id if span is not None else None
+
 
 # Server-side chat history storage (persisted in Docker volume)
 CHAT_DATA_DIR = pathlib.Path(os.environ.get("CHAT_DATA_DIR", "/app/data"))
@@ -130,6 +186,7 @@ async def get_providers():
             {"id": "openai",   "name": "OpenAI",               "requires_key": True,  "default_model": "gpt-4o",                 "has_key": bool(_API_KEYS.get("openai"))},
             {"id": "anthropic","name": "Anthropic",            "requires_key": True,  "default_model": "claude-sonnet-4-5-20250929", "has_key": bool(_API_KEYS.get("anthropic"))},
             {"id": "google",   "name": "Google Gemini",        "requires_key": True,  "default_model": "gemini-2.0-flash",       "has_key": bool(_API_KEYS.get("google"))},
+            {"id": "replay",   "name": "Replay (scripted)",    "requires_key": False, "default_model": "",                       "has_key": True},
         ],
         "active": _safe_provider_view(_provider_config),
     }
@@ -142,7 +199,7 @@ async def test_provider_key(request: Request):
     Calls each provider's models-list endpoint — these are auth-checked but
     don't consume tokens, so testing is free regardless of plan tier.
 
-    Body: {"provider": "openai"|"anthropic"|"google"|"ollama",
+    Body: {"provider": "openai"|"anthropic"|"google"|"ollama"|"replay",
            "api_key": "sk-..." (optional — falls back to env-loaded key),
            "base_url": "..." (optional, ollama only)}
 
@@ -160,9 +217,19 @@ async def test_provider_key(request: Request):
     # Validate the provider name BEFORE checking for a key, so unknown names
     # don't masquerade as "no key configured" (which would suggest a fix that
     # wouldn't work).
-    if provider not in ("openai", "anthropic", "google", "ollama"):
+    if provider not in ("openai", "anthropic", "google", "ollama", "replay"):
         return {"ok": False, "status": 0, "message": f"unknown provider: {provider}", "latency_ms": 0}
 
+    # Replay has no endpoint; "reachable" means its script loads.
+    if provider == "replay":
+        model = body.get("model") or (_provider_config.get("model") if _provider_config.get("provider") == "replay" else "")
+        try:
+            script = replay_script(model or "")
+        except (OSError, ValueError) as e:
+            return {"ok": False, "status": 0, "message": f"replay script unreadable: {e}", "latency_ms": 0}
+        turns = len(script.get("turns", []))
+        return {"ok": True, "status": 200, "message": f"replay script loaded ({turns} turn{'s' if turns != 1 else ''})", "latency_ms": 0}
+
     # Resolve the key: explicit (from popover) > env-loaded > nothing.
     key = explicit_key or _API_KEYS.get(provider, "")
 
@@ -300,7 +367,7 @@ async def _fetch_registry_catalog(label: str, url: str, host_url: str) -> dict:
                 try:
                     tr = await client.get(f"{url}/v2/{repo}/tags/list")
                     tr.raise_for_status()
-                    tags = tr.json().get("tags") or []
+                    tags = registry_client.visible_tags(tr.json().get("tags") or [])
                 except Exception:
                     tags = []
                 images.append({"name": repo, "tags": tags})
@@ -332,6 +399,27 @@ async def get_registries_catalog():
     return {"registries": [dev, prod]}
 
 
+# ─── Registry diff (dev vs prod) ───────────────────────────────────────
+# Promotion planning view: which image:tags exist only on one side, and
+# which exist on both but point at different content. The mcp-registry
+# `diff_registries` tool's own code (mcp_server/clients/registry_client.py),
+# run in-process so the UI doesn't depend on that MCP being enabled and the
+# two always agree.
+
+
+@app.get("/api/registries/diff")
+async def get_registries_diff():
+    """Set-diff registry-dev against registry-prod by manifest digest.
+
+    502 when either catalog can't be read. Tags or manifests that couldn't
+    be read come back under `errors` instead of counting as missing.
+    """
+    try:
+        return await registry_client.diff_registries()
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"registry unreachable: {e}")
+
+
 # Whitelist of registries the Clear button is allowed to wipe. Hardcoded
 # (not env-driven) because this endpoint deletes a docker volume — anything
 # the request controls must be a literal we recognise.
@@ -494,53 +582,6 @@ async def ollama_delete(name: str):
         raise HTTPException(status_code=502, detail=f"Ollama unreachable: {e}")
 
 
-def _detect_engine() -> str:
-    """Auto-detect the container engine behind /var/run/docker.sock.
-
-    Both engines mount the same path, but Docker answers GET /_ping with
-    `Server: Docker/...` and Podman answers with `Server: Libpod/...`.
-    Probing the socket is more reliable than trusting CONTAINER_ENGINE
-    in .env, which can drift if the user switches engines without
-    rerunning setup.
-
-    Priority:
-      1. CONTAINER_ENGINE_FORCE  (explicit override; testing the other path)
-      2. Socket probe            (whoever's actually answering)
-      3. CONTAINER_ENGINE env    (setup-script value)
-      4. "docker"                (sane default)
-    """
-    forced = os.environ.get("CONTAINER_ENGINE_FORCE", "").strip().lower()
-    if forced in ("docker", "podman"):
-        return forced
-
-    sock_path = "/var/run/docker.sock"
-    try:
-        import socket as _socket
-        s = _socket.socket(_socket.AF_UNIX)
-        s.settimeout(2.0)
-        s.connect(sock_path)
-        s.send(b"GET /_ping HTTP/1.0\r\nHost: x\r\n\r\n")
-        chunks: list[bytes] = []
-        for _ in range(4):
-            chunk = s.recv(4096)
-            if not chunk:
-                break
-            chunks.append(chunk)
-        s.close()
-        resp = b"".join(chunks).lower()
-        if b"server: docker" in resp:
-            return "docker"
-        if b"server: libpod" in resp:
-            return "podman"
-    except OSError:
-        pass
-
-    fallback = os.environ.get("CONTAINER_ENGINE", "docker").strip().lower()
-    return fallback or "docker"
-
-
-_CONTAINER_ENGINE = _detect_engine()
-logger.info("Detected container engine: %s", _CONTAINER_ENGINE)
 _HOST_PROJECT_DIR = os.environ.get("HOST_PROJECT_DIR", "")
 
 
@@ -583,6 +624,9 @@ def _prebuild_status(server_names: list[str]) -> dict[str, str]:
 
 @app.get("/api/mcp-status")
 async def mcp_status():
+    # Shared with mcp-runner (mcp_server/engine.py): cached for a TTL, so
+    # this only touches the socket when the cached answer has expired.
+    engine_info = await engine.detect()
     try:
         servers = await check_servers()
         total = sum(s["tool_count"] for s in servers)
@@ -596,7 +640,9 @@ async def mcp_status():
             "servers": servers,
             "total_tools": total,
             "online_count": online,
-            "engine": _CONTAINER_ENGINE,
+            "engine": engine_info.name,
+            "engine_version": engine_info.version,
+            "engine_api_version": engine_info.api_version,
             "host_project_dir": _HOST_PROJECT_DIR,
             "prebuild_status": prebuild,
         }
@@ -605,7 +651,9 @@ async def mcp_status():
             "servers": [],
             "total_tools": 0,
             "online_count": 0,
-            "engine": _CONTAINER_ENGINE,
+            "engine": engine_info.name,
+            "engine_version": engine_info.version,
+            "engine_api_version": engine_info.api_version,
             "host_project_dir": _HOST_PROJECT_DIR,
             "prebuild_status": {},
             "error": str(e),
@@ -915,7 +963,7 @@ async def chat(req: ChatRequest):
             tools_for_provider = [escape_tool] if escape_tool else []
 
             provider = get_provider(_provider_config)
-            result = await provider.chat(messages, tools_for_provider)
+            result = await _llm_chat(provider, _provider_config, messages, tools_for_provider)
 
             usage_data = result.get("token_usage", {})
             # Surface any synthetic tool calls the model made (only
@@ -943,6 +991,7 @@ async def chat(req: ChatRequest):
                 hallucination_mode=True,
                 provider=str(_provider_config.get("provider") or ""),
                 model=str(_provider_config.get("model") or ""),
+                trace_id=_trace_id(),
             )
 
         # Get available MCP tools and server status (grounded mode).
@@ -969,7 +1018,7 @@ async def chat(req: ChatRequest):
         # the cold-open posture (vanilla prompt + zero tools) is consistent.
         tools_for_llm = _tools_for_llm(servers, all_tools)
         provider = get_provider(_provider_config)
-        result = await provider.chat(messages, tools_for_llm)
+        result = await _llm_chat(provider, _provider_config, messages, tools_for_llm)
 
         usage_data = result.get("token_usage", {})
         tool_calls_data = [
@@ -989,6 +1038,7 @@ async def chat(req: ChatRequest):
             hallucination_mode=False,
             provider=str(_provider_config.get("provider") or ""),
             model=str(_provider_config.get("model") or ""),
+            trace_id=_trace_id(),
         )
     except Exception as e:
         return JSONResponse(
@@ -1072,7 +1122,7 @@ async def chat_compare(req: CompareRequest):
         t0 = time.monotonic()
         try:
             provider = get_provider(cfg)
-            result = await provider.chat(messages, tools_for_pane)
+            result = await _llm_chat(provider, cfg, messages, tools_for_pane)
             elapsed = int((time.monotonic() - t0) * 1000)
             return PaneResult(
                 reply=result.get("reply", ""),
@@ -1098,7 +1148,52 @@ async def chat_compare(req: CompareRequest):
             )
 
     left, right = await asyncio.gather(_run_pane(req.left), _run_pane(req.right))
-    return CompareResponse(left=left, right=right)
+    return CompareResponse(left=left, right=right, trace_id=_trace_id())
+
+
+def _self_ms(span: dict, children: list[dict]) -> float:
+    """The span's duration minus the time covered by its children (which
+    may overlap each other), i.e. time spent in the span itself."""
+    covered, end = 0, span["start_ns"]
+    for c in sorted(children, key=lambda c: c["start_ns"]):
+        start, stop = max(c["start_ns"], end), min(c["end_ns"], span["end_ns"])
+        if stop > start:
+            covered += stop - start
+            end = stop
+    return round((span["end_ns"] - span["start_ns"] - covered) / 1e6, 3)
+
+
+@app.get("/api/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """Every span of one trace, from chat-ui and each service it reached,
+    with times relative to the trace's start."""
+    spans = await asyncio.to_thread(tracing.load_trace, trace_id)
+    if not spans:
+        detail = "trace not found" if tracing.TRACE_DIR else "tracing is off (TRACE_DIR is unset)"
+        raise HTTPException(status_code=404, detail=detail)
+    t0 = spans[0]["start_ns"]
+    children: dict[str, list[dict]] = {}
+    for span in spans:
+        children.setdefault(span["parent_id"], []).append(span)
+    return {
+        "trace_id": trace_id,
+        "duration_ms": round((max(s["end_ns"] for s in spans) - t0) / 1e6, 3),
+        "spans": [
+            {
+                "span_id": s["span_id"],
+                "parent_id": s["parent_id"],
+                "name": s["name"],
+                "service": s["service"],
+                "kind": s["kind"],
+                "start_ms": round((s["start_ns"] - t0) / 1e6, 3),
+                "duration_ms": round((s["end_ns"] - s["start_ns"]) / 1e6, 3),
+                "self_ms": _self_ms(s, children.get(s["span_id"], [])),
+                "attributes": s["attributes"],
+                "error": s["error"],
+            }
+            for s in spans
+        ],
+    }
 
 
 @app.post("/api/verify")
@@ -1116,7 +1211,7 @@ async def verify(req: VerifyRequest):
         )
 
         provider = get_provider(_provider_config)
-        result = await provider.chat([{"role": "user", "content": prompt}], [])
+        result = await _llm_chat(provider, _provider_config, [{"role": "user", "content": prompt}], [])
 
         reply_text = result.get("reply", "")
         first_line = reply_text.strip().split("\n")[0].strip().upper()
@@ -3,6 +3,9 @@ import json
 import os
 import asyncio
 import logging
+from contextlib import nullcontext
+
+from mcp_server import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -103,16 +106,24 @@ async def _mcp_request(server_url: str, method: str, params: dict = None,
         resp = await c.post(
             endpoint,
             json={"jsonrpc": "2.0", "id": 1, "method": method, "params": params or {}},
-            headers=HEADERS,
+            headers=tracing.inject(HEADERS),
             timeout=60.0,
         )
         resp.raise_for_status()
         return _parse_response(resp)
 
-    if client:
-        return await _do(client)
-    async with httpx.AsyncClient() as c:
-        return await _do(c)
+    # Only as part of a traced request: background polling such as
+    # /api/mcp-status would otherwise write a root trace per call.
+    traced = tracing.span(f"mcp {method}", "client", **{
+        "rpc.system": "jsonrpc",
+        "rpc.method": method,
+        "server.address": _server_label(server_url),
+    }) if tracing.current() is not None else nullcontext()
+    with traced:
+        if client:
+            return await _do(client)
+        async with httpx.AsyncClient() as c:
+            return await _do(c)
 
 
 async def _list_tools_from_server(server_url: str) -> list[dict]:
@@ -243,13 +254,16 @@ async def call_tool(name: str, arguments: dict) -> str:
     if not server_url:
         return json.dumps({"error": f"Unknown tool: {name}"})
 
-    async with httpx.AsyncClient() as client:
-        await _mcp_request(server_url, "initialize", {
-            "protocolVersion": "2024-11-05",
-            "capabilities": {},
-            "clientInfo": {"name": "mcp-lab-chat-ui", "version": "1.0.0"},
-        }, client=client)
-        data = await _mcp_request(server_url, "tools/call", {"name": name, "arguments": arguments}, client=client)
+    with tracing.span(f"tool {name}", **{"mcp.tool": name, "mcp.server": _server_label(server_url)}) as span:
+        async with httpx.AsyncClient() as client:
+            await _mcp_request(server_url, "initialize", {
+                "protocolVersion": "2024-11-05",
+                "capabilities": {},
+                "clientInfo": {"name": "mcp-lab-chat-ui", "version": "1.0.0"},
+            }, client=client)
+            data = await _mcp_request(server_url, "tools/call", {"name": name, "arguments": arguments}, client=client)
+        if data.get("error") or data.get("result", {}).get("isError"):
+            span.fail("tool call returned an error")
     result = data.get("result", {})
     content = result.get("content", [])
     texts = [c.get("text", "") for c in content if c.get("type") == "text"]
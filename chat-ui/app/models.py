@@ -13,7 +13,7 @@ class ChatRequest(BaseModel):
 
 
 class ProviderConfig(BaseModel):
-    provider: str  # "ollama", "openai", "anthropic", "google"
+    provider: str  # "ollama", "openai", "anthropic", "google", "replay"
     api_key: Optional[str] = None
     model: Optional[str] = None
     base_url: Optional[str] = None
@@ -50,6 +50,8 @@ class ChatResponse(BaseModel):
     # mid-conversation and wants to know which message came from which.
     provider: str = ""
     model: str = ""
+    # The turn's spans, from GET /api/traces/{trace_id}; None when tracing is off.
+    trace_id: Optional[str] = None
 
 
 class VerifyRequest(BaseModel):
@@ -94,3 +96,4 @@ class PaneResult(BaseModel):
 class CompareResponse(BaseModel):
     left: PaneResult
     right: PaneResult
+    trace_id: Optional[str] = None
@@ -6,6 +6,8 @@ import httpx
 
 # Make `app` importable as a top-level package when running from chat-ui/
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# ... and the engine detection module it shares with mcp-runner.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "mcp-server"))
 
 from app.main import app  # noqa: E402
 
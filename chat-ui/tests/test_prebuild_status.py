@@ -47,6 +47,21 @@ async def test_mcp_status_includes_prebuild_status(client, monkeypatch, fake_che
     assert body["prebuild_status"]["mcp-gitea"] == "preparing"
 
 
+@pytest.mark.asyncio
+async def test_mcp_status_reports_engine_from_shared_detection(client, monkeypatch, fake_check_servers):
+    """The engine comes from mcp_server.engine (shared with mcp-runner), not
+    an import-time probe, and carries its version alongside the name."""
+    async def fake_detect(refresh=False):
+        return main.engine.EngineInfo("podman", "probe", "5.2.2", "5.2.2")
+    monkeypatch.setattr(main.engine, "detect", fake_detect)
+    monkeypatch.setattr(main, "_image_exists", lambda s: True)
+
+    body = (await client.get("/api/mcp-status")).json()
+    assert body["engine"] == "podman"
+    assert body["engine_version"] == "5.2.2"
+    assert body["engine_api_version"] == "5.2.2"
+
+
 @pytest.mark.asyncio
 async def test_mcp_control_start_returns_503_when_image_not_built(client, monkeypatch):
     """Clicking Start before the background build finishes must NOT call
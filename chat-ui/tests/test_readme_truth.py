@@ -23,9 +23,9 @@ CHAT_UI_URL = "http://localhost:3001"
 EXPECTED_PER_SERVER = {
     "user": 9,
     "gitea": 7,
-    "registry": 5,
+    "registry": 7,
     "promotion": 3,
-    "runner": 3,
+    "runner": 4,
 }
 
 
@@ -14,6 +14,8 @@ import respx
 import httpx
 
 from app import main
+from mcp_server import config
+from mcp_server.clients import registry_client
 
 
 @pytest.mark.asyncio
@@ -171,3 +173,96 @@ async def test_clear_propagates_real_failure(client, monkeypatch, fake_compose_f
     r = await client.post("/api/registries/dev/clear")
     assert r.status_code == 500
     assert "image not found" in r.json()["detail"]
+
+
+A = "sha256:" + "a" * 64
+B = "sha256:" + "b" * 64
+C = "sha256:" + "c" * 64
+
+
+def _mock_registry(url: str, tags: dict[str, dict[str, str]]):
+    """Catalog + tags/list + manifests for {repo: {tag: digest}}."""
+    respx.get(f"{url}/v2/_catalog").mock(
+        return_value=httpx.Response(200, json={"repositories": sorted(tags)})
+    )
+    for repo, digests in tags.items():
+        respx.get(f"{url}/v2/{repo}/tags/list").mock(
+            return_value=httpx.Response(200, json={"name": repo, "tags": sorted(digests)})
+        )
+        for tag, digest in digests.items():
+            headers = {"Docker-Content-Digest": digest,
+                       "Content-Type": "application/vnd.oci.image.manifest.v1+json"}
+            respx.head(f"{url}/v2/{repo}/manifests/{tag}").mock(
+                return_value=httpx.Response(200, headers=headers)
+            )
+            respx.get(f"{url}/v2/{repo}/manifests/{tag}").mock(
+                return_value=httpx.Response(200, headers=headers, json={"schemaVersion": 2, "layers": []})
+            )
+
+
+@pytest.fixture
+def registries():
+    registry_client.clear_cache()
+    yield config.DEV_REGISTRY_URL, config.PROD_REGISTRY_URL
+    registry_client.clear_cache()
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_registries_diff_by_digest(client, registries):
+    dev_url, prod_url = registries
+    _mock_registry(dev_url, {
+        "hello-app": {"v1.0.0": A, "v1.1.0": B, "latest": B},
+    })
+    _mock_registry(prod_url, {
+        "hello-app": {"v1.0.0": A, "latest": A},
+        "legacy": {"v0": C},
+    })
+
+    r = await client.get("/api/registries/diff")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["only_in_dev"] == ["hello-app:v1.1.0"]
+    assert body["only_in_prod"] == ["legacy:v0"]
+    # Same shape as the mcp-registry diff_registries tool: short digests.
+    assert body["digest_differs"] == [
+        {"ref": "hello-app:latest", "dev": B[:19], "prod": A[:19]}
+    ]
+    assert body["in_sync"] == 1
+    assert body["cached"] is False
+    assert "errors" not in body
+
+    # Unchanged catalogs inside the TTL: only the two catalog GETs go out.
+    calls = respx.calls.call_count
+    again = (await client.get("/api/registries/diff")).json()
+    assert again["cached"] is True
+    assert respx.calls.call_count == calls + 2
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_registries_diff_reports_unreadable_tags_instead_of_missing(client, registries):
+    dev_url, prod_url = registries
+    _mock_registry(dev_url, {"hello-app": {"latest": A, "v1": A}})
+    respx.get(f"{prod_url}/v2/_catalog").mock(
+        return_value=httpx.Response(200, json={"repositories": ["hello-app"]})
+    )
+    respx.get(f"{prod_url}/v2/hello-app/tags/list").mock(return_value=httpx.Response(503, text="down"))
+
+    body = (await client.get("/api/registries/diff")).json()
+    assert body["only_in_dev"] == []
+    assert [(e["registry"], e["ref"]) for e in body["errors"]] == [("prod", "hello-app:*")]
+    # An incomplete diff isn't cached.
+    assert (await client.get("/api/registries/diff")).json()["cached"] is False
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_registries_diff_unreachable_registry_is_502(client, registries):
+    dev_url, prod_url = registries
+    respx.get(f"{dev_url}/v2/_catalog").mock(
+        side_effect=httpx.ConnectError("connection refused")
+    )
+    _mock_registry(prod_url, {})
+    r = await client.get("/api/registries/diff")
+    assert r.status_code == 502
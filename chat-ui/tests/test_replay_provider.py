@@ -0,0 +1,200 @@
+"""The replay provider plays a scripted conversation in place of a model so
+/api/chat and /api/chat-compare can be load-tested offline. Scripted tool
+calls still go through call_tool; latency and token usage follow the
+script's distributions. LLM_RECORD_TO records a real provider's turns in
+the same format.
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+from app import llm_providers, main
+from app.llm_providers import RecordingProvider, ReplayProvider, get_provider
+
+
+TOOLS = [{"name": "list_users", "description": "list", "inputSchema": {}}]
+
+
+@pytest.fixture
+def tool_calls(monkeypatch):
+    """Answer every tool call with a canned result and record the calls."""
+    calls = []
+
+    async def fake_call_tool(name, arguments):
+        calls.append((name, arguments))
+        return json.dumps([{"username": "alice"}, {"username": "bob"}])
+
+    monkeypatch.setattr(llm_providers, "call_tool", fake_call_tool)
+    return calls
+
+
+@pytest.fixture(autouse=True)
+def scripts_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("REPLAY_SCRIPTS_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def replay_config():
+    saved = dict(main._provider_config)
+    main._provider_config.clear()
+    main._provider_config.update({"provider": "replay", "model": ""})
+    yield
+    main._provider_config.clear()
+    main._provider_config.update(saved)
+
+
+@pytest.mark.asyncio
+async def test_plays_tool_calls_then_reply(tool_calls):
+    provider = ReplayProvider(llm_providers.DEFAULT_REPLAY_SCRIPT)
+    result = await provider.chat([{"role": "user", "content": "Who are the users?"}], TOOLS)
+    assert tool_calls == [("list_users", {})]
+    assert [tc["name"] for tc in result["tool_calls"]] == ["list_users"]
+    assert "alice" in result["reply"] and "bob" in result["reply"]
+    usage = result["token_usage"]
+    assert usage["input_tokens"] > 0 and usage["output_tokens"] > 0
+    assert usage["total_tokens"] == usage["input_tokens"] + usage["output_tokens"]
+
+
+@pytest.mark.asyncio
+async def test_skips_tools_it_was_not_given(tool_calls):
+    provider = ReplayProvider(llm_providers.DEFAULT_REPLAY_SCRIPT)
+    result = await provider.chat([{"role": "user", "content": "list the users"}], [])
+    assert tool_calls == []
+    assert result["tool_calls"] == []
+    assert result["reply"].startswith("Here are the users:")
+
+
+@pytest.mark.asyncio
+async def test_latency_and_tokens_follow_the_script(tool_calls):
+    script = {
+        "latency_ms": 50,
+        "tokens": {"input": 100, "output": {"mean": 20, "stddev": 0}},
+        "turns": [{"steps": [
+            {"tool_calls": [{"name": "list_users", "arguments": {}}]},
+            {"reply": "done"},
+        ]}],
+    }
+    t0 = time.monotonic()
+    result = await ReplayProvider(script).chat([{"role": "user", "content": "x"}], TOOLS)
+    assert time.monotonic() - t0 >= 0.1  # two round trips
+    assert result["token_usage"] == {"input_tokens": 200, "output_tokens": 40, "total_tokens": 240}
+
+
+@pytest.mark.asyncio
+async def test_seeded_distributions_are_repeatable():
+    script = {"seed": 7, "tokens": {"output": {"mean": 500, "stddev": 200}},
+              "turns": [{"steps": [{"reply": "ok"}]}]}
+    runs = [await ReplayProvider(script).chat([{"role": "user", "content": "x"}], []) for _ in range(2)]
+    assert runs[0]["token_usage"] == runs[1]["token_usage"]
+
+
+@pytest.mark.asyncio
+async def test_requests_draw_successive_samples(tmp_path, monkeypatch):
+    """get_provider builds a provider per request; the samples must still
+    come from one sequence per script, not restart it every request."""
+    path = tmp_path / "script.json"
+    path.write_text(json.dumps({"seed": 7, "tokens": {"output": {"mean": 500, "stddev": 200}},
+                                "turns": [{"steps": [{"reply": "ok"}]}]}))
+    monkeypatch.setattr(llm_providers, "_replay_rngs", {})
+
+    async def usage():
+        provider = get_provider({"provider": "replay", "model": str(path)})
+        return (await provider.chat([{"role": "user", "content": "x"}], []))["token_usage"]
+
+    first = [await usage() for _ in range(4)]
+    assert len({u["output_tokens"] for u in first}) > 1
+    monkeypatch.setattr(llm_providers, "_replay_rngs", {})  # as in a fresh process
+    assert [await usage() for _ in range(4)] == first
+
+
+@pytest.mark.asyncio
+async def test_script_file_from_model_field(tmp_path):
+    path = tmp_path / "script.json"
+    path.write_text(json.dumps({"turns": [{"match": "ping", "steps": [{"reply": "pong"}]}]}))
+    provider = get_provider({"provider": "replay", "model": str(path)})
+    assert (await provider.chat([{"role": "user", "content": "ping"}], []))["reply"] == "pong"
+    unmatched = await provider.chat([{"role": "user", "content": "hello"}], [])
+    assert "no scripted turn" in unmatched["reply"]
+
+
+def test_script_names_stay_inside_the_scripts_dir(tmp_path):
+    (tmp_path / "named.json").write_text(json.dumps({"turns": [{"steps": [{"reply": "hi"}]}]}))
+    assert llm_providers.replay_script("named.json")["turns"][0]["steps"] == [{"reply": "hi"}]
+    outside = tmp_path.parent / f"{tmp_path.name}-outside.json"
+    outside.write_text(json.dumps({"turns": []}))
+    for name in (str(outside), f"../{outside.name}"):
+        with pytest.raises(ValueError, match="outside"):
+            get_provider({"provider": "replay", "model": name})
+
+
+@pytest.mark.asyncio
+async def test_recorded_turn_replays(tmp_path, tool_calls):
+    class _Model:
+        async def chat(self, messages, tools):
+            result = await llm_providers.call_tool("list_users", {})
+            return {
+                "reply": f"Users: {result}",
+                "tool_calls": [{"name": "list_users", "arguments": {}, "result": result}],
+                "token_usage": {"input_tokens": 300, "output_tokens": 60, "total_tokens": 360},
+            }
+
+    path = tmp_path / "recorded.json"
+    messages = [{"role": "user", "content": "Who are the users?"}]
+    recorded = await RecordingProvider(_Model(), str(path)).chat(list(messages), TOOLS)
+
+    script = json.loads(path.read_text())
+    assert script["turns"][0]["tokens"] == {"input": 150, "output": 30}
+    replayed = await get_provider({"provider": "replay", "model": str(path)}).chat(list(messages), TOOLS)
+    assert replayed["tool_calls"] == recorded["tool_calls"]
+    assert replayed["reply"] == recorded["reply"]
+    assert replayed["token_usage"] == recorded["token_usage"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_recordings_keep_every_turn(tmp_path):
+    class _Model:
+        async def chat(self, messages, tools):
+            await asyncio.sleep(0)
+            return {"reply": "ok", "tool_calls": [], "token_usage": {}}
+
+    path = tmp_path / "recorded.json"
+    await asyncio.gather(*[
+        RecordingProvider(_Model(), str(path)).chat([{"role": "user", "content": f"q{i}"}], [])
+        for i in range(20)
+    ])
+    script = json.loads(path.read_text())
+    assert sorted(t["match"] for t in script["turns"]) == sorted(f"^q{i}$" for i in range(20))
+    assert [p.name for p in tmp_path.iterdir()] == ["recorded.json"]
+
+
+@pytest.mark.asyncio
+async def test_chat_endpoint_runs_offline(client, replay_config, tool_calls, monkeypatch):
+    async def fake_check_servers():
+        return [{"name": "user", "url": "http://x", "port": 8003,
+                 "status": "online", "tools": ["list_users"], "tool_count": 1}]
+
+    async def fake_list_tools():
+        return TOOLS
+
+    monkeypatch.setattr(main, "_hallucination_mode", False)
+    monkeypatch.setattr(main, "check_servers", fake_check_servers)
+    monkeypatch.setattr(main, "list_tools", fake_list_tools)
+
+    r = await client.post("/api/chat", json={"message": "show me the users", "history": []})
+    body = r.json()
+    assert r.status_code == 200
+    assert body["provider"] == "replay"
+    assert [tc["name"] for tc in body["tool_calls"]] == ["list_users"]
+    assert body["confidence"]["label"].startswith("High")
+
+
+@pytest.mark.asyncio
+async def test_provider_listed_and_testable(client, replay_config):
+    providers = (await client.get("/api/providers")).json()["providers"]
+    assert {"id": "replay", "requires_key": False}.items() <= next(p for p in providers if p["id"] == "replay").items()
+    r = await client.post("/api/test-provider-key", json={"provider": "replay"})
+    assert r.json()["ok"] is True
+    assert "turns" in r.json()["message"]
@@ -0,0 +1,123 @@
+"""Per-turn tracing: /api/chat opens a root span, the model call and each
+MCP request are spans under it, the MCP request carries a traceparent,
+and GET /api/traces/{trace_id} hands the turn's spans back for the UI.
+"""
+
+import json
+
+import httpx
+import pytest
+from app import main, mcp_client
+from mcp_server import tracing
+
+
+TOOLS = [{"name": "list_users", "description": "list", "inputSchema": {}}]
+
+
+@pytest.fixture
+def traces(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_DIR", str(tmp_path))
+    monkeypatch.setattr(tracing, "SERVICE", "chat-ui")
+    return tmp_path
+
+
+@pytest.fixture
+def mcp_user(monkeypatch):
+    """An mcp-user stand-in that answers initialize and tools/call, and
+    keeps the traceparent of every request."""
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers.get("traceparent"))
+        body = json.loads(request.content)
+        if body["method"] == "tools/call":
+            result = {"content": [{"type": "text", "text": json.dumps([{"username": "alice"}])}]}
+        else:
+            result = {"protocolVersion": "2024-11-05", "capabilities": {}, "serverInfo": {"name": "mcp-user"}}
+        return httpx.Response(200, json={"jsonrpc": "2.0", "id": 1, "result": result})
+
+    real_client = httpx.AsyncClient
+
+    def fake_client(*args, **kwargs):
+        kwargs["transport"] = httpx.MockTransport(handler)
+        return real_client(*args, **kwargs)
+
+    async def fake_check_servers():
+        return [{"name": "user", "url": "http://mcp-user:8003", "port": 8003,
+                 "status": "online", "tools": ["list_users"], "tool_count": 1}]
+
+    async def fake_list_tools():
+        return TOOLS
+
+    monkeypatch.setattr(mcp_client, "_tool_server_map", {"list_users": "http://mcp-user:8003"})
+    monkeypatch.setattr(mcp_client.httpx, "AsyncClient", fake_client)
+    monkeypatch.setattr(main, "check_servers", fake_check_servers)
+    monkeypatch.setattr(main, "list_tools", fake_list_tools)
+    monkeypatch.setattr(main, "_hallucination_mode", False)
+    saved = dict(main._provider_config)
+    main._provider_config.update({"provider": "replay", "model": ""})
+    yield seen
+    main._provider_config.clear()
+    main._provider_config.update(saved)
+
+
+@pytest.mark.asyncio
+async def test_chat_turn_is_traced(client, traces, mcp_user):
+    r = await client.post("/api/chat", json={"message": "who are the users?", "history": []})
+    body = r.json()
+    trace_id = body["trace_id"]
+    assert trace_id and r.headers["X-Trace-Id"] == trace_id
+    assert mcp_user and all(tp and tp.startswith(f"00-{trace_id}-") for tp in mcp_user)
+
+    t = (await client.get(f"/api/traces/{trace_id}")).json()
+    spans = {s["name"]: s for s in t["spans"]}
+    root = spans["POST /api/chat"]
+    assert root["parent_id"] is None and root["start_ms"] == 0
+    llm = spans["llm replay"]
+    assert llm["parent_id"] == root["span_id"]
+    assert llm["attributes"]["chat.tool_calls"] == 1
+    tool = spans["tool list_users"]
+    assert tool["parent_id"] == llm["span_id"]
+    assert spans["mcp tools/call"]["parent_id"] == tool["span_id"]
+    # The MCP server's span would hang off the traceparent it was sent.
+    assert any(tp.split("-")[2] == spans["mcp tools/call"]["span_id"] for tp in mcp_user)
+    assert llm["self_ms"] <= llm["duration_ms"]
+    assert t["duration_ms"] >= root["duration_ms"]
+
+
+@pytest.mark.asyncio
+async def test_untraced_when_off(client, mcp_user, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_DIR", "")
+    r = await client.post("/api/chat", json={"message": "who are the users?", "history": []})
+    assert r.json()["trace_id"] is None
+    assert "X-Trace-Id" not in r.headers
+    assert all(tp is None for tp in mcp_user)
+    r = await client.get(f"/api/traces/{'a' * 32}")
+    assert r.status_code == 404
+    assert "TRACE_DIR" in r.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_unknown_trace_is_404(client, traces):
+    r = await client.get(f"/api/traces/{'a' * 32}")
+    assert r.status_code == 404
+    assert r.json()["detail"] == "trace not found"
+
+
+def test_self_time_discounts_overlapping_children():
+    span = {"start_ns": 0, "end_ns": 10_000_000}
+    children = [
+        {"start_ns": 1_000_000, "end_ns": 4_000_000},
+        {"start_ns": 2_000_000, "end_ns": 5_000_000},  # overlaps the first
+        {"start_ns": 8_000_000, "end_ns": 9_000_000},
+    ]
+    assert main._self_ms(span, children) == 5.0
+
+
+@pytest.mark.asyncio
+async def test_mcp_requests_outside_a_turn_are_not_traced(traces, mcp_user):
+    # e.g. /api/mcp-status polling: no root trace per poll
+    await mcp_client._mcp_request("http://mcp-user:8003", "initialize")
+    tracing.flush()
+    assert mcp_user == [None]
+    assert list(traces.iterdir()) == []
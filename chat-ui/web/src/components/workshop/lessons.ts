@@ -196,7 +196,7 @@ const PHASE_3_BUILD: Phase = {
       heading: 'Scan — security report',
       prompt: 'Scan hello-app:latest for vulnerabilities.',
       tool: 'scan_image',
-      teach: 'scan_image is a mock CVE report. PASSED means no critical CVEs; FAILED would gate the promotion.',
+      teach: 'scan_image reads the image layers in registry-dev and checks their packages against an offline CVE DB. PASSED means no critical CVEs; FAILED would gate the promotion.',
     },
   ],
 }
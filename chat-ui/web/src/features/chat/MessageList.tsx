@@ -4,6 +4,7 @@ import { send } from '@/lib/chat'
 import { UserMessage } from './UserMessage'
 import { AssistantMessage } from './AssistantMessage'
 import { ToolCallSummary } from './ToolCallSummary'
+import { TurnTrace } from '@/features/trace/TurnTrace'
 
 export function MessageList() {
   const messages = useLab((s) => s.messages)
@@ -42,6 +43,7 @@ export function MessageList() {
                 provider={m.provider}
                 model={m.model}
               />
+              {m.status === 'ok' && m.traceId && <TurnTrace traceId={m.traceId} />}
               {m.status === 'error' && (
                 <div className="flex items-center gap-2 text-err text-xs">
                   <span>⚠ {m.error}</span>
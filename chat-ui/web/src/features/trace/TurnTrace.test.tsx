@@ -0,0 +1,45 @@
+import { describe, it, expect, vi } from 'vitest'
+import { render, screen } from '@testing-library/react'
+import userEvent from '@testing-library/user-event'
+import { QueryClient, QueryClientProvider } from '@tanstack/react-query'
+import { TurnTrace, orderSpans } from './TurnTrace'
+import type { TraceSpan } from '@/lib/schemas'
+
+const span = (span_id: string, parent_id: string | null, name: string, start_ms: number, duration_ms: number): TraceSpan => ({
+  span_id, parent_id, name, service: 'chat-ui', kind: 'internal',
+  start_ms, duration_ms, self_ms: duration_ms, attributes: {}, error: null,
+})
+
+const SPANS = [
+  span('root', null, 'POST /api/chat', 0, 900),
+  span('tool', 'llm1', 'tool list_users', 420, 80),
+  span('llm2', 'root', 'llm openai', 510, 380),
+  span('llm1', 'root', 'llm openai', 5, 400),
+]
+
+describe('TurnTrace', () => {
+  it('orders spans as a tree', () => {
+    expect(orderSpans(SPANS).map(({ span, depth }) => `${depth}:${span.span_id}`)).toEqual([
+      '0:root', '1:llm1', '2:tool', '1:llm2',
+    ])
+  })
+
+  it('treats a span whose parent is missing as a root', () => {
+    expect(orderSpans([span('a', 'elsewhere', 'tool x', 0, 1)])).toHaveLength(1)
+  })
+
+  it('fetches the trace only when opened', async () => {
+    const fetchMock = vi.fn().mockResolvedValue({
+      ok: true,
+      json: async () => ({ trace_id: 'abc', duration_ms: 900, spans: SPANS }),
+    })
+    vi.stubGlobal('fetch', fetchMock)
+    const qc = new QueryClient({ defaultOptions: { queries: { retry: false } } })
+    render(<QueryClientProvider client={qc}><TurnTrace traceId="abc" /></QueryClientProvider>)
+    expect(fetchMock).not.toHaveBeenCalled()
+    await userEvent.click(screen.getByTestId('turn-trace-toggle'))
+    expect(await screen.findAllByTestId('trace-span')).toHaveLength(4)
+    expect(fetchMock).toHaveBeenCalledWith('/api/traces/abc', expect.anything())
+    vi.unstubAllGlobals()
+  })
+})
@@ -0,0 +1,95 @@
+import { useState } from 'react'
+import { useQuery } from '@tanstack/react-query'
+import { getTrace } from '@/lib/api'
+import type { TraceSpan } from '@/lib/schemas'
+
+/** Spans in tree order (each parent followed by its children), with depth. */
+export function orderSpans(spans: TraceSpan[]): { span: TraceSpan; depth: number }[] {
+  const ids = new Set(spans.map((s) => s.span_id))
+  const children = new Map<string | null, TraceSpan[]>()
+  for (const s of spans) {
+    // A parent we don't have (e.g. the caller of a remote trace) makes a root.
+    const parent = s.parent_id && ids.has(s.parent_id) ? s.parent_id : null
+    children.set(parent, [...(children.get(parent) ?? []), s])
+  }
+  const out: { span: TraceSpan; depth: number }[] = []
+  const walk = (parent: string | null, depth: number) => {
+    for (const s of [...(children.get(parent) ?? [])].sort((a, b) => a.start_ms - b.start_ms)) {
+      out.push({ span: s, depth })
+      walk(s.span_id, depth + 1)
+    }
+  }
+  walk(null, 0)
+  return out
+}
+
+const ms = (n: number) => (n >= 1000 ? `${(n / 1000).toFixed(2)}s` : `${n.toFixed(n < 10 ? 1 : 0)}ms`)
+
+/**
+ * Per-turn waterfall: where the turn's time went — model calls, MCP
+ * handshakes, tool handlers and the upstream requests under them. The
+ * right-hand column is self time, so the `llm` rows read as model time.
+ */
+export function TurnTrace({ traceId }: { traceId: string }) {
+  const [open, setOpen] = useState(false)
+  const trace = useQuery({
+    queryKey: ['trace', traceId],
+    queryFn: ({ signal }) => getTrace(traceId, signal),
+    enabled: open,
+    staleTime: Infinity,
+  })
+  return (
+    <div className="self-start w-full">
+      <button
+        type="button"
+        onClick={() => setOpen(!open)}
+        className="text-[10px] text-faint hover:text-text px-1"
+        data-testid="turn-trace-toggle"
+      >
+        {open ? '▴ trace' : '▾ trace'}
+      </button>
+      {open && (
+        <div className="bg-surface-2 border border-border rounded-[10px] p-3 my-1 text-xs">
+          {trace.isPending && <div className="text-muted">Loading trace…</div>}
+          {trace.isError && <div className="text-err">Couldn't load trace: {trace.error.message}</div>}
+          {trace.data && <Waterfall spans={trace.data.spans} total={trace.data.duration_ms} />}
+        </div>
+      )}
+    </div>
+  )
+}
+
+function Waterfall({ spans, total }: { spans: TraceSpan[]; total: number }) {
+  const scale = total > 0 ? 100 / total : 0
+  return (
+    <div className="flex flex-col gap-0.5">
+      <div className="grid grid-cols-[minmax(0,2fr)_minmax(0,3fr)_56px] gap-2 font-sans text-[10px] uppercase tracking-wider text-muted mb-1">
+        <span>span</span>
+        <span>{ms(total)}</span>
+        <span className="text-right">self</span>
+      </div>
+      {orderSpans(spans).map(({ span, depth }) => (
+        <div
+          key={span.span_id}
+          className="grid grid-cols-[minmax(0,2fr)_minmax(0,3fr)_56px] gap-2 items-center"
+          title={`${span.service} · ${span.kind}${span.error ? ` · ${span.error}` : ''}`}
+          data-testid="trace-span"
+        >
+          <span className="font-mono truncate" style={{ paddingLeft: depth * 10 }}>
+            <span className={span.error ? 'text-err' : 'text-text'}>{span.name}</span>
+            <span className="text-faint"> {span.service}</span>
+          </span>
+          <span className="relative h-3">
+            <span
+              className={`absolute top-0.5 h-2 rounded-sm ${span.error ? 'bg-err' : 'bg-tool-fg'}`}
+              style={{ left: `${span.start_ms * scale}%`, width: `max(1px, ${span.duration_ms * scale}%)` }}
+            />
+          </span>
+          <span className="font-mono text-right text-muted" title={`total ${ms(span.duration_ms)}`}>
+            {ms(span.self_ms)}
+          </span>
+        </div>
+      ))}
+    </div>
+  )
+}
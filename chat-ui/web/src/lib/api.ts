@@ -7,6 +7,7 @@ import {
   ToolsResponseSchema,
   HallucinationStateSchema,
   RegistryCatalogResponseSchema,
+  TraceResponseSchema,
   type ChatResponse,
   type ChatMessage,
   type ToolDef,
@@ -71,6 +72,9 @@ const json = (body: unknown): RequestInit => ({
 export const sendChat = (req: { message: string; history: ChatMessage[] }, signal?: AbortSignal) =>
   call('/api/chat', ChatResponseSchema, json(req), signal)
 
+export const getTrace = (traceId: string, signal?: AbortSignal) =>
+  call(`/api/traces/${encodeURIComponent(traceId)}`, TraceResponseSchema, undefined, signal)
+
 // /api/mcp-status returns an envelope; we extract the servers array for simple consumers.
 export const getMcpStatus = async (signal?: AbortSignal): Promise<McpServer[]> => {
   const env = await call('/api/mcp-status', McpStatusResponseSchema, undefined, signal)
@@ -33,6 +33,7 @@ export async function send(input: string) {
       status: 'ok',
       provider: res.provider,
       model: res.model,
+      traceId: res.trace_id ?? undefined,
     })
     for (const tc of res.tool_calls) {
       const ok = tc.result != null && !String(tc.result).startsWith('Error')
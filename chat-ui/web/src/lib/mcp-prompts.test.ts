@@ -19,12 +19,14 @@ const REAL_TOOLS_BY_MCP: Record<string, string[]> = {
   'mcp-registry': [
     'list_registry_images', 'list_registries',
     'list_image_tags', 'get_image_manifest', 'tag_image',
+    'describe_registry',
+    'diff_registries',
   ],
   'mcp-promotion': [
     'promote_image', 'list_promotions', 'get_promotion_status',
   ],
   'mcp-runner': [
-    'build_image', 'scan_image', 'deploy_app',
+    'build_image', 'scan_image', 'deploy_app', 'deploy_many',
   ],
 }
 
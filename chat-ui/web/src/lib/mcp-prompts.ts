@@ -38,7 +38,8 @@ const PROMPTS: Record<string, PromptSuggestion[]> = {
   'mcp-registry': [
     { prompt: 'What registries are configured?', tool: 'list_registries' },
     { prompt: 'What images are in the dev registry?', tool: 'list_registry_images' },
-    { prompt: 'Compare what\'s in registry-dev vs registry-prod.', hint: 'two list_registry_images calls' },
+    { prompt: 'What\'s in prod? Every image, tag, digest and size.', tool: 'describe_registry', hint: 'one call instead of list → tags → manifest per tag' },
+    { prompt: 'Compare what\'s in registry-dev vs registry-prod.', tool: 'diff_registries', hint: 'only-in-dev, only-in-prod, and same tag with a different digest' },
     { prompt: 'List all tags for hello-app in registry-dev.', tool: 'list_image_tags' },
     { prompt: 'Show me the manifest digest for hello-app:latest in registry-dev.', tool: 'get_image_manifest', hint: 'digest is the content-hash audit trail' },
     { prompt: 'Tag hello-app:latest as v1.0.0 in registry-dev.', tool: 'tag_image', hint: 'use this before promoting so the prod registry has a versioned tag' },
@@ -52,6 +53,7 @@ const PROMPTS: Record<string, PromptSuggestion[]> = {
     { prompt: 'Build the hello world app.', tool: 'build_image', hint: 'no args needed — defaults to the lab\'s seeded sample-app' },
     { prompt: 'Scan the hello world app image.', tool: 'scan_image' },
     { prompt: 'Deploy the hello world app to dev.', tool: 'deploy_app' },
+    { prompt: 'Deploy the hello world app to dev, staging and prod at once.', tool: 'deploy_many', hint: 'pulls the image once and waits for every /health' },
     { prompt: 'Build, scan, promote, and deploy the hello world app — full pipeline.', hint: 'chains build_image + scan_image + promote_image + deploy_app' },
   ],
 }
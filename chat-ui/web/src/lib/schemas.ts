@@ -35,9 +35,35 @@ export const ChatResponseSchema = z.object({
   hallucination_mode: z.boolean().default(false),
   provider: z.string().default(''),
   model: z.string().default(''),
+  // Set when the backend traces (TRACE_DIR); fetch the spans from /api/traces/{id}.
+  trace_id: z.string().nullable().optional(),
 })
 export type ChatResponse = z.infer<typeof ChatResponseSchema>
 
+// One span of a chat turn's trace, as /api/traces/{trace_id} returns it.
+// Times are ms from the start of the trace; self_ms is the span's duration
+// minus its children's, i.e. time spent in that step itself.
+export const TraceSpanSchema = z.object({
+  span_id: z.string(),
+  parent_id: z.string().nullable(),
+  name: z.string(),
+  service: z.string(),
+  kind: z.string().default('internal'),
+  start_ms: z.number(),
+  duration_ms: z.number(),
+  self_ms: z.number(),
+  attributes: z.record(z.string(), z.unknown()).default({}),
+  error: z.string().nullable().optional(),
+})
+export type TraceSpan = z.infer<typeof TraceSpanSchema>
+
+export const TraceResponseSchema = z.object({
+  trace_id: z.string(),
+  duration_ms: z.number(),
+  spans: z.array(TraceSpanSchema),
+})
+export type TraceResponse = z.infer<typeof TraceResponseSchema>
+
 // McpServerSchema represents a single server entry.
 // The backend check_servers() returns: name, url, port, status, tools (string[]), tool_count.
 // latency_ms is not currently returned by the backend but is kept optional for future use.
@@ -15,6 +15,8 @@ export type ChatMessageView = {
   // each message — useful when switching providers mid-conversation.
   provider?: string
   model?: string
+  // Trace of the turn that produced this message, when the backend traces.
+  traceId?: string
 }
 
 export type TraceEntry = {
@@ -11,7 +11,7 @@ describe('tool-verify', () => {
     expect(verifyFor('not_a_real_tool')).toBeNull()
   })
 
-  it('scan_image has no verifier (pure mock)', () => {
+  it('scan_image has no verifier (report is computed by the runner)', () => {
     expect(verifyFor('scan_image')).toBeNull()
   })
 
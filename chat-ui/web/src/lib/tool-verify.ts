@@ -8,7 +8,7 @@
 //
 // URLs are localhost-from-host (the chat-ui's /api/probe rewrites them to
 // docker-network-internal hostnames before fetching). Tools without a
-// verifiable source — pure mocks like scan_image — return null, and the
+// verifiable source — like scan_image, whose report is computed by the runner — return null, and the
 // Verify button doesn't render for them.
 
 export type VerifySpec = {
@@ -139,6 +139,14 @@ const VERIFY: Record<string, VerifySpec> = {
       `http://localhost:${regPort(a.registry)}/v2/${str(a.image_name ?? a.image)}/manifests/${str(a.tag, 'latest')}`,
     hint: 'Raw manifest — note the schemaVersion / config digest.',
   },
+  describe_registry: {
+    url: (a) => `http://localhost:${regPort(a.registry)}/v2/_catalog`,
+    hint: 'Catalog the description was built from — every image listed should be here.',
+  },
+  diff_registries: {
+    url: () => 'http://localhost:3001/api/registries/diff',
+    hint: 'Same diff computed by the chat-ui backend — the two should agree.',
+  },
   tag_image: {
     url: (a) =>
       `http://localhost:${regPort(a.registry)}/v2/${str(a.image_name ?? a.image)}/tags/list`,
@@ -165,7 +173,7 @@ const VERIFY: Record<string, VerifySpec> = {
       `http://localhost:5001/v2/${str(a.image_name, 'hello-app')}/tags/list`,
     hint: 'Tags in registry-dev — proves the freshly built image landed.',
   },
-  // scan_image is a pure mock; no source-of-truth URL. Verify button
+  // scan_image's report is computed by the runner; no source-of-truth URL. Verify button
   // suppressed by absence from this map.
   deploy_app: {
     url: (a) => `http://localhost:${envPort(a.environment)}/`,
@@ -0,0 +1,171 @@
+"""Round-robin TCP load balancer for deploy_app's replicas.
+
+deploy_app(replicas=N) runs N hello-app-<env>-<i> containers that share a
+network alias (hello-app-<env>-pool) and puts this in front of them as
+hello-app-<env>, on the env's host port. It ships in the runner's image:
+
+    BALANCER_BACKENDS=hello-app-dev-pool:8080 python -m mcp_server.balancer
+
+Each client connection is proxied, byte for byte, to the next healthy
+backend in round-robin order. Membership is refreshed every
+BALANCER_HEALTH_INTERVAL seconds by resolving BALANCER_BACKENDS again
+(every address behind a shared alias) and GETting BALANCER_HEALTH_PATH
+from each, so replicas a redeploy adds or removes join and leave without
+restarting the balancer. A backend that refuses a connection is dropped at
+once and the client is handed to the next one; with none left it gets a
+503.
+
+Environment:
+  BALANCER_BACKENDS          comma-separated host:port list (required)
+  BALANCER_LISTEN_PORT       default 8080
+  BALANCER_HEALTH_PATH       default /health
+  BALANCER_HEALTH_INTERVAL   seconds, default 1
+
+Standard library only.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+
+log = logging.getLogger("balancer")
+
+Address = tuple[str, int]
+
+_UNAVAILABLE = (
+    b"HTTP/1.1 503 Service Unavailable\r\n"
+    b"Content-Type: text/plain\r\nContent-Length: 20\r\nConnection: close\r\n\r\n"
+    b"no healthy backends\n"
+)
+_CHUNK = 64 * 1024
+
+
+class Pool:
+    """The backends behind the balancer, and which of them are healthy."""
+
+    def __init__(self, backends: list[Address], health_path: str = "/health",
+                 interval: float = 1.0, timeout: float = 2.0):
+        self.backends = backends
+        self.health_path = health_path
+        self.interval = interval
+        self.timeout = timeout
+        self.members: list[Address] = []
+        self._next = 0
+
+    async def _resolve(self) -> list[Address]:
+        loop = asyncio.get_running_loop()
+        found: set[Address] = set()
+        for host, port in self.backends:
+            try:
+                infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            except socket.gaierror:
+                continue  # no container answers to that name right now
+            found.update((info[4][0], info[4][1]) for info in infos)
+        return sorted(found)
+
+    async def _healthy(self, addr: Address) -> bool:
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(*addr), self.timeout)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        try:
+            writer.write(f"GET {self.health_path} HTTP/1.0\r\nHost: {addr[0]}\r\n\r\n".encode())
+            status = await asyncio.wait_for(reader.readline(), self.timeout)
+            return status.split(b" ", 2)[1:2] == [b"200"]
+        except (OSError, asyncio.TimeoutError):
+            return False
+        finally:
+            writer.close()
+
+    async def refresh(self) -> None:
+        addrs = await self._resolve()
+        checks = await asyncio.gather(*(self._healthy(a) for a in addrs))
+        members = [a for a, ok in zip(addrs, checks) if ok]
+        if members != self.members:
+            log.info("members: %s", ", ".join(f"{h}:{p}" for h, p in members) or "none")
+        self.members = members
+
+    async def watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.refresh()
+
+    def candidates(self) -> list[Address]:
+        """Every member, starting from the next one in round-robin order."""
+        members = self.members
+        if not members:
+            return []
+        start = self._next % len(members)
+        self._next = start + 1
+        return members[start:] + members[:start]
+
+    def drop(self, addr: Address) -> None:
+        """Take a backend out until the next refresh finds it healthy again."""
+        self.members = [m for m in self.members if m != addr]
+
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while data := await reader.read(_CHUNK):
+            writer.write(data)
+            await writer.drain()
+        if writer.can_write_eof():
+            writer.write_eof()
+    except OSError:
+        pass
+
+
+async def proxy(pool: Pool, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Hand one client connection to a backend."""
+    try:
+        for addr in pool.candidates():
+            try:
+                up_reader, up_writer = await asyncio.wait_for(asyncio.open_connection(*addr), pool.timeout)
+            except (OSError, asyncio.TimeoutError):
+                pool.drop(addr)
+                continue
+            try:
+                await asyncio.gather(_pipe(reader, up_writer), _pipe(up_reader, writer))
+            finally:
+                up_writer.close()
+            return
+        writer.write(_UNAVAILABLE)
+        await writer.drain()
+    except OSError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(pool: Pool, port: int, host: str = "0.0.0.0") -> asyncio.Server:
+    return await asyncio.start_server(lambda r, w: proxy(pool, r, w), host, port)
+
+
+def parse_backends(spec: str) -> list[Address]:
+    backends = []
+    for item in spec.split(","):
+        host, _, port = item.strip().rpartition(":")
+        if not host or not port.isdigit():
+            raise ValueError(f"backend must be host:port, got {item!r}")
+        backends.append((host, int(port)))
+    return backends
+
+
+async def main() -> None:
+    pool = Pool(
+        parse_backends(os.environ["BALANCER_BACKENDS"]),
+        health_path=os.environ.get("BALANCER_HEALTH_PATH", "/health"),
+        interval=float(os.environ.get("BALANCER_HEALTH_INTERVAL", "1")),
+    )
+    port = int(os.environ.get("BALANCER_LISTEN_PORT", "8080"))
+    await pool.refresh()
+    server = await serve(pool, port)
+    log.info("balancing :%d over %s", port, os.environ["BALANCER_BACKENDS"])
+    async with server:
+        await asyncio.gather(server.serve_forever(), pool.watch())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+"""Commit-keyed build results for build_image.
+
+LLMs retry pipelines freely, and a rebuild of the same commit produces the
+same image. Each successful build is recorded as
+
+    (repo URL, commit, Dockerfile blob ID, image name[, build options])
+        -> manifest digest
+
+in RUNNER_CACHE_DIR/builds.json. On a hit build_image only has to retag
+that digest in registry-dev. Entries are checked against the registry
+before use (the lab's Clear button can wipe it), and only the newest
+BUILD_CACHE_SIZE are kept.
+"""
+
+import json
+import os
+import time
+
+from . import config
+from .git_mirror import strip_credentials
+
+
+def _path() -> str:
+    return os.path.join(config.RUNNER_CACHE_DIR, "builds.json")
+
+
+def key(repo_url: str, commit: str, dockerfile: str, image_name: str,
+        options: dict | None = None) -> str:
+    """options (build args, target) are only part of the key when set, so
+    plain builds keep their existing entries."""
+    parts = [strip_credentials(repo_url), commit, dockerfile, image_name]
+    if options:
+        parts.append(json.dumps(options, sort_keys=True))
+    return "|".join(parts)
+
+
+def _load() -> dict[str, dict]:
+    try:
+        with open(_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save(entries: dict[str, dict]) -> None:
+    os.makedirs(config.RUNNER_CACHE_DIR, exist_ok=True)
+    tmp = f"{_path()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(entries, f)
+    os.replace(tmp, _path())
+
+
+def lookup(cache_key: str) -> dict | None:
+    return _load().get(cache_key)
+
+
+def store(cache_key: str, digest: str) -> None:
+    entries = _load()
+    entries[cache_key] = {"digest": digest, "built_at": time.time()}
+    if len(entries) > config.BUILD_CACHE_SIZE:
+        newest = sorted(entries.items(), key=lambda kv: kv[1]["built_at"], reverse=True)
+        entries = dict(newest[:config.BUILD_CACHE_SIZE])
+    _save(entries)
+
+
+def forget(cache_key: str) -> None:
+    entries = _load()
+    if entries.pop(cache_key, None) is not None:
+        _save(entries)
@@ -0,0 +1,93 @@
+"""Concurrency control for build_image.
+
+Several chat sessions can share one runner, and every build is a clone +
+engine build + push. Two rules keep that predictable:
+
+  - At most BUILD_CONCURRENCY builds hold an engine slot at once; the rest
+    wait in FIFO order and are told their queue position via
+    ctx.report_progress.
+  - Single flight per (image, tag): a duplicate request (same repo and
+    credentials) attaches to the build already in flight and gets its
+    result. A different request for the same image:tag waits for the
+    in-flight one to finish instead of racing its push.
+"""
+
+import asyncio
+from collections import deque
+from collections.abc import Awaitable, Callable, Hashable
+from contextlib import asynccontextmanager
+
+from mcp.server.fastmcp import Context
+
+from . import tracing
+
+
+class BuildScheduler:
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self._running = 0
+        self._queue: deque[object] = deque()
+        self._cond = asyncio.Condition()
+        # (image, tag) -> (request signature, task)
+        self._inflight: dict[Hashable, tuple[Hashable, asyncio.Task]] = {}
+
+    @asynccontextmanager
+    async def slot(self, ctx: Context | None = None):
+        """Hold one of the `limit` build slots, queueing FIFO for it."""
+        with tracing.span("build slot wait", **{"build.slots": self.limit, "build.running": self._running}):
+            ticket = object()
+            async with self._cond:
+                self._queue.append(ticket)
+                try:
+                    reported = None
+                    while not (self._running < self.limit and self._queue[0] is ticket):
+                        position = self._queue.index(ticket) + 1
+                        if ctx is not None and position != reported:
+                            reported = position
+                            await ctx.report_progress(
+                                0, message=f"queued for a build slot: position {position} "
+                                           f"({self._running} of {self.limit} building)",
+                            )
+                        await self._cond.wait()
+                except BaseException:
+                    self._queue.remove(ticket)
+                    self._cond.notify_all()
+                    raise
+                self._queue.popleft()
+                self._running += 1
+                self._cond.notify_all()  # the next ticket may also fit
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._running -= 1
+                self._cond.notify_all()
+
+    async def single_flight(
+        self,
+        key: Hashable,
+        signature: Hashable,
+        run: Callable[[], Awaitable[str]],
+        ctx: Context | None = None,
+    ) -> str:
+        """Run `run()` as the only build of `key`, or share the identical
+        one already in flight."""
+        while (current := self._inflight.get(key)) is not None:
+            current_sig, task = current
+            if current_sig == signature:
+                if ctx is not None:
+                    await ctx.info(f"an identical build of {key[0]}:{key[1]} is already running; waiting for its result")
+                return await asyncio.shield(task)
+            if ctx is not None:
+                await ctx.info(f"waiting for the in-flight build of {key[0]}:{key[1]} to finish")
+            await asyncio.wait([task])
+
+        task = asyncio.create_task(run())
+        self._inflight[key] = (signature, task)
+
+        def _done(t: asyncio.Task) -> None:
+            if self._inflight.get(key, (None, None))[1] is t:
+                del self._inflight[key]
+
+        task.add_done_callback(_done)
+        return await asyncio.shield(task)
@@ -1,5 +1,8 @@
 import httpx
 
+from .. import tracing
+from . import cassette
+
 
 def check_response(resp: httpx.Response):
     """Raise a descriptive error for non-2xx responses, including the API's detail message."""
@@ -11,3 +14,13 @@ def check_response(resp: httpx.Response):
     except Exception:
         detail = resp.text[:500]
     raise Exception(f"HTTP {resp.status_code}: {detail}")
+
+
+def http_client(**kwargs) -> httpx.AsyncClient:
+    """An AsyncClient for the upstream services, routed through the
+    record/replay cassette when CASSETTE_MODE is set (see cassette.py) and
+    traced when tracing is on."""
+    transport = tracing.instrument(cassette.transport())
+    if transport is not None:
+        kwargs.setdefault("transport", transport)
+    return httpx.AsyncClient(**kwargs)
@@ -0,0 +1,203 @@
+"""Record and replay the upstream HTTP the clients make.
+
+With CASSETTE_MODE=record every request to user-api, Gitea, the
+registries and promotion-service still goes out, and its response is
+appended to CASSETTE_PATH. With CASSETTE_MODE=replay nothing goes out:
+responses are served from that file, so the tools run with no backends at
+all. Requests the file has no answer for fail with CassetteMiss.
+
+The file is JSON Lines (gzip if the name ends in .gz), one exchange per
+line:
+
+    {"key": "GET registry-dev/v2/hello-app/tags/list", "status": 200,
+     "headers": {"content-type": "application/json"}, "body": "...", "ms": 3.1}
+
+Keys name the service by its config setting rather than its address
+(`user-api`, `gitea`, `registry-dev`, `registry-prod`,
+`promotion-service`), so a cassette recorded against localhost replays
+inside the lab and vice versa. A request body is matched by a short hash;
+request headers, credentials included, are never written. A key recorded
+several times replays its responses in order and then keeps repeating the
+last one, so a benchmark loop can call the same tool indefinitely.
+
+CASSETTE_LATENCY adds simulated upstream latency on replay: "recorded"
+sleeps for each exchange's recorded time, a number sleeps that many
+milliseconds, and empty (the default) answers immediately.
+"""
+
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+from .. import config
+
+# Response headers not worth keeping: per-connection, per-response, or
+# describing an encoding httpx has already undone.
+_DROP_HEADERS = {
+    "connection", "content-encoding", "content-length", "date", "keep-alive",
+    "server", "set-cookie", "transfer-encoding", "vary", "x-content-type-options",
+    "x-frame-options",
+}
+
+_SERVICES = {
+    "user-api": "USER_API_URL",
+    "gitea": "GITEA_URL",
+    "registry-dev": "DEV_REGISTRY_URL",
+    "registry-prod": "PROD_REGISTRY_URL",
+    "promotion-service": "PROMOTION_SERVICE_URL",
+}
+
+
+class CassetteMiss(httpx.TransportError):
+    """Replay was asked for a request the cassette never recorded."""
+
+
+def _open(path: str, mode: str):
+    return gzip.open(path, mode + "t") if path.endswith(".gz") else open(path, mode)
+
+
+def _service(url: httpx.URL) -> str:
+    origin = (url.scheme, url.host, url.port)
+    for name, setting in _SERVICES.items():
+        base = urlsplit(getattr(config, setting))
+        if (base.scheme, base.hostname, base.port) == origin:
+            return name
+    return f"{url.host}:{url.port}" if url.port else url.host
+
+
+def request_key(request: httpx.Request) -> str:
+    url = request.url
+    key = f"{request.method} {_service(url)}{url.raw_path.decode('ascii')}"
+    if request.content:
+        key += f" #{hashlib.sha256(request.content).hexdigest()[:12]}"
+    return key
+
+
+class Cassette:
+    """The exchanges in one cassette file and, on replay, where each key is up to."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: dict[str, list[dict]] = {}
+        self.cursor: dict[str, int] = {}
+        self._write_lock = threading.Lock()  # whole lines, in order, from worker threads
+
+    def load(self) -> "Cassette":
+        with _open(self.path, "r") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.entries.setdefault(entry["key"], []).append(entry)
+        return self
+
+    def next(self, key: str) -> dict | None:
+        entries = self.entries.get(key)
+        if not entries:
+            return None
+        i = self.cursor.get(key, 0)
+        self.cursor[key] = i + 1
+        return entries[min(i, len(entries) - 1)]
+
+    async def append(self, key: str, response: httpx.Response, ms: float) -> None:
+        """Append an exchange; the file (and gzip) work runs off the event
+        loop so it doesn't add to the latencies being recorded."""
+        headers = {k: v for k, v in response.headers.items() if k not in _DROP_HEADERS}
+        if response.request.method == "HEAD" and "content-length" in response.headers:
+            headers["content-length"] = response.headers["content-length"]
+        entry = {"key": key, "status": response.status_code, "headers": headers}
+        try:
+            entry["body"] = response.content.decode("utf-8")
+        except UnicodeDecodeError:
+            entry["body_b64"] = base64.b64encode(response.content).decode("ascii")
+        entry["ms"] = round(ms, 1)
+        await asyncio.to_thread(self._write, json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def _write(self, line: str) -> None:
+        with self._write_lock, _open(self.path, "a") as f:
+            f.write(line)
+
+
+def _delay(entry: dict) -> float:
+    latency = config.CASSETTE_LATENCY
+    if not latency:
+        return 0.0
+    if latency == "recorded":
+        return entry.get("ms", 0) / 1000
+    return float(latency) / 1000
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """Serves from the cassette on replay; on record, sends through `inner`
+    and appends what comes back."""
+
+    def __init__(self, cassette: Cassette, record: bool, inner: httpx.AsyncBaseTransport | None = None):
+        self.cassette = cassette
+        self.record = record
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        key = request_key(request)
+        if self.record:
+            start = time.perf_counter()
+            response = await self.inner.handle_async_request(request)
+            # The body has to be read to be recorded; hand back a copy since
+            # the stream is spent.
+            content = await response.aread()
+            ms = (time.perf_counter() - start) * 1000
+            await response.aclose()
+            headers = [(k, v) for k, v in response.headers.multi_items()
+                       if k not in ("content-encoding", "content-length", "transfer-encoding")]
+            if request.method == "HEAD" and "content-length" in response.headers:
+                headers.append(("content-length", response.headers["content-length"]))
+            response = httpx.Response(response.status_code, headers=headers, content=content,
+                                      request=request, extensions=response.extensions)
+            await self.cassette.append(key, response, ms)
+            return response
+
+        entry = self.cassette.next(key)
+        if entry is None:
+            raise CassetteMiss(f"cassette {self.cassette.path} has no recording for {key}", request=request)
+        delay = _delay(entry)
+        if delay:
+            await asyncio.sleep(delay)
+        content = base64.b64decode(entry["body_b64"]) if "body_b64" in entry else entry["body"].encode("utf-8")
+        return httpx.Response(entry["status"], headers=entry["headers"], content=content, request=request)
+
+    async def aclose(self) -> None:
+        if self.inner is not None:
+            await self.inner.aclose()
+
+
+_cassette: Cassette | None = None
+_loaded_as: tuple[str, str] | None = None
+
+
+def transport() -> httpx.AsyncBaseTransport | None:
+    """A transport for one client under the configured CASSETTE_MODE, or
+    None to talk to the network as usual."""
+    global _cassette, _loaded_as
+    mode = config.CASSETTE_MODE
+    if mode not in ("record", "replay"):
+        return None
+    if _loaded_as != (mode, config.CASSETTE_PATH):
+        _cassette = Cassette(config.CASSETTE_PATH)
+        if mode == "replay":
+            _cassette.load()
+        _loaded_as = (mode, config.CASSETTE_PATH)
+    if mode == "record":
+        return CassetteTransport(_cassette, record=True, inner=httpx.AsyncHTTPTransport())
+    return CassetteTransport(_cassette, record=False)
+
+
+def reset() -> None:
+    """Forget the loaded cassette (and replay positions); the next client
+    re-reads CASSETTE_PATH."""
+    global _cassette, _loaded_as
+    _cassette = _loaded_as = None
@@ -0,0 +1,515 @@
+"""Async client for the container engine's REST API over its unix socket.
+
+The runner used to shell out to `docker ...` / `podman --remote ...` for
+every build, save, load, rm and run — each one a fresh CLI process that
+re-negotiates the socket. This talks HTTP to the same socket instead.
+
+Two dialects sit behind /var/run/docker.sock (see engine.py):
+
+  - Docker → Docker Engine API, unversioned paths (`/build`, `/images/load`, …)
+  - Podman → libpod API under `/v4.0.0/libpod/...`; container create takes a
+    SpecGenerator body rather than Docker's Config/HostConfig shape.
+
+The dialect follows `engine.detected_engine()`, so CONTAINER_ENGINE_FORCE
+works here exactly as it did for the CLI path. Every call refreshes the
+detection first (a cache hit unless ENGINE_PROBE_TTL has passed), and a
+failed call invalidates it, so an engine switch is picked up on the next
+call instead of failing every call after it.
+"""
+
+import asyncio
+import json
+import os
+import re
+import tarfile
+import tempfile
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+
+import httpx
+
+from .. import config, engine, tracing
+from . import check_response
+
+
+LIBPOD_PREFIX = "/v4.0.0/libpod"
+
+# Builds and image transfers can run for minutes; only connecting is bounded.
+_TIMEOUT = httpx.Timeout(None, connect=5.0)
+_CHUNK = 1 << 20
+
+LogFn = Callable[[str], Awaitable[None]]
+
+
+def _libpod() -> bool:
+    return engine.detected_engine() == "podman"
+
+
+def _path(path: str) -> str:
+    return f"{LIBPOD_PREFIX}{path}" if _libpod() else path
+
+
+def _check(resp: httpx.Response) -> None:
+    """check_response, also re-probing the engine before the next call: a
+    dialect mismatch after an engine switch surfaces as a 404 or 400."""
+    if resp.status_code >= 400:
+        engine.invalidate()
+    check_response(resp)
+
+
+@asynccontextmanager
+async def _client(client: httpx.AsyncClient | None = None):
+    """Reuse the caller's client across a multi-step pipeline; otherwise
+    open one on the engine socket for this call."""
+    await engine.detect()
+    try:
+        if client is not None:
+            yield client
+            return
+        transport = tracing.instrument(httpx.AsyncHTTPTransport(uds=config.ENGINE_SOCKET))
+        async with httpx.AsyncClient(transport=transport, base_url="http://engine", timeout=_TIMEOUT) as c:
+            yield c
+    except httpx.TransportError:
+        engine.invalidate()
+        raise
+
+
+def _dockerignore(context_dir: str) -> list[tuple[bool, re.Pattern]]:
+    """The context's .dockerignore as (negated, pattern) rules in file order.
+
+    Patterns follow the Docker CLI: relative to the context root (a leading
+    `/` is dropped), `*` and `?` stop at `/`, `**` spans directories, and a
+    `!` rule re-includes what an earlier rule excluded.
+    """
+    try:
+        with open(os.path.join(context_dir, ".dockerignore")) as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return []
+    rules = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        negated = line.startswith("!")
+        pattern = os.path.normpath(line.removeprefix("!").strip()).lstrip("/")
+        regex = ""
+        for part in re.split(r"(\*\*/?|\*|\?)", pattern):
+            if part.startswith("**"):
+                regex += "(?:.*/)?" if part.endswith("/") else ".*"
+            elif part == "*":
+                regex += "[^/]*"
+            elif part == "?":
+                regex += "[^/]"
+            else:
+                regex += re.escape(part)
+        rules.append((negated, re.compile(regex)))
+    return rules
+
+
+def _ignored(path: str, rules: list[tuple[bool, re.Pattern]]) -> bool:
+    """Whether the last rule matching `path` or one of its parents excludes it."""
+    parts = path.split("/")
+    prefixes = ["/".join(parts[:i]) for i in range(1, len(parts) + 1)]
+    ignored = False
+    for negated, regex in rules:
+        if any(regex.fullmatch(p) for p in prefixes):
+            ignored = not negated
+    return ignored
+
+
+def _tar_context(context_dir: str) -> str:
+    """Write the build context to a temporary tarball and return its path.
+
+    .git and whatever .dockerignore excludes are left out; the Dockerfile
+    and .dockerignore themselves always go, as the Docker CLI sends them.
+    The caller streams the file and removes it.
+    """
+    rules = _dockerignore(context_dir)
+    prune = not any(negated for negated, _ in rules)  # nothing can re-include below
+    fd, path = tempfile.mkstemp(prefix="context-", suffix=".tar")
+    try:
+        with os.fdopen(fd, "wb") as f, tarfile.open(fileobj=f, mode="w") as tar:
+            for root, dirs, files in os.walk(context_dir):
+                rel = os.path.relpath(root, context_dir)
+                rel = "" if rel == "." else f"{rel}/"
+                dirs.sort()
+                kept = []
+                for d in dirs:
+                    name = f"{rel}{d}"
+                    if name == ".git":
+                        continue
+                    ignored = _ignored(name, rules)
+                    if not ignored:
+                        tar.add(os.path.join(root, d), arcname=name, recursive=False)
+                    if not (ignored and prune):
+                        kept.append(d)
+                dirs[:] = kept
+                for name in sorted(files):
+                    name = f"{rel}{name}"
+                    if name in ("Dockerfile", ".dockerignore") or not _ignored(name, rules):
+                        tar.add(os.path.join(context_dir, name), arcname=name)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+async def _iter_file(path: str):
+    with open(path, "rb") as f:
+        while chunk := await asyncio.to_thread(f.read, _CHUNK):
+            yield chunk
+
+
+async def _json_lines(resp: httpx.Response):
+    async for line in resp.aiter_lines():
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+async def build(
+    context_dir: str,
+    tag: str,
+    on_log: LogFn | None = None,
+    build_args: dict[str, str] | None = None,
+    target: str | None = None,
+    cache_from: list[str] | None = None,
+    client: httpx.AsyncClient | None = None,
+) -> str | None:
+    """Build context_dir's Dockerfile as `tag`; return the image ID if the
+    engine reported one.
+
+    Build output streams back as JSON lines (`{"stream": ...}`), forwarded
+    to on_log as they arrive. Both dialects share this stream format and
+    report a failed step as an `{"error": ...}` line on a 200 response.
+
+    cache_from names local images whose layers the Docker builder may
+    reuse. libpod has no equivalent parameter for local images: buildah
+    already matches cached layers against every image in its store.
+    """
+    archive = await asyncio.to_thread(_tar_context, context_dir)
+    params = {"t": tag, "rm": "true"}
+    if build_args:
+        params["buildargs"] = json.dumps(build_args)
+    if target:
+        params["target"] = target
+    if cache_from and not _libpod():
+        params["cachefrom"] = json.dumps(cache_from)
+    image_id = None
+    with tracing.span("engine build", **{"image.tag": tag}):
+        try:
+            async with _client(client) as c:
+                async with c.stream(
+                    "POST", _path("/build"),
+                    params=params,
+                    content=_iter_file(archive),
+                    headers={"Content-Type": "application/x-tar"},
+                ) as resp:
+                    if resp.status_code >= 400:
+                        await resp.aread()
+                        _check(resp)
+                    async for msg in _json_lines(resp):
+                        if msg.get("error"):
+                            raise Exception(f"build failed: {msg['error'].strip()}")
+                        if "aux" in msg and isinstance(msg["aux"], dict):
+                            image_id = msg["aux"].get("ID", image_id)
+                        text = (msg.get("stream") or "").strip()
+                        if text and on_log is not None:
+                            await on_log(text)
+        finally:
+            os.unlink(archive)
+    return image_id
+
+
+async def inspect_image(name: str, client: httpx.AsyncClient | None = None) -> dict | None:
+    """Image inspect JSON, or None if the engine doesn't have `name`.
+
+    `Id` is normalised to a `sha256:`-prefixed digest (libpod omits it).
+    """
+    async with _client(client) as c:
+        resp = await c.get(_path(f"/images/{name}/json"))
+    if resp.status_code == 404:
+        return None
+    _check(resp)
+    info = resp.json()
+    if not info["Id"].startswith("sha256:"):
+        info["Id"] = f"sha256:{info['Id']}"
+    return info
+
+
+class TarEntry:
+    """One member of a streamed tar; its data must be consumed (or skipped)
+    before the next member is read."""
+
+    def __init__(self, name: str, size: int, typeflag: bytes, reader: "_StreamReader"):
+        self.name = name
+        self.size = size
+        self.typeflag = typeflag
+        self._reader = reader
+        self._left = size
+
+    @property
+    def is_file(self) -> bool:
+        return self.typeflag in (b"0", b"\0")
+
+    async def chunks(self):
+        while self._left:
+            chunk = await self._reader.read_some(min(self._left, _CHUNK))
+            self._left -= len(chunk)
+            yield chunk
+
+    async def read(self) -> bytes:
+        return b"".join([c async for c in self.chunks()])
+
+    async def skip(self) -> None:
+        async for _ in self.chunks():
+            pass
+
+
+class _StreamReader:
+    def __init__(self, chunks):
+        self._chunks = chunks.__aiter__()
+        self._buf = b""
+
+    async def read_some(self, n: int) -> bytes:
+        """Up to n bytes (at least one unless the stream is exhausted)."""
+        if not self._buf:
+            self._buf = await anext(self._chunks, b"")
+            if not self._buf:
+                raise EOFError("truncated tar stream")
+        out, self._buf = self._buf[:n], self._buf[n:]
+        return out
+
+    async def read_exact(self, n: int) -> bytes:
+        parts = []
+        while n:
+            part = await self.read_some(n)
+            parts.append(part)
+            n -= len(part)
+        return b"".join(parts)
+
+
+def _tar_size(field: bytes) -> int:
+    if field[0] & 0x80:  # GNU base-256 for members over 8 GiB
+        return int.from_bytes(field[1:], "big")
+    return int(field.strip(b"\0 ") or b"0", 8)
+
+
+def _pax_records(data: bytes) -> dict[str, str]:
+    records = {}
+    while data:
+        length, _, rest = data.partition(b" ")
+        record, data = rest[:int(length) - len(length) - 1], data[int(length):]
+        key, _, value = record.rstrip(b"\n").partition(b"=")
+        records[key.decode()] = value.decode()
+    return records
+
+
+async def _iter_tar(chunks):
+    """Yield TarEntry for each member of a tar arriving as an async byte
+    stream — tarfile's stream mode needs a blocking file object, and an
+    image export shouldn't have to be staged on disk to be read."""
+    reader = _StreamReader(chunks)
+    overrides: dict[str, str] = {}
+    while True:
+        header = await reader.read_exact(512)
+        if header == b"\0" * 512:
+            return
+        name = header[0:100].rstrip(b"\0").decode()
+        if header[257:263] == b"ustar\0" and header[345:500].strip(b"\0"):
+            name = header[345:500].rstrip(b"\0").decode() + "/" + name
+        size = _tar_size(header[124:136])
+        typeflag = header[156:157]
+        padding = -size % 512
+        if typeflag in (b"x", b"L"):
+            data = await reader.read_exact(size)
+            await reader.read_exact(padding)
+            if typeflag == b"L":
+                overrides["path"] = data.rstrip(b"\0").decode()
+            else:
+                overrides.update(_pax_records(data))
+            continue
+        if typeflag == b"g":
+            await reader.read_exact(size + padding)
+            continue
+        name = overrides.pop("path", name)
+        size = int(overrides.pop("size", size))
+        overrides.clear()
+        entry = TarEntry(name, size, typeflag, reader)
+        yield entry
+        await entry.skip()
+        await reader.read_exact(-size % 512)
+
+
+async def iter_export(name: str, client: httpx.AsyncClient | None = None):
+    """Stream `name` as a docker-archive (GET /images/{name}/get), yielding
+    its tar members as they arrive. Closing the generator early stops the
+    transfer."""
+    async with _client(client) as c:
+        async with c.stream("GET", _path(f"/images/{name}/get")) as resp:
+            if resp.status_code >= 400:
+                await resp.aread()
+                _check(resp)
+            async for entry in _iter_tar(resp.aiter_bytes(_CHUNK)):
+                yield entry
+
+
+async def load_image(archive: str | AsyncIterator[bytes],
+                     client: httpx.AsyncClient | None = None) -> list[str]:
+    """Load a docker-archive — a tarball path, or its bytes as they are
+    produced; return the image names the engine reports."""
+    async with _client(client) as c:
+        resp = await c.post(
+            _path("/images/load"),
+            params=None if _libpod() else {"quiet": "1"},
+            content=_iter_file(archive) if isinstance(archive, str) else archive,
+            headers={"Content-Type": "application/x-tar"},
+        )
+    _check(resp)
+    if _libpod():
+        return resp.json().get("Names") or []
+    names = []
+    for line in resp.text.splitlines():
+        if not line.strip():
+            continue
+        msg = json.loads(line)
+        if msg.get("error"):
+            raise Exception(f"load failed: {msg['error'].strip()}")
+        text = msg.get("stream") or ""
+        if ":" in text:
+            names.append(text.split(":", 1)[1].strip())
+    return names
+
+
+async def tag_image(source: str, repo: str, tag: str, client: httpx.AsyncClient | None = None) -> None:
+    """Add repo:tag to an image already in the engine (by name or ID)."""
+    async with _client(client) as c:
+        resp = await c.post(_path(f"/images/{source}/tag"), params={"repo": repo, "tag": tag})
+    _check(resp)
+
+
+async def remove_container(name: str, client: httpx.AsyncClient | None = None) -> bool:
+    """Force-remove a container; False if it didn't exist."""
+    async with _client(client) as c:
+        resp = await c.delete(_path(f"/containers/{name}"), params={"force": "true"})
+    if resp.status_code == 404:
+        return False
+    _check(resp)
+    return True
+
+
+async def stop_container(name: str, timeout: int = 1, client: httpx.AsyncClient | None = None) -> bool:
+    """Stop a container (freeing its host ports) but keep it, killing it
+    after `timeout` seconds; False if it didn't exist."""
+    params = {"timeout": timeout} if _libpod() else {"t": timeout}
+    async with _client(client) as c:
+        resp = await c.post(_path(f"/containers/{name}/stop"), params=params)
+    if resp.status_code == 404:
+        return False
+    # 304: already stopped.
+    if resp.status_code != 304:
+        _check(resp)
+    return True
+
+
+async def inspect_container(name: str, client: httpx.AsyncClient | None = None) -> dict | None:
+    """Container details (Docker's inspect shape in both dialects), or None
+    if there is no such container."""
+    async with _client(client) as c:
+        resp = await c.get(_path(f"/containers/{name}/json"))
+    if resp.status_code == 404:
+        return None
+    _check(resp)
+    return resp.json()
+
+
+async def rename_container(name: str, new_name: str, client: httpx.AsyncClient | None = None) -> None:
+    async with _client(client) as c:
+        resp = await c.post(_path(f"/containers/{name}/rename"), params={"name": new_name})
+    _check(resp)
+
+
+async def create_container(
+    name: str,
+    image: str,
+    network: str | None = None,
+    ports: dict[int, int] | None = None,
+    aliases: list[str] | None = None,
+    env: dict[str, str] | None = None,
+    command: list[str] | None = None,
+    labels: dict[str, str] | None = None,
+    client: httpx.AsyncClient | None = None,
+) -> str:
+    """Create (don't start) a container; ports maps container port -> host port.
+    aliases are extra DNS names for it on `network` (several containers may
+    share one). Returns the container ID."""
+    ports = ports or {}
+    if _libpod():
+        spec: dict = {
+            "name": name,
+            "image": image,
+            "portmappings": [
+                {"container_port": cport, "host_port": hport, "protocol": "tcp"}
+                for cport, hport in ports.items()
+            ],
+        }
+        if network:
+            spec["netns"] = {"nsmode": "bridge"}
+            spec["Networks"] = {network: {"aliases": aliases} if aliases else {}}
+        if env:
+            spec["env"] = env
+        if command:
+            spec["command"] = command
+        if labels:
+            spec["labels"] = labels
+        async with _client(client) as c:
+            resp = await c.post(_path("/containers/create"), json=spec)
+    else:
+        body: dict = {
+            "Image": image,
+            "ExposedPorts": {f"{cport}/tcp": {} for cport in ports},
+            "HostConfig": {
+                "PortBindings": {
+                    f"{cport}/tcp": [{"HostPort": str(hport)}] for cport, hport in ports.items()
+                },
+            },
+        }
+        if network:
+            body["HostConfig"]["NetworkMode"] = network
+            if aliases:
+                body["NetworkingConfig"] = {"EndpointsConfig": {network: {"Aliases": aliases}}}
+        if env:
+            body["Env"] = [f"{k}={v}" for k, v in env.items()]
+        if command:
+            body["Cmd"] = command
+        if labels:
+            body["Labels"] = labels
+        async with _client(client) as c:
+            resp = await c.post(_path("/containers/create"), params={"name": name}, json=body)
+    _check(resp)
+    return resp.json()["Id"]
+
+
+async def start_container(container_id: str, client: httpx.AsyncClient | None = None) -> None:
+    async with _client(client) as c:
+        resp = await c.post(_path(f"/containers/{container_id}/start"))
+    # 304: already running.
+    if resp.status_code != 304:
+        _check(resp)
+
+
+async def run_container(
+    name: str,
+    image: str,
+    network: str | None = None,
+    ports: dict[int, int] | None = None,
+    client: httpx.AsyncClient | None = None,
+    **options,
+) -> str:
+    """create + start, the API equivalent of `run -d`. Returns the container
+    ID; options are create_container's (aliases, env, command, labels)."""
+    async with _client(client) as c:
+        container_id = await create_container(name, image, network=network, ports=ports, client=c, **options)
+        await start_container(container_id, client=c)
+    return container_id
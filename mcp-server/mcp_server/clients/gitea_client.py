@@ -1,7 +1,6 @@
-import httpx
 from .. import config
 from ..auth import gitea_headers
-from . import check_response
+from . import check_response, http_client
 
 
 # Every function takes optional username/password — when both are passed,
@@ -10,7 +9,7 @@ from . import check_response
 
 
 async def list_repos(username: str | None = None, password: str | None = None) -> list[dict]:
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         resp = await client.get(
             f"{config.GITEA_URL}/api/v1/repos/search",
             headers=gitea_headers(username, password),
@@ -22,7 +21,7 @@ async def list_repos(username: str | None = None, password: str | None = None) -
 
 
 async def get_repo(owner: str, repo: str, username: str | None = None, password: str | None = None) -> dict:
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         resp = await client.get(
             f"{config.GITEA_URL}/api/v1/repos/{owner}/{repo}",
             headers=gitea_headers(username, password),
@@ -34,7 +33,7 @@ async def get_repo(owner: str, repo: str, username: str | None = None, password:
 
 async def create_repo(name: str, description: str = "", private: bool = False,
                       username: str | None = None, password: str | None = None) -> dict:
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         resp = await client.post(
             f"{config.GITEA_URL}/api/v1/user/repos",
             headers=gitea_headers(username, password),
@@ -47,7 +46,7 @@ async def create_repo(name: str, description: str = "", private: bool = False,
 
 async def list_branches(owner: str, repo: str,
                         username: str | None = None, password: str | None = None) -> list[dict]:
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         resp = await client.get(
             f"{config.GITEA_URL}/api/v1/repos/{owner}/{repo}/branches",
             headers=gitea_headers(username, password),
@@ -59,7 +58,7 @@ async def list_branches(owner: str, repo: str,
 
 async def create_branch(owner: str, repo: str, branch_name: str, old_branch: str = "main",
                         username: str | None = None, password: str | None = None) -> dict:
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         resp = await client.post(
             f"{config.GITEA_URL}/api/v1/repos/{owner}/{repo}/branches",
             headers=gitea_headers(username, password),
@@ -72,7 +71,7 @@ async def create_branch(owner: str, repo: str, branch_name: str, old_branch: str
 
 async def get_file(owner: str, repo: str, filepath: str, ref: str = "main",
                    username: str | None = None, password: str | None = None) -> dict:
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         resp = await client.get(
             f"{config.GITEA_URL}/api/v1/repos/{owner}/{repo}/contents/{filepath}",
             headers=gitea_headers(username, password),
@@ -87,7 +86,7 @@ async def create_file(owner: str, repo: str, filepath: str, content: str,
                       message: str = "Add file", branch: str = "main",
                       username: str | None = None, password: str | None = None) -> dict:
     import base64
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         resp = await client.post(
             f"{config.GITEA_URL}/api/v1/repos/{owner}/{repo}/contents/{filepath}",
             headers=gitea_headers(username, password),
@@ -1,59 +1,476 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from contextlib import aclosing, asynccontextmanager
+
 import httpx
 from .. import config
-from . import check_response
+from . import check_response, http_client
+
+
+MANIFEST_ACCEPT = (
+    "application/vnd.docker.distribution.manifest.v2+json, "
+    "application/vnd.oci.image.manifest.v1+json"
+)
+
+# Manifests are immutable once addressed by digest, so they can be cached
+# indefinitely (LRU-bounded). Keeping the raw bytes means a retag PUTs back
+# exactly what the registry served — re-serializing the parsed JSON can
+# reorder keys or change whitespace, which changes the digest. Keyed by
+# where the manifest was seen, so a digest is only served for a repo that
+# is known to have it.
+#   (registry_url, image, digest) -> (raw bytes, content type)
+_manifests: "OrderedDict[tuple[str, str, str], tuple[bytes, str]]" = OrderedDict()
+# Image config blobs are content-addressed too; only the fields we report
+# are kept.  config digest -> {"created", "os", "architecture"}
+_configs: "OrderedDict[str, dict]" = OrderedDict()
+
+# Tags are mutable, so tag -> digest and tag lists only live for
+# REGISTRY_TAG_CACHE_TTL seconds (and are LRU-bounded like the rest).
+#   (registry_url, image, tag) -> (expires_at, digest)
+_tag_digests: "OrderedDict[tuple[str, str, str], tuple[float, str]]" = OrderedDict()
+#   (registry_url, image) -> (expires_at, tags)
+_tag_lists: "OrderedDict[tuple[str, str], tuple[float, list[str]]]" = OrderedDict()
+#   (dev catalog fingerprint, prod catalog fingerprint, prefix) -> (expires_at, diff)
+_diffs: "OrderedDict[tuple[str, str, str], tuple[float, dict]]" = OrderedDict()
+
+
+def _registry_url(registry: str) -> str:
+    return config.DEV_REGISTRY_URL if registry == "dev" else config.PROD_REGISTRY_URL
+
+
+@asynccontextmanager
+async def _client(client: httpx.AsyncClient | None):
+    """Use the caller's client when fanning out (one connection pool for the
+    whole walk); otherwise open a short-lived one as every other call does."""
+    if client is not None:
+        yield client
+        return
+    async with http_client() as c:
+        yield c
+
+
+def clear_cache() -> None:
+    """Drop every cached manifest, config, tag resolution and tag list."""
+    _manifests.clear()
+    _configs.clear()
+    _tag_digests.clear()
+    _tag_lists.clear()
+    _diffs.clear()
+
+
+def _remember(cache: OrderedDict, key, value) -> None:
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > config.REGISTRY_MANIFEST_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def _remember_tag(url: str, image_name: str, tag: str, digest: str) -> None:
+    _remember(_tag_digests, (url, image_name, tag), (time.monotonic() + config.REGISTRY_TAG_CACHE_TTL, digest))
+
+
+def _fresh(entry: tuple[float, object] | None):
+    if entry is None or entry[0] < time.monotonic():
+        return None
+    return entry[1]
+
+
+async def iter_images(
+    registry: str = "dev",
+    prefix: str | None = None,
+    start_after: str | None = None,
+) -> AsyncIterator[str]:
+    """Yield repository names from /v2/_catalog, one page at a time.
+
+    A single catalog request only returns the registry's default page size,
+    so large registries come back truncated unless the `Link: <...>;
+    rel="next"` header is followed. Pages are fetched lazily — a caller that
+    stops iterating early never requests the rest.
+
+    The catalog is served in lexical order, which makes `prefix` cheap: the
+    walk starts just before the prefix and stops at the first name past it.
+    """
+    url = _registry_url(registry)
+    last = start_after
+    if prefix and len(prefix) > 1 and (last is None or last < prefix[:-1]):
+        last = prefix[:-1]
+    params: dict | None = {"n": config.REGISTRY_CATALOG_PAGE_SIZE}
+    if last:
+        params["last"] = last
+
+    next_url: str | None = f"{url}/v2/_catalog"
+    async with http_client() as client:
+        while next_url:
+            resp = await client.get(next_url, params=params, timeout=10.0)
+            check_response(resp)
+            for name in resp.json().get("repositories") or []:
+                if prefix and not name.startswith(prefix):
+                    if name > prefix:
+                        return
+                    continue
+                yield name
+            link = resp.links.get("next", {}).get("url")
+            # The Link target already carries n/last; don't re-send ours.
+            next_url = str(resp.url.join(link)) if link else None
+            params = None
 
 
 async def list_images(registry: str = "dev") -> list[str]:
-    url = config.DEV_REGISTRY_URL if registry == "dev" else config.PROD_REGISTRY_URL
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"{url}/v2/_catalog", timeout=10.0)
+    return [name async for name in iter_images(registry)]
+
+
+def visible_tags(tags: list[str]) -> list[str]:
+    """`tags` without build_image's layer-cache tag (BUILD_CACHE_TAG), which
+    lives next to the real tags in registry-dev but isn't a release."""
+    return [t for t in tags if t != config.BUILD_CACHE_TAG]
+
+
+async def list_tags(image_name: str, registry: str = "dev",
+                    client: httpx.AsyncClient | None = None) -> list[str]:
+    """An image's tags, minus the layer-cache tag (see visible_tags)."""
+    url = _registry_url(registry)
+    cached = _fresh(_tag_lists.get((url, image_name)))
+    if cached is not None:
+        return visible_tags(cached)
+    async with _client(client) as c:
+        resp = await c.get(f"{url}/v2/{image_name}/tags/list", timeout=10.0)
         check_response(resp)
-        return resp.json().get("repositories", [])
+        tags = resp.json().get("tags") or []
+    _remember(_tag_lists, (url, image_name), (time.monotonic() + config.REGISTRY_TAG_CACHE_TTL, tags))
+    return visible_tags(tags)
+
+
+async def _resolve_manifest(image_name: str, reference: str, registry: str,
+                            client: httpx.AsyncClient | None = None) -> tuple[str, bytes, str]:
+    """Return (digest, raw bytes, content type) for image:reference.
+
+    Order of preference:
+      1. reference is a digest this registry's repo served before → no request.
+      2. tag resolved within the TTL and its digest is cached → no request.
+      3. HEAD the reference; if the digest it names is cached → headers only.
+      4. GET the manifest and cache it.
+    """
+    url = _registry_url(registry)
+
+    def cached(digest: str) -> tuple[str, bytes, str] | None:
+        key = (url, image_name, digest)
+        if key not in _manifests:
+            return None
+        _manifests.move_to_end(key)
+        raw, content_type = _manifests[key]
+        return digest, raw, content_type
 
+    hit = cached(reference) or cached(_fresh(_tag_digests.get((url, image_name, reference))) or "")
+    if hit is not None:
+        return hit
 
-async def list_tags(image_name: str, registry: str = "dev") -> list[str]:
-    url = config.DEV_REGISTRY_URL if registry == "dev" else config.PROD_REGISTRY_URL
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"{url}/v2/{image_name}/tags/list", timeout=10.0)
+    manifest_url = f"{url}/v2/{image_name}/manifests/{reference}"
+    async with _client(client) as c:
+        head = await c.head(manifest_url, headers={"Accept": MANIFEST_ACCEPT}, timeout=10.0)
+        digest = head.headers.get("docker-content-digest", "") if head.status_code == 200 else ""
+        if digest and (hit := cached(digest)) is not None:
+            if not reference.startswith("sha256:"):
+                _remember_tag(url, image_name, reference, digest)
+            return hit
+
+        resp = await c.get(manifest_url, headers={"Accept": MANIFEST_ACCEPT}, timeout=10.0)
         check_response(resp)
-        return resp.json().get("tags", [])
+    raw = resp.content
+    content_type = resp.headers.get("content-type", "")
+    digest = resp.headers.get("docker-content-digest") or f"sha256:{hashlib.sha256(raw).hexdigest()}"
+    _remember(_manifests, (url, image_name, digest), (raw, content_type))
+    if not reference.startswith("sha256:"):
+        _remember_tag(url, image_name, reference, digest)
+    return digest, raw, content_type
 
 
-async def get_manifest(image_name: str, tag: str, registry: str = "dev") -> dict:
-    url = config.DEV_REGISTRY_URL if registry == "dev" else config.PROD_REGISTRY_URL
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            f"{url}/v2/{image_name}/manifests/{tag}",
-            headers={
-                "Accept": "application/vnd.docker.distribution.manifest.v2+json, "
-                          "application/vnd.oci.image.manifest.v1+json"
-            },
-            timeout=10.0,
-        )
+async def get_manifest(image_name: str, tag: str, registry: str = "dev",
+                       client: httpx.AsyncClient | None = None) -> dict:
+    digest, raw, content_type = await _resolve_manifest(image_name, tag, registry, client)
+    return {
+        "manifest": json.loads(raw),
+        "digest": digest,
+        "content_type": content_type,
+    }
+
+
+async def get_image_config(image_name: str, config_digest: str, registry: str = "dev",
+                           client: httpx.AsyncClient | None = None) -> dict:
+    """Return {"created", "os", "architecture"} from an image's config blob."""
+    if config_digest in _configs:
+        _configs.move_to_end(config_digest)
+        return dict(_configs[config_digest])
+    url = _registry_url(registry)
+    async with _client(client) as c:
+        resp = await c.get(f"{url}/v2/{image_name}/blobs/{config_digest}",
+                           follow_redirects=True, timeout=10.0)
         check_response(resp)
+    blob = resp.json()
+    summary = {
+        "created": blob.get("created", ""),
+        "os": blob.get("os", ""),
+        "architecture": blob.get("architecture", ""),
+    }
+    _remember(_configs, config_digest, summary)
+    return dict(summary)
+
+
+async def iter_blob(image_name: str, digest: str, registry: str = "dev",
+                    client: httpx.AsyncClient | None = None) -> AsyncIterator[bytes]:
+    """Stream a blob's bytes (following the registry's storage redirect)."""
+    url = _registry_url(registry)
+    async with _client(client) as c:
+        async with c.stream("GET", f"{url}/v2/{image_name}/blobs/{digest}",
+                            follow_redirects=True, timeout=httpx.Timeout(None, connect=10.0)) as resp:
+            if resp.status_code >= 400:
+                await resp.aread()
+                check_response(resp)
+            async for chunk in resp.aiter_bytes(1 << 20):
+                yield chunk
+
+
+async def catalog_snapshot(
+    registry: str = "dev",
+    prefix: str | None = None,
+    limit: int | None = None,
+    start_after: str | None = None,
+) -> tuple[list[str], bool]:
+    """Up to `limit` catalog names (all of them if None), and whether more
+    were left; the catalog stops being read once the limit is passed."""
+    images: list[str] = []
+    truncated = False
+    async with aclosing(iter_images(registry, prefix, start_after)) as names:
+        async for name in names:
+            if limit is not None and len(images) >= limit:
+                truncated = True
+                break
+            images.append(name)
+    return images, truncated
+
+
+async def _describe(registry: str, images: list[str],
+                    with_config: bool = True) -> dict[str, dict[str, dict]]:
+    """Fan out over `images` → tags → manifest (+ config blob unless
+    `with_config` is false — a digest comparison doesn't need it).
+
+    All requests share one connection pool and at most
+    REGISTRY_FANOUT_CONCURRENCY are in flight. The semaphore is only held
+    around individual requests, never across a nested gather, so the two
+    fan-out levels can't starve each other.
+    """
+    sem = asyncio.Semaphore(max(1, config.REGISTRY_FANOUT_CONCURRENCY))
+
+    async with http_client() as client:
+
+        async def describe_tag(image_name: str, tag: str) -> dict:
+            try:
+                async with sem:
+                    digest, raw, _ = await _resolve_manifest(image_name, tag, registry, client)
+                manifest = json.loads(raw)
+                size = sum(layer.get("size", 0) for layer in manifest.get("layers", []))
+                created = ""
+                config_digest = (manifest.get("config") or {}).get("digest")
+                if config_digest and with_config:
+                    async with sem:
+                        created = (await get_image_config(image_name, config_digest, registry, client))["created"]
+                return {"digest": digest, "size": size, "created": created}
+            except Exception as e:
+                return {"error": str(e)}
+
+        async def describe_image(image_name: str) -> dict[str, dict]:
+            try:
+                async with sem:
+                    tags = await list_tags(image_name, registry, client)
+            except Exception as e:
+                return {"*": {"error": str(e)}}
+            results = await asyncio.gather(*(describe_tag(image_name, t) for t in tags))
+            return dict(zip(tags, results))
+
+        described = await asyncio.gather(*(describe_image(name) for name in images))
+    return dict(zip(images, described))
+
+
+async def describe_images(
+    registry: str = "dev",
+    prefix: str | None = None,
+    limit: int = 50,
+) -> tuple[dict[str, dict[str, dict]], bool]:
+    """Resolve every tag of up to `limit` images to digest, compressed size
+    and creation time.
+
+    Returns ({image: {tag: {"digest", "size", "created"}}}, truncated). Tags
+    that fail to resolve carry {"error": ...} instead.
+    """
+    images, truncated = await catalog_snapshot(registry, prefix, limit)
+    return await _describe(registry, images), truncated
+
+
+def _short(digest: str) -> str:
+    return digest[:19]  # "sha256:" + 12 hex chars
+
+
+async def diff_registries(prefix: str | None = None) -> dict:
+    """Set-diff dev against prod by digest across every repository.
+
+    Returns {"only_in_dev": ["image:tag"], "only_in_prod": [...],
+    "digest_differs": [{"ref", "dev", "prod"}], "in_sync": N}, plus
+    "errors": [{"registry", "ref", "error"}] when some tag list or manifest
+    couldn't be read. A ref one side failed to read is left out of the other
+    side's only_in list rather than reported as missing. A catalog that
+    can't be read raises.
+
+    registry:2 doesn't send an ETag for /v2/_catalog, so each side's catalog
+    is fingerprinted by content instead. The computed diff is cached under
+    the pair of fingerprints. Because a tag can move inside a repository
+    without changing the catalog, the cache entry also expires after
+    REGISTRY_TAG_CACHE_TTL.
+    """
+    (dev_images, _), (prod_images, _) = await asyncio.gather(
+        catalog_snapshot("dev", prefix, None),
+        catalog_snapshot("prod", prefix, None),
+    )
+    key = (
+        hashlib.sha256("\n".join(dev_images).encode()).hexdigest(),
+        hashlib.sha256("\n".join(prod_images).encode()).hexdigest(),
+        prefix or "",
+    )
+    cached = _fresh(_diffs.get(key))
+    if cached is not None:
+        return {**cached, "cached": True}
+
+    dev, prod = await asyncio.gather(
+        _describe("dev", dev_images, with_config=False),
+        _describe("prod", prod_images, with_config=False),
+    )
+
+    def digests(side: dict) -> dict[str, str]:
         return {
-            "manifest": resp.json(),
-            "digest": resp.headers.get("docker-content-digest", ""),
-            "content_type": resp.headers.get("content-type", ""),
+            f"{image}:{tag}": info["digest"]
+            for image, tags in side.items()
+            for tag, info in tags.items()
+            if "digest" in info
         }
 
+    errors = [
+        {"registry": registry, "ref": f"{image}:{tag}", "error": info["error"]}
+        for registry, side in (("dev", dev), ("prod", prod))
+        for image, tags in side.items()
+        for tag, info in tags.items()
+        if "error" in info
+    ]
 
-async def tag_image(image_name: str, current_tag: str, new_tag: str, registry: str = "dev") -> bool:
-    """Retag an existing image by putting its manifest under a new tag."""
-    url = config.DEV_REGISTRY_URL if registry == "dev" else config.PROD_REGISTRY_URL
-    
-    # 1. Get the manifest of the current tag
-    data = await get_manifest(image_name, current_tag, registry)
-    manifest = data["manifest"]
-    content_type = data["content_type"]
-
-    # 2. Put the manifest under the new tag
-    async with httpx.AsyncClient() as client:
-        resp = await client.put(
-            f"{url}/v2/{image_name}/manifests/{new_tag}",
-            json=manifest,
+    def missing(refs: set[str], registry: str) -> list[str]:
+        # A ref `registry` couldn't read (or whose whole tag list, "image:*",
+        # it couldn't) isn't known to be missing there.
+        unread = {e["ref"] for e in errors if e["registry"] == registry}
+        return sorted(ref for ref in refs
+                      if ref not in unread and f"{ref.rsplit(':', 1)[0]}:*" not in unread)
+
+    dev_refs, prod_refs = digests(dev), digests(prod)
+    shared = dev_refs.keys() & prod_refs.keys()
+    differs = sorted(ref for ref in shared if dev_refs[ref] != prod_refs[ref])
+    result = {
+        "only_in_dev": missing(dev_refs.keys() - prod_refs.keys(), "prod"),
+        "only_in_prod": missing(prod_refs.keys() - dev_refs.keys(), "dev"),
+        "digest_differs": [
+            {"ref": ref, "dev": _short(dev_refs[ref]), "prod": _short(prod_refs[ref])}
+            for ref in differs
+        ],
+        "in_sync": len(shared) - len(differs),
+    }
+    if errors:
+        # Incomplete: report what failed, and don't cache it.
+        return {**result, "errors": errors, "cached": False}
+    _remember(_diffs, key, (time.monotonic() + config.REGISTRY_TAG_CACHE_TTL, result))
+    return {**result, "cached": False}
+
+
+async def blob_sizes(image_name: str, digests: list[str], registry: str = "dev",
+                     client: httpx.AsyncClient | None = None) -> dict[str, int | None]:
+    """HEAD each blob; map digest -> size, or None where the registry lacks it."""
+    url = _registry_url(registry)
+    sem = asyncio.Semaphore(max(1, config.REGISTRY_FANOUT_CONCURRENCY))
+
+    async def head(c: httpx.AsyncClient, digest: str) -> tuple[str, int | None]:
+        async with sem:
+            resp = await c.head(f"{url}/v2/{image_name}/blobs/{digest}", timeout=10.0)
+        if resp.status_code == 200:
+            return digest, int(resp.headers.get("content-length", 0))
+        return digest, None
+
+    async with _client(client) as c:
+        return dict(await asyncio.gather(*(head(c, d) for d in dict.fromkeys(digests))))
+
+
+async def upload_blob(image_name: str, chunks: AsyncIterator[bytes], registry: str = "dev",
+                      wanted: set[str] | None = None,
+                      client: httpx.AsyncClient | None = None) -> tuple[str, int] | None:
+    """Stream a blob into the registry; return (digest, size).
+
+    The body goes up as a single chunked PATCH, hashed on the way through,
+    so the digest needn't be known in advance. If `wanted` is given and
+    the digest turns out not to be in it, the upload session is cancelled
+    instead of committed and None is returned.
+    """
+    url = _registry_url(registry)
+    hasher = hashlib.sha256()
+    size = 0
+
+    async def body():
+        nonlocal size
+        async for chunk in chunks:
+            hasher.update(chunk)
+            size += len(chunk)
+            yield chunk
+
+    async with _client(client) as c:
+        resp = await c.post(f"{url}/v2/{image_name}/blobs/uploads/", timeout=10.0)
+        check_response(resp)
+        location = resp.url.join(resp.headers["location"])
+        resp = await c.patch(
+            location, content=body(),
+            headers={"Content-Type": "application/octet-stream"}, timeout=None,
+        )
+        check_response(resp)
+        location = resp.url.join(resp.headers["location"])
+        digest = f"sha256:{hasher.hexdigest()}"
+        if wanted is not None and digest not in wanted:
+            await c.delete(location, timeout=10.0)
+            return None
+        resp = await c.put(location.copy_merge_params({"digest": digest}), timeout=10.0)
+        check_response(resp)
+    return digest, size
+
+
+async def put_manifest(image_name: str, tag: str, raw: bytes, content_type: str,
+                       registry: str = "dev", client: httpx.AsyncClient | None = None) -> str:
+    """PUT raw manifest bytes under tag; return the manifest digest."""
+    url = _registry_url(registry)
+    async with _client(client) as c:
+        resp = await c.put(
+            f"{url}/v2/{image_name}/manifests/{tag}",
+            content=raw,
             headers={"Content-Type": content_type},
             timeout=10.0,
         )
         check_response(resp)
-        return True
+    digest = resp.headers.get("docker-content-digest") or f"sha256:{hashlib.sha256(raw).hexdigest()}"
+    _remember(_manifests, (url, image_name, digest), (raw, content_type))
+    _remember_tag(url, image_name, tag, digest)
+    _tag_lists.pop((url, image_name), None)
+    return digest
+
+
+async def tag_image(image_name: str, current_tag: str, new_tag: str, registry: str = "dev") -> bool:
+    """Retag an existing image by putting its manifest under a new tag.
+
+    The manifest's original bytes are PUT back unchanged, so the new tag
+    points at the same digest as the current one.
+    """
+    _, raw, content_type = await _resolve_manifest(image_name, current_tag, registry)
+    await put_manifest(image_name, new_tag, raw, content_type, registry)
+    return True
@@ -1,38 +1,37 @@
-import httpx
 from .. import config
-from . import check_response
+from . import check_response, http_client
 
 
 async def list_roles() -> list[dict]:
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         resp = await client.get(f"{config.USER_API_URL}/users/roles", timeout=10.0)
         check_response(resp)
         return resp.json()
 
 
 async def list_users() -> list[dict]:
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         resp = await client.get(f"{config.USER_API_URL}/users", timeout=10.0)
         check_response(resp)
         return resp.json()
 
 
 async def get_user(user_id: int) -> dict:
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         resp = await client.get(f"{config.USER_API_URL}/users/{user_id}", timeout=10.0)
         check_response(resp)
         return resp.json()
 
 
 async def get_user_by_username(username: str) -> dict:
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         resp = await client.get(f"{config.USER_API_URL}/users/by-username/{username}", timeout=10.0)
         check_response(resp)
         return resp.json()
 
 
 async def create_user(username: str, email: str, full_name: str, role: str) -> dict:
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         resp = await client.post(
             f"{config.USER_API_URL}/users",
             json={"username": username, "email": email, "full_name": full_name, "role": role},
@@ -43,7 +42,7 @@ async def create_user(username: str, email: str, full_name: str, role: str) -> d
 
 
 async def update_user(user_id: int, **kwargs) -> dict:
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         resp = await client.put(
             f"{config.USER_API_URL}/users/{user_id}",
             json={k: v for k, v in kwargs.items() if v is not None},
@@ -62,6 +61,6 @@ async def activate_user(user_id: int) -> dict:
 
 
 async def delete_user(user_id: int) -> None:
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         resp = await client.delete(f"{config.USER_API_URL}/users/{user_id}", timeout=10.0)
         check_response(resp)
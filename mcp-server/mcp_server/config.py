@@ -1,10 +1,23 @@
 import os
+import tempfile
 
 
 def _bool_env(key: str, default: bool = False) -> bool:
     return os.environ.get(key, str(default)).lower() in ("true", "1", "yes")
 
 
+def _latency_env(key: str) -> str:
+    """"", "recorded" or a number of milliseconds; anything else fails at
+    startup rather than in every request that would use it."""
+    value = os.environ.get(key, "").strip()
+    if value not in ("", "recorded"):
+        try:
+            float(value)
+        except ValueError:
+            raise ValueError(f'{key} must be empty, "recorded" or milliseconds, not {value!r}') from None
+    return value
+
+
 # Service URLs (compose service names or localhost for stdio mode)
 USER_API_URL = os.environ.get("USER_API_URL", "http://user-api:8001")
 GITEA_URL = os.environ.get("GITEA_URL", "http://gitea:3000")
@@ -14,6 +27,67 @@ PROD_REGISTRY_URL = os.environ.get("PROD_REGISTRY_URL", "http://registry-prod:50
 PROMOTION_SERVICE_URL = os.environ.get("PROMOTION_SERVICE_URL", "http://promotion-service:8002")
 DEV_REGISTRY_HOST = os.environ.get("DEV_REGISTRY_HOST", "registry-dev:5000")
 
+# Registry metadata caching (clients/registry_client.py). Manifests are
+# content-addressed, so they're cached by digest with an LRU bound; the
+# tag -> digest and tag-list views can move, so they only live for a few
+# seconds — long enough to absorb an LLM's burst of inspection calls.
+REGISTRY_TAG_CACHE_TTL = float(os.environ.get("REGISTRY_TAG_CACHE_TTL", "5"))
+REGISTRY_MANIFEST_CACHE_SIZE = int(os.environ.get("REGISTRY_MANIFEST_CACHE_SIZE", "256"))
+# Page size (`n`) requested from /v2/_catalog; pages are followed via the
+# registry's Link header.
+REGISTRY_CATALOG_PAGE_SIZE = int(os.environ.get("REGISTRY_CATALOG_PAGE_SIZE", "100"))
+# Max registry requests in flight when a tool fans out across many
+# images/tags (describe_registry, diff_registries).
+REGISTRY_FANOUT_CONCURRENCY = int(os.environ.get("REGISTRY_FANOUT_CONCURRENCY", "8"))
+
+# Container engine socket (mounted into mcp-runner). The runner talks the
+# Docker Engine / libpod REST API over it directly (clients/engine_client.py).
+ENGINE_SOCKET = os.environ.get("ENGINE_SOCKET", "/var/run/docker.sock")
+
+# Persistent runner state (a compose volume in the lab). Holds bare git
+# mirrors of built repos (git_mirror.py), the build result cache and the
+# per-layer scan index (scanner.py); least-recently-used mirrors are evicted once they exceed
+# GIT_MIRROR_BUDGET_MB in total.
+RUNNER_CACHE_DIR = os.environ.get(
+    "RUNNER_CACHE_DIR", os.path.join(tempfile.gettempdir(), "mcp-runner-cache"),
+)
+GIT_MIRROR_BUDGET_MB = int(os.environ.get("GIT_MIRROR_BUDGET_MB", "1024"))
+# build_image results remembered by (repo, commit, Dockerfile, image) so a
+# repeat build is just a retag (build_cache.py).
+BUILD_CACHE_SIZE = int(os.environ.get("BUILD_CACHE_SIZE", "500"))
+# Builds allowed to run against the engine at once; further build_image
+# calls queue FIFO (build_scheduler.py).
+BUILD_CONCURRENCY = int(os.environ.get("BUILD_CONCURRENCY", "2"))
+# Registry-backed layer cache: each build_image seeds the engine from
+# registry-dev's <image>:BUILD_CACHE_TAG and points that tag at its result,
+# so a warm rebuild survives an engine prune or switch. registry_client
+# leaves the tag out of tag listings (and so describe/diff).
+BUILD_CACHE_TAG = os.environ.get("BUILD_CACHE_TAG", "buildcache")
+
+# scan_image: the offline vulnerability DB (vuln_db.py; rebuild it from an
+# OSV export to refresh), how many per-layer scan results to keep in memory
+# in front of the on-disk index in RUNNER_CACHE_DIR, and how many worker
+# processes parse layers (scanner.py).
+VULN_DB_PATH = os.environ.get(
+    "VULN_DB_PATH", os.path.join(os.path.dirname(__file__), "data", "vulndb.tsv"),
+)
+SCAN_LAYER_CACHE_SIZE = int(os.environ.get("SCAN_LAYER_CACHE_SIZE", "1024"))
+SCAN_WORKERS = int(os.environ.get("SCAN_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# How long deploy_app / deploy_many wait for a new container's /health to answer.
+DEPLOY_READY_TIMEOUT = float(os.environ.get("DEPLOY_READY_TIMEOUT", "30"))
+
+# Image for deploy_app's replica balancer; empty means the runner's own.
+BALANCER_IMAGE = os.environ.get("BALANCER_IMAGE", "")
+
+# Upstream record/replay (clients/cassette.py): "record" saves every
+# response from user-api, Gitea, the registries and promotion-service to
+# CASSETTE_PATH; "replay" serves them from it with no backends running,
+# optionally slowed by CASSETTE_LATENCY ("recorded", or milliseconds).
+CASSETTE_MODE = os.environ.get("CASSETTE_MODE", "")
+CASSETTE_PATH = os.environ.get("CASSETTE_PATH", "mcp-cassette.jsonl")
+CASSETTE_LATENCY = _latency_env("CASSETTE_LATENCY")
+
 # Feature switches
 USER_MCP_ENABLED = _bool_env("USER_MCP_ENABLED")
 GITEA_MCP_ENABLED = _bool_env("GITEA_MCP_ENABLED")
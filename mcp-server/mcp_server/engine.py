@@ -1,4 +1,4 @@
-"""Engine-aware command dispatch for the runner / deploy tools.
+"""Container engine detection, shared by mcp-runner and chat-ui.
 
 The lab supports two container engines: Docker (Desktop) and Podman. Both
 expose a daemon socket at /var/run/docker.sock inside the runner container,
@@ -7,88 +7,158 @@ but they speak different APIs:
   - Docker → Docker Engine REST API (`Server: Docker/X.Y.Z` on /_ping)
   - Podman → libpod REST API (`Server: Libpod/X.Y.Z` on /_ping)
 
-`podman --remote --url unix:///var/run/docker.sock` works for the Podman
-case but returns 404 against Docker's API. So we auto-detect which engine
-is actually behind the socket — independent of any CONTAINER_ENGINE env
-var, which can drift if the user switched engines without rerunning
-setup. The env var is still honored as a forced override for users who
+libpod paths (`/v4.0.0/libpod/...`) work for the Podman case but return
+404 against Docker's API. So we auto-detect which engine is actually
+behind the socket — independent of any CONTAINER_ENGINE env var, which
+can drift if the user switched engines without rerunning setup.
+clients/engine_client.py picks its API dialect from the result. The env
+var CONTAINER_ENGINE_FORCE is honored as a forced override for users who
 want to test the other engine's path explicitly.
-"""
-import os
-import socket as _socket
 
+Detection is async and cached for ENGINE_PROBE_TTL seconds, so an engine
+switch is noticed without a restart; callers that hit an engine error
+call invalidate() to re-probe on the next use. The probe keeps one
+keep-alive connection to the socket, and concurrent callers share a
+single in-flight probe. Nothing probes at import time.
 
-_DETECTED_ENGINE: str | None = None
+chat-ui's image copies this file in (see chat-ui/Dockerfile), so it must
+only depend on the standard library and httpx.
+"""
+import asyncio
+import os
+import time
+from dataclasses import asdict, dataclass
 
+import httpx
 
-def _probe_socket_engine(path: str = "/var/run/docker.sock") -> str | None:
-    """Probe the bound socket and return 'docker' / 'podman' / None.
 
-    Speaks raw HTTP/1.0 over the unix socket — no extra dependencies. The
-    Docker daemon and Podman's docker-compat API both answer GET /_ping
-    with HTTP 200 OK and a `Server:` header that names the engine.
-    """
-    try:
-        s = _socket.socket(_socket.AF_UNIX)
-        s.settimeout(2.0)
-        s.connect(path)
-        s.send(b"GET /_ping HTTP/1.0\r\nHost: x\r\n\r\n")
-        chunks: list[bytes] = []
-        while True:
-            chunk = s.recv(4096)
-            if not chunk:
-                break
-            chunks.append(chunk)
-            if len(chunks) > 4:
-                break
-        s.close()
-        resp = b"".join(chunks).lower()
-        if b"server: docker" in resp:
-            return "docker"
-        if b"server: libpod" in resp:
-            return "podman"
-    except OSError:
-        pass
-    return None
+SOCKET_PATH = os.environ.get("ENGINE_SOCKET", "/var/run/docker.sock")
+PROBE_TTL = float(os.environ.get("ENGINE_PROBE_TTL", "30"))
+# A probe that found nothing (socket missing, daemon down) is retried sooner.
+_MISS_TTL = 5.0
 
 
-def detected_engine() -> str:
-    """Return the engine the lab should target.
+@dataclass(frozen=True)
+class EngineInfo:
+    name: str                       # "docker" | "podman"
+    source: str                     # "forced" | "probe" | "env"
+    version: str | None = None      # engine release, e.g. "27.3.1" / "5.2.2"
+    api_version: str | None = None  # Docker Engine API, or libpod API for Podman
 
-    Priority:
-      1. CONTAINER_ENGINE_FORCE (explicit override — useful for testing
-         the other engine's code path without flipping the daemon).
-      2. Socket probe — whoever is actually answering on /var/run/docker.sock.
-      3. CONTAINER_ENGINE env var (set by setup script).
-      4. Default: "docker".
+    def as_dict(self) -> dict:
+        return asdict(self)
 
-    Cached for the lifetime of the process.
-    """
-    global _DETECTED_ENGINE
-    if _DETECTED_ENGINE is not None:
-        return _DETECTED_ENGINE
 
+def _forced() -> EngineInfo | None:
     forced = os.environ.get("CONTAINER_ENGINE_FORCE", "").strip().lower()
     if forced in ("docker", "podman"):
-        _DETECTED_ENGINE = forced
-        return _DETECTED_ENGINE
+        return EngineInfo(forced, "forced")
+    return None
 
-    probed = _probe_socket_engine()
-    if probed:
-        _DETECTED_ENGINE = probed
-        return _DETECTED_ENGINE
 
-    _DETECTED_ENGINE = os.environ.get("CONTAINER_ENGINE", "docker").strip().lower() or "docker"
-    return _DETECTED_ENGINE
+def _fallback() -> EngineInfo:
+    name = os.environ.get("CONTAINER_ENGINE", "docker").strip().lower() or "docker"
+    return EngineInfo(name, "env")
+
+
+class EngineDetector:
+    def __init__(self, socket_path: str = SOCKET_PATH, ttl: float = PROBE_TTL):
+        self.socket_path = socket_path
+        self.ttl = ttl
+        self._info: EngineInfo | None = None
+        self._expires = 0.0
+        self._probing: asyncio.Future | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _http(self) -> httpx.AsyncClient:
+        # Connections belong to the event loop that opened them.
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(uds=self.socket_path),
+                base_url="http://engine",
+                timeout=2.0,
+            )
+            self._loop = loop
+        return self._client
+
+    async def _probe(self) -> EngineInfo:
+        """Ask whoever is answering on the socket: GET /_ping names the
+        engine in its Server header, GET /version has the release."""
+        try:
+            client = self._http()
+            ping = await client.get("/_ping")
+            server = ping.headers.get("server", "").lower()
+            if server.startswith("docker"):
+                name, api_version = "docker", ping.headers.get("api-version")
+            elif server.startswith("libpod"):
+                name, api_version = "podman", ping.headers.get("libpod-api-version")
+            else:
+                return _fallback()
+            version = None
+            resp = await client.get("/version")
+            if resp.status_code == 200:
+                body = resp.json()
+                version = body.get("Version")
+                api_version = api_version or body.get("ApiVersion")
+            return EngineInfo(name, "probe", version, api_version)
+        except (httpx.HTTPError, OSError, ValueError):
+            return _fallback()
+
+    async def get(self, refresh: bool = False) -> EngineInfo:
+        """The engine the lab should target.
+
+        Priority:
+          1. CONTAINER_ENGINE_FORCE (explicit override — useful for testing
+             the other engine's code path without flipping the daemon).
+          2. Socket probe — whoever is actually answering on the socket.
+          3. CONTAINER_ENGINE env var (set by setup script).
+          4. Default: "docker".
+        """
+        forced = _forced()
+        if forced is not None:
+            return forced
+        if not refresh and self._info is not None and time.monotonic() < self._expires:
+            return self._info
+        probing = self._probing
+        if probing is None or probing.done() or probing.get_loop() is not asyncio.get_running_loop():
+            probing = self._probing = asyncio.ensure_future(self._probe())
+        info = await asyncio.shield(probing)
+        if probing is self._probing:
+            self._info = info
+            self._expires = time.monotonic() + (self.ttl if info.source == "probe" else min(self.ttl, _MISS_TTL))
+        return info
+
+    def cached(self) -> EngineInfo:
+        """The last result, without I/O (the env fallback before any probe)."""
+        return _forced() or self._info or _fallback()
+
+    def invalidate(self) -> None:
+        """Re-probe on the next get(), e.g. after an engine call failed."""
+        self._expires = 0.0
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+detector = EngineDetector()
+
+
+async def detect(refresh: bool = False) -> EngineInfo:
+    return await detector.get(refresh)
 
 
-def engine_cmd(*subcommand: str) -> list[str]:
-    """Argv prefix for an engine subcommand.
+def detected_engine() -> str:
+    """Name of the engine from the last detection ("docker" / "podman").
 
-    docker engine → ["docker", *subcommand]
-    podman engine → ["podman", "--remote", "--url", PODMAN_REMOTE_URL, *subcommand]
+    Synchronous and I/O-free: async callers should `await detect()` first
+    (engine_client does, on every request) so this is fresh.
     """
-    if detected_engine() == "podman":
-        url = os.environ.get("PODMAN_REMOTE_URL", "unix:///var/run/docker.sock")
-        return ["podman", "--remote", "--url", url, *subcommand]
-    return ["docker", *subcommand]
+    return detector.cached().name
+
+
+def invalidate() -> None:
+    detector.invalidate()
@@ -0,0 +1,223 @@
+"""Persistent bare-mirror cache for build_image's git checkouts.
+
+build_image used to `git clone --depth 1` into a fresh temp dir on every
+call, refetching the whole tree from Gitea each time. Instead, each repo is
+kept as a bare mirror under RUNNER_CACHE_DIR/git-mirrors/ and every build
+gets a throwaway `git worktree` of it:
+
+  - First build of a repo: `git clone --bare`.
+  - Later builds: `git ls-remote URL HEAD` (a ref advertisement, no
+    objects). If that commit is already in the mirror there is nothing to
+    transfer; otherwise an incremental `git fetch`.
+
+Credentials are only ever on the command line — the mirror's stored remote
+URL is the credential-free one. Each mirror has an asyncio lock so two
+builds of the same repo don't fetch into it at once, and mirrors are
+evicted least-recently-used once their total size exceeds
+GIT_MIRROR_BUDGET_MB.
+"""
+
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import urllib.parse
+from contextlib import asynccontextmanager
+
+from mcp.server.fastmcp import Context
+
+from . import config, tracing
+
+
+_locks: dict[str, asyncio.Lock] = {}
+# mirror path -> number of builds currently using a worktree of it
+_in_use: dict[str, int] = {}
+
+
+class GitError(Exception):
+    """A git step failed; `step` names it for the tool's error JSON."""
+
+    def __init__(self, step: str, message: str):
+        super().__init__(message)
+        self.step = step
+
+
+def strip_credentials(url: str) -> str:
+    parsed = urllib.parse.urlparse(url)
+    if not parsed.username:
+        return url
+    netloc = parsed.hostname or ""
+    if parsed.port:
+        netloc += f":{parsed.port}"
+    return urllib.parse.urlunparse(parsed._replace(netloc=netloc))
+
+
+def _root() -> str:
+    return os.path.join(config.RUNNER_CACHE_DIR, "git-mirrors")
+
+
+def mirror_path(repo_url: str) -> str:
+    key = hashlib.sha256(strip_credentials(repo_url).encode()).hexdigest()[:32]
+    return os.path.join(_root(), f"{key}.git")
+
+
+def _subcommand(args: tuple[str, ...]) -> str:
+    words = iter(args)
+    for word in words:
+        if word in ("--git-dir", "-C", "-c"):
+            next(words, None)
+        elif not word.startswith("-"):
+            return word
+    return ""
+
+
+async def _git(
+    *args: str,
+    env: dict | None = None,
+    ctx: Context | None = None,
+    log_args: tuple[str, ...] | None = None,
+) -> tuple[int, bytes, bytes]:
+    shown = log_args if log_args is not None else args
+    if ctx is not None:
+        await ctx.info(f"$ git {' '.join(shown)}")
+    with tracing.span(f"git {_subcommand(shown)}", **{"process.command_line": " ".join(("git", *shown))}) as s:
+        proc = await asyncio.create_subprocess_exec(
+            "git", *args,
+            env=env,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await proc.communicate()
+        s.set("process.exit.code", proc.returncode)
+    return proc.returncode, stdout, stderr
+
+
+async def resolve_head(repo_url: str, clone_url: str, env: dict,
+                       ctx: Context | None = None) -> str:
+    """The remote's HEAD commit, from a ref advertisement only."""
+    rc, stdout, stderr = await _git(
+        "ls-remote", clone_url, "HEAD",
+        env=env, ctx=ctx, log_args=("ls-remote", repo_url, "HEAD"),
+    )
+    if rc != 0 or not stdout.strip():
+        raise GitError("git_ls_remote", stderr.decode(errors="replace").strip() or "remote has no HEAD")
+    return stdout.split()[0].decode()
+
+
+async def blob_id(repo_url: str, commit: str, path: str) -> str | None:
+    """Git object ID of `path` at `commit`, read from the local mirror only;
+    None if the mirror doesn't have it."""
+    mirror = mirror_path(repo_url)
+    if not os.path.isdir(mirror):
+        return None
+    rc, stdout, _ = await _git("--git-dir", mirror, "rev-parse", "--verify", "--quiet", f"{commit}:{path}")
+    return stdout.decode().strip() if rc == 0 else None
+
+
+async def _update(mirror: str, clone_url: str, repo_url: str, env: dict,
+                  ctx: Context | None, commit: str | None = None) -> str:
+    """Make sure the mirror has `commit` (default: the remote HEAD); return it."""
+    cloned = not os.path.isdir(mirror)
+    if cloned:
+        os.makedirs(_root(), exist_ok=True)
+        staging = f"{mirror}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        rc, _, stderr = await _git(
+            "clone", "--bare", "--quiet", clone_url, staging,
+            env=env, ctx=ctx, log_args=("clone", "--bare", repo_url, "<mirror>"),
+        )
+        if rc != 0:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise GitError("git_clone", stderr.decode(errors="replace").strip())
+        await _git("--git-dir", staging, "remote", "set-url", "origin", strip_credentials(repo_url))
+        os.rename(staging, mirror)
+        if commit is None:
+            rc, stdout, stderr = await _git("--git-dir", mirror, "rev-parse", "HEAD")
+            return stdout.decode().strip()
+    elif commit is None:
+        commit = await resolve_head(repo_url, clone_url, env, ctx)
+
+    rc, _, _ = await _git("--git-dir", mirror, "cat-file", "-e", f"{commit}^{{commit}}")
+    if rc == 0:
+        if ctx is not None and not cloned:
+            await ctx.info(f"git mirror already has {commit[:12]}; nothing to fetch")
+        return commit
+
+    rc, _, stderr = await _git(
+        "--git-dir", mirror, "fetch", "--prune", "--quiet", clone_url,
+        "+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*",
+        env=env, ctx=ctx, log_args=("fetch", repo_url),
+    )
+    if rc != 0:
+        raise GitError("git_fetch", stderr.decode(errors="replace").strip())
+    return commit
+
+
+def _size(path: str) -> int:
+    total = 0
+    for dirpath, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _evict(keep: str) -> list[str]:
+    """Remove least-recently-used mirrors until the cache fits the budget.
+    Mirrors with a build in progress and `keep` are never evicted."""
+    budget = config.GIT_MIRROR_BUDGET_MB * 1024 * 1024
+    root = _root()
+    mirrors = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name.endswith(".git") and os.path.isdir(path):
+            mirrors.append((os.stat(path).st_mtime, path, _size(path)))
+    total = sum(size for _, _, size in mirrors)
+    evicted = []
+    for _, path, size in sorted(mirrors):
+        if total <= budget:
+            break
+        if path == keep or _in_use.get(path):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        evicted.append(path)
+    return evicted
+
+
+@asynccontextmanager
+async def checkout(repo_url: str, clone_url: str, env: dict, ctx: Context | None = None,
+                   commit: str | None = None):
+    """Yield (workdir, commit): a detached worktree of `commit` (default: the
+    remote HEAD), removed again on exit.
+
+    clone_url may carry credentials; repo_url is the credential-free form
+    used for the cache key, logs and the mirror's stored remote.
+    """
+    mirror = mirror_path(repo_url)
+    lock = _locks.setdefault(mirror, asyncio.Lock())
+    workdir = tempfile.mkdtemp(prefix="build-")
+    _in_use[mirror] = _in_use.get(mirror, 0) + 1
+    try:
+        async with lock:
+            commit = await _update(mirror, clone_url, repo_url, env, ctx, commit)
+            await _git("--git-dir", mirror, "worktree", "prune")
+            rc, _, stderr = await _git(
+                "--git-dir", mirror, "worktree", "add", "--detach", "--force", workdir, commit,
+            )
+            if rc != 0:
+                raise GitError("git_worktree", stderr.decode(errors="replace").strip())
+            os.utime(mirror)
+        evicted = await asyncio.to_thread(_evict, mirror)
+        if evicted and ctx is not None:
+            await ctx.info(f"evicted {len(evicted)} git mirror(s) over the {config.GIT_MIRROR_BUDGET_MB} MB budget")
+        yield workdir, commit
+    finally:
+        _in_use[mirror] -= 1
+        if os.path.isdir(mirror):
+            async with lock:
+                await _git("--git-dir", mirror, "worktree", "remove", "--force", workdir)
+        shutil.rmtree(workdir, ignore_errors=True)
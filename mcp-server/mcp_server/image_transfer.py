@@ -0,0 +1,224 @@
+"""Moving images between the engine and the lab registries.
+
+Both directions run through the runner itself, which is on the lab network
+— the engine daemon never has to resolve `registry-dev` / `registry-prod`
+— and neither stages a tarball on disk:
+
+  push_image: engine → registry. The engine's image export is streamed
+    until its manifest.json has named the config and every missing blob has
+    gone by; only the members the registry lacks are uploaded.
+  pull_image: registry → engine. Skipped when the engine already has the
+    image ID; otherwise a docker-archive is assembled from the registry's
+    blobs on the fly and streamed into the engine's load endpoint.
+"""
+
+import json
+import string
+import tarfile
+from contextlib import aclosing
+
+from mcp.server.fastmcp import Context
+
+from .clients import engine_client, registry_client
+
+
+# Layers go up exactly as the engine exports them: an uncompressed tar
+# (blob digest == diff ID) from the classic stores, or the gzip blob
+# Docker's containerd store keeps (blob digest != diff ID).
+OCI_MANIFEST = "application/vnd.oci.image.manifest.v1+json"
+OCI_CONFIG = "application/vnd.oci.image.config.v1+json"
+OCI_LAYER = "application/vnd.oci.image.layer.v1.tar"
+OCI_LAYER_GZIP = "application/vnd.oci.image.layer.v1.tar+gzip"
+
+
+def _archive_digest(member: str) -> str | None:
+    """The digest a docker-archive member is named after, if any.
+
+    Docker 25+ exports an OCI layout (`blobs/sha256/<hex>`); Podman names
+    layers `<hex>.tar` and configs `<hex>.json`, as older Docker does for
+    configs. Older Docker's `<v1-id>/layer.tar` carries no digest.
+    """
+    stem = member.rsplit("/", 1)[-1].removesuffix(".tar").removesuffix(".json")
+    if len(stem) == 64 and all(c in string.hexdigits for c in stem):
+        return f"sha256:{stem}"
+    return None
+
+
+async def _once(data: bytes):
+    yield data
+
+
+# Small digest-named export members are held in memory until manifest.json
+# says which are the config and layers; anything bigger is a layer.
+_HOLD_MAX = 1 << 20
+
+
+async def push_image(
+    local_tag: str,
+    image_name: str,
+    tag: str,
+    ctx: Context | None = None,
+) -> dict:
+    """Push an engine image to registry-dev, sending only missing blobs.
+
+    The export's manifest.json names the config and the layers, in the
+    order of the engine's RootFS diff IDs. The classic stores export
+    uncompressed layers, so their blobs are the diff IDs and are checked
+    against the registry before the export is opened. Docker's containerd
+    store exports the compressed blobs it holds, named by their own digest,
+    and reports the manifest digest as the image ID, so nothing but
+    manifest.json is trusted for the config. Every blob goes up as the
+    bytes the export holds, under their own digest; the export is read
+    until manifest.json and every missing blob have been seen.
+    """
+    info = await engine_client.inspect_image(local_tag)
+    if info is None:
+        raise Exception(f"image {local_tag} not found in engine")
+    diff_ids = info["RootFS"]["Layers"]
+
+    heads = await registry_client.blob_sizes(image_name, diff_ids)
+    sizes = {d: size for d, size in heads.items() if size is not None}
+    checked = set(heads)
+    pushed_bytes = pushed = 0
+    blobs: list[str] | None = None  # config then layers, once manifest.json is read
+    held: dict[str, bytes] = {}
+
+    async def needed(*digests: str) -> list[str]:
+        """Those of `digests` the registry lacks, HEADing each only once."""
+        unchecked = [d for d in dict.fromkeys(digests) if d not in sizes and d not in checked]
+        if unchecked:
+            checked.update(unchecked)
+            heads = await registry_client.blob_sizes(image_name, unchecked)
+            sizes.update((d, size) for d, size in heads.items() if size is not None)
+        return [d for d in dict.fromkeys(digests) if d not in sizes]
+
+    async def upload(chunks, wanted: set[str]) -> None:
+        nonlocal pushed_bytes, pushed
+        uploaded = await registry_client.upload_blob(image_name, chunks, wanted=wanted)
+        if uploaded is None:
+            return
+        digest, size = uploaded
+        sizes[digest] = size
+        pushed_bytes += size
+        pushed += 1
+        if ctx is not None:
+            await ctx.info(f"pushed {digest[:19]} ({size} bytes)")
+
+    async with aclosing(engine_client.iter_export(local_tag)) as entries:
+        async for entry in entries:
+            if not entry.is_file:
+                continue
+            digest = _archive_digest(entry.name)
+            if entry.name == "manifest.json":
+                image = json.loads(await entry.read())[0]
+                if len(image["Layers"]) != len(diff_ids):
+                    raise Exception(f"export of {local_tag} lists {len(image['Layers'])} layers, "
+                                    f"the engine {len(diff_ids)}")
+                config = _archive_digest(image["Config"])
+                if config is None:
+                    raise Exception(f"export of {local_tag} names no config digest")
+                # A legacy `<v1-id>/layer.tar` is uncompressed: its blob is the diff ID.
+                blobs = [config, *(_archive_digest(name) or d for name, d in zip(image["Layers"], diff_ids))]
+                for d in await needed(*blobs):
+                    if d in held:
+                        await upload(_once(held[d]), {d})
+                held.clear()
+            elif digest is not None:
+                if blobs is None and entry.size <= _HOLD_MAX:
+                    held[digest] = await entry.read()
+                elif (blobs is None or digest in blobs) and await needed(digest):
+                    await upload(entry.chunks(), {digest})
+            elif entry.name.endswith("/layer.tar"):
+                wanted = {d for d in diff_ids if d not in sizes}
+                if wanted:
+                    await upload(entry.chunks(), wanted)  # unknown until hashed
+            if blobs is not None and all(d in sizes for d in blobs):
+                break  # closes the export stream; the rest is already there
+    if blobs is None:
+        raise Exception(f"export of {local_tag} has no manifest.json")
+    missing = [d for d in dict.fromkeys(blobs) if d not in sizes]
+    if missing:
+        raise Exception(f"export of {local_tag} is missing blobs: {missing}")
+
+    total = len(set(blobs))
+    reused = total - pushed
+    if ctx is not None:
+        await ctx.info(f"registry-dev already had {reused}/{total} blobs")
+
+    config_digest, layers = blobs[0], blobs[1:]
+    manifest = {
+        "schemaVersion": 2,
+        "mediaType": OCI_MANIFEST,
+        "config": {"mediaType": OCI_CONFIG, "digest": config_digest, "size": sizes[config_digest]},
+        "layers": [
+            {"mediaType": OCI_LAYER if d == diff_id else OCI_LAYER_GZIP, "digest": d, "size": sizes[d]}
+            for d, diff_id in zip(layers, diff_ids)
+        ],
+    }
+    digest = await registry_client.put_manifest(
+        image_name, tag, json.dumps(manifest).encode(), OCI_MANIFEST,
+    )
+    return {"digest": digest, "blobs_reused": reused, "bytes_pushed": pushed_bytes}
+
+
+def _tar_header(name: str, size: int) -> bytes:
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mode = 0o644
+    return info.tobuf(format=tarfile.USTAR_FORMAT)
+
+
+async def docker_archive(image_name: str, manifest: dict, registry: str, repo_tag: str):
+    """Yield a docker-archive of image_name as tar bytes, straight from the
+    registry's blobs. Sizes come from the manifest, so each member's header
+    can be written before its blob is fetched. Engines detect compressed
+    layer files on load, so blobs are passed through as stored."""
+    config_desc = manifest["config"]
+    config_file = f"{config_desc['digest'][7:]}.json"
+    layer_files = [f"{layer['digest'][7:]}.tar" for layer in manifest["layers"]]
+    index = json.dumps([{
+        "Config": config_file, "RepoTags": [repo_tag], "Layers": layer_files,
+    }]).encode()
+
+    yield _tar_header("manifest.json", len(index)) + index + b"\0" * (-len(index) % 512)
+    members = {config_desc["digest"]: (config_file, config_desc["size"])}
+    for layer, name in zip(manifest["layers"], layer_files):
+        members.setdefault(layer["digest"], (name, layer["size"]))
+    for digest, (name, size) in members.items():
+        yield _tar_header(name, size)
+        async for chunk in registry_client.iter_blob(image_name, digest, registry):
+            yield chunk
+        yield b"\0" * (-size % 512)
+    yield b"\0" * 1024
+
+
+async def pull_image(
+    image_name: str,
+    tag: str,
+    registry: str,
+    local_tag: str,
+    ctx: Context | None = None,
+) -> dict:
+    """Make registry image:tag available in the engine as local_tag.
+
+    Returns {"digest", "image_id", "pulled"}; pulled is False when the
+    engine already had the image and it was only tagged. The classic
+    stores know an image by its config digest, Docker's containerd store
+    by its manifest digest; either, or a RepoDigest of local_tag naming
+    the manifest, counts as already there.
+    """
+    resolved = await registry_client.get_manifest(image_name, tag, registry)
+    manifest = resolved["manifest"]
+    image_id = manifest["config"]["digest"]
+    local_repo, _, local_ref = local_tag.rpartition(":")
+    for ref in (image_id, resolved["digest"]):
+        if await engine_client.inspect_image(ref) is not None:
+            await engine_client.tag_image(ref, local_repo, local_ref)
+            return {"digest": resolved["digest"], "image_id": ref, "pulled": False}
+    info = await engine_client.inspect_image(local_tag)
+    if info is not None and any(d.endswith(f"@{resolved['digest']}") for d in info.get("RepoDigests") or []):
+        return {"digest": resolved["digest"], "image_id": info["Id"], "pulled": False}
+    if ctx is not None:
+        await ctx.info(f"streaming {image_name}:{tag} from registry-{registry} into the engine")
+    await engine_client.load_image(docker_archive(image_name, manifest, registry, local_tag))
+    return {"digest": resolved["digest"], "image_id": image_id, "pulled": True}
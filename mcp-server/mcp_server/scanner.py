@@ -0,0 +1,330 @@
+"""Vulnerability scanning for scan_image.
+
+An image in registry-dev is scanned straight from its layer blobs, without
+the engine: each layer is read once for the package manifests it contains,
+
+  - var/lib/dpkg/status and status.d/*   (Debian)
+  - lib/apk/db/installed                 (Alpine)
+  - */site-packages/*.dist-info/METADATA (Python)
+  - etc/os-release, usr/lib/os-release   (which distro release they're from)
+
+plus its whiteouts. The layers are then stacked the way the engine would
+(a later layer's file replaces an earlier one at the same path; whiteouts
+delete) and the resulting packages are matched against the offline DB in
+vuln_db.py.
+
+Layer results are keyed by layer digest and persisted as one small JSON
+file each under RUNNER_CACHE_DIR/scan-layers/, so rescanning an image, or
+scanning the tenth image built on the same base, only downloads and reads
+its unique layers — across restarts too. Those are fetched concurrently
+and parsed in a process pool (SCAN_WORKERS), since tar extraction and
+manifest parsing are CPU-bound; concurrent scans needing the same layer
+share one read. Matching is redone on every scan, so a DB update applies
+at once.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import tarfile
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from mcp.server.fastmcp import Context
+
+from . import config, vuln_db
+from .clients import registry_client
+
+
+SEVERITY_ORDER = {s: i for i, s in enumerate(vuln_db.SEVERITIES)}
+
+_DPKG_STATUS = re.compile(r"^var/lib/dpkg/(status|status\.d/[^/]+)$")
+_APK_INSTALLED = "lib/apk/db/installed"
+_PY_METADATA = re.compile(r"/(site|dist)-packages/[^/]+\.dist-info/METADATA$")
+_OS_RELEASE = ("etc/os-release", "usr/lib/os-release")
+
+# Bump when scan_layer's output changes, so stale index entries are rescanned.
+INDEX_FORMAT = 1
+
+# layer digest -> {"files": {path: record}, "whiteouts": [...], "opaque": [...]}
+# An LRU in front of the on-disk index under RUNNER_CACHE_DIR/scan-layers/.
+_layers: "OrderedDict[str, dict]" = OrderedDict()
+# layer digest -> the task currently downloading and scanning it
+_inflight: dict[str, asyncio.Future] = {}
+_pool: ProcessPoolExecutor | None = None
+
+
+class ScanError(Exception):
+    """A scan step failed; `step` names it for the tool's error JSON."""
+
+    def __init__(self, step: str, message: str):
+        super().__init__(message)
+        self.step = step
+
+
+def clear_cache() -> None:
+    """Drop the in-memory layer results (the on-disk index stays)."""
+    _layers.clear()
+
+
+def _paragraphs(text: str):
+    """RFC 822-style stanzas (dpkg status, apk installed) as field dicts;
+    continuation lines are dropped."""
+    fields: dict[str, str] = {}
+    for line in text.splitlines():
+        if not line.strip():
+            if fields:
+                yield fields
+            fields = {}
+        elif line[0] not in " \t" and ":" in line:
+            name, _, value = line.partition(":")
+            fields[name] = value.strip()
+    if fields:
+        yield fields
+
+
+def _dpkg_packages(text: str) -> list[list[str]]:
+    """(source package, source version) per installed package — Debian's
+    advisories are keyed by source package."""
+    out = []
+    for p in _paragraphs(text):
+        if "Package" not in p or not p.get("Status", "install ok installed").endswith(" installed"):
+            continue
+        version = p.get("Version", "")
+        source = p.get("Source", p["Package"])
+        if "(" in source:  # "openssl (3.0.11-1~deb12u2)"
+            source, _, rest = source.partition("(")
+            version = rest.rstrip(")").strip()
+        out.append([source.strip(), version])
+    return out
+
+
+def _apk_packages(text: str) -> list[list[str]]:
+    """(origin, version) per installed package, from single-letter keys."""
+    out = []
+    for p in _paragraphs(text):
+        if "P" in p and "V" in p:
+            out.append([p.get("o", p["P"]), p["V"]])
+    return out
+
+
+def _python_package(text: str) -> list[list[str]]:
+    headers = next(_paragraphs(text), {})
+    if "Name" not in headers or "Version" not in headers:
+        return []
+    return [[re.sub(r"[-_.]+", "-", headers["Name"]).lower(), headers["Version"]]]
+
+
+def _os_ecosystem(text: str) -> str | None:
+    """The OSV ecosystem for this distro release, if the DB covers it."""
+    fields = {}
+    for line in text.splitlines():
+        name, _, value = line.partition("=")
+        fields[name.strip()] = value.strip().strip('"')
+    version = fields.get("VERSION_ID", "")
+    if fields.get("ID") == "debian" and version:
+        return f"Debian:{version.split('.')[0]}"
+    if fields.get("ID") == "alpine" and version:
+        return f"Alpine:v{'.'.join(version.split('.')[:2])}"
+    return None
+
+
+def scan_layer(path: str) -> dict:
+    """Read one layer blob (tar, optionally gzipped) for package manifests
+    and whiteouts."""
+    files: dict[str, dict] = {}
+    whiteouts: list[str] = []
+    opaque: list[str] = []
+    with tarfile.open(path, "r:*") as tar:
+        for member in tar:
+            name = member.name.removeprefix("./").lstrip("/")
+            parent, _, base = name.rpartition("/")
+            if base == ".wh..wh..opq":
+                opaque.append(parent)
+                continue
+            if base.startswith(".wh."):
+                whiteouts.append(f"{parent}/{base[4:]}" if parent else base[4:])
+                continue
+            if not member.isfile():
+                continue
+            if _DPKG_STATUS.match(name):
+                parse, kind = _dpkg_packages, "dpkg"
+            elif name == _APK_INSTALLED:
+                parse, kind = _apk_packages, "apk"
+            elif _PY_METADATA.search(f"/{name}"):
+                parse, kind = _python_package, "python"
+            elif name in _OS_RELEASE:
+                parse, kind = None, "os-release"
+            else:
+                continue
+            text = tar.extractfile(member).read().decode("utf-8", errors="replace")
+            if parse is None:
+                files[name] = {"kind": kind, "ecosystem": _os_ecosystem(text)}
+            else:
+                files[name] = {"kind": kind, "packages": parse(text)}
+    return {"files": files, "whiteouts": whiteouts, "opaque": opaque}
+
+
+def merge_layers(layers: list[dict]) -> dict[str, dict]:
+    """Stack layer results bottom-up into the image's final path -> record."""
+    files: dict[str, dict] = {}
+    for layer in layers:
+        for gone in (*layer["opaque"], *layer["whiteouts"]):
+            prefix = f"{gone}/"
+            for path in [p for p in files if p == gone or p.startswith(prefix)]:
+                del files[path]
+        files.update(layer["files"])
+    return files
+
+
+def match(files: dict[str, dict], db: vuln_db.VulnDB) -> tuple[list[dict], int]:
+    """Vulnerabilities in the merged image, and how many packages it has."""
+    os_release = next((files[p] for p in _OS_RELEASE if p in files), {})
+    os_ecosystem = os_release.get("ecosystem")
+    packages = set()
+    for record in files.values():
+        if record["kind"] == "python":
+            packages.update(("PyPI", n, v) for n, v in record["packages"])
+        elif record["kind"] in ("dpkg", "apk"):
+            packages.update((os_ecosystem, n, v) for n, v in record["packages"])
+
+    findings = []
+    for ecosystem, name, version in sorted(packages, key=lambda p: (p[0] or "", p[1], p[2])):
+        if ecosystem is None:
+            continue
+        for entry in db.match(name, ecosystem, version):
+            findings.append({
+                "id": entry["id"],
+                "severity": entry["severity"],
+                "package": name,
+                "ecosystem": ecosystem,
+                "installed_version": version,
+                "fixed_version": entry["fixed"] or None,
+                "description": entry["summary"],
+            })
+    findings.sort(key=lambda f: (SEVERITY_ORDER.get(f["severity"], len(SEVERITY_ORDER)), f["id"], f["package"]))
+    return findings, len(packages)
+
+
+def _index_path(digest: str) -> str:
+    algorithm, _, hexdigest = digest.partition(":")
+    return os.path.join(config.RUNNER_CACHE_DIR, "scan-layers", f"{algorithm}-{hexdigest}.json")
+
+
+def _read_index(digest: str) -> dict | None:
+    try:
+        with open(_index_path(digest)) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return entry["layer"] if entry.get("format") == INDEX_FORMAT else None
+
+
+def _write_index(digest: str, result: dict) -> None:
+    path = _index_path(digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"format": INDEX_FORMAT, "layer": result}, f)
+    os.replace(tmp, path)
+
+
+def _workers() -> ProcessPoolExecutor:
+    # spawn, not fork: the server process has threads (to_thread, uvicorn).
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=config.SCAN_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+async def _scan_blob(image_name: str, digest: str) -> dict:
+    fd, path = tempfile.mkstemp(prefix="layer-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in registry_client.iter_blob(image_name, digest):
+                f.write(chunk)
+        return await asyncio.get_running_loop().run_in_executor(_workers(), scan_layer, path)
+    finally:
+        os.unlink(path)
+
+
+def _remember(digest: str, result: dict) -> None:
+    _layers[digest] = result
+    _layers.move_to_end(digest)
+    while len(_layers) > config.SCAN_LAYER_CACHE_SIZE:
+        _layers.popitem(last=False)
+
+
+async def _scan_new(image_name: str, digest: str, downloads: asyncio.Semaphore,
+                    ctx: Context | None) -> dict:
+    async with downloads:
+        if ctx is not None:
+            await ctx.info(f"scanning layer {digest[:19]}")
+        try:
+            result = await _scan_blob(image_name, digest)
+        except tarfile.TarError as e:
+            raise ScanError("layer_scan", f"{digest}: {e}")
+        except Exception as e:
+            raise ScanError("registry_blob", f"{digest}: {e}")
+    await asyncio.to_thread(_write_index, digest, result)
+    _remember(digest, result)
+    return result
+
+
+async def _layer_result(image_name: str, digest: str, downloads: asyncio.Semaphore,
+                        ctx: Context | None) -> tuple[dict, bool]:
+    """The layer's scan result, and whether this call had to scan it."""
+    result = _layers.get(digest)
+    if result is not None:
+        _layers.move_to_end(digest)
+        return result, False
+    result = await asyncio.to_thread(_read_index, digest)
+    if result is not None:
+        _remember(digest, result)
+        return result, False
+    # Another scan may already be reading this layer (same base image).
+    task = _inflight.get(digest)
+    if task is not None:
+        return await asyncio.shield(task), False
+    task = asyncio.ensure_future(_scan_new(image_name, digest, downloads, ctx))
+    _inflight[digest] = task
+    task.add_done_callback(lambda _: _inflight.pop(digest, None))
+    return await asyncio.shield(task), True
+
+
+async def scan_image(image_name: str, tag: str, ctx: Context | None = None) -> dict:
+    """Scan registry-dev's image_name:tag; see the module docstring."""
+    try:
+        db = await asyncio.to_thread(vuln_db.load)
+    except (OSError, ValueError) as e:
+        raise ScanError("vuln_db", f"cannot open vulnerability DB {config.VULN_DB_PATH}: {e}")
+
+    try:
+        resolved = await registry_client.get_manifest(image_name, tag)
+    except Exception as e:
+        raise ScanError("registry_manifest", str(e))
+    digests = [layer["digest"] for layer in resolved["manifest"].get("layers", [])]
+
+    downloads = asyncio.Semaphore(config.REGISTRY_FANOUT_CONCURRENCY)
+    results = await asyncio.gather(*(
+        _layer_result(image_name, digest, downloads, ctx) for digest in dict.fromkeys(digests)
+    ))
+    by_digest = dict(zip(dict.fromkeys(digests), results))
+    scanned = sum(1 for _, fresh in results if fresh)
+
+    findings, package_count = match(merge_layers([by_digest[d][0] for d in digests]), db)
+    if ctx is not None:
+        await ctx.info(f"{len(by_digest) - scanned}/{len(by_digest)} layers already scanned; "
+                       f"{package_count} packages, {len(findings)} vulnerabilities")
+    return {
+        "digest": resolved["digest"],
+        "vulnerabilities": findings,
+        "packages": package_count,
+        "layers": len(digests),
+        "layers_scanned": scanned,
+    }
@@ -1,9 +1,9 @@
 import os
-from mcp.server.fastmcp import FastMCP
 from . import config
+from .traced_mcp import TracedFastMCP
 from .tools import user_tools, gitea_tools, registry_tools, promotion_tools
 
-mcp = FastMCP("mcp-devops-lab", host="0.0.0.0", port=8003, stateless_http=True)
+mcp = TracedFastMCP("mcp-devops-lab", host="0.0.0.0", port=8003, stateless_http=True)
 
 # Conditionally register user tools
 if config.USER_MCP_ENABLED:
@@ -1,8 +1,8 @@
-from mcp.server.fastmcp import FastMCP
 from . import config
+from .traced_mcp import TracedFastMCP
 from .tools import gitea_tools
 
-mcp = FastMCP("mcp-gitea", host="0.0.0.0", port=8004, stateless_http=True)
+mcp = TracedFastMCP("mcp-gitea", host="0.0.0.0", port=8004, stateless_http=True)
 gitea_tools.register(mcp)
 
 if __name__ == "__main__":
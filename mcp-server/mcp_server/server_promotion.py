@@ -1,8 +1,8 @@
-from mcp.server.fastmcp import FastMCP
 from . import config
+from .traced_mcp import TracedFastMCP
 from .tools import promotion_tools
 
-mcp = FastMCP("mcp-promotion", host="0.0.0.0", port=8006, stateless_http=True)
+mcp = TracedFastMCP("mcp-promotion", host="0.0.0.0", port=8006, stateless_http=True)
 promotion_tools.register(mcp)
 
 if __name__ == "__main__":
@@ -1,8 +1,8 @@
-from mcp.server.fastmcp import FastMCP
 from . import config
+from .traced_mcp import TracedFastMCP
 from .tools import registry_tools
 
-mcp = FastMCP("mcp-registry", host="0.0.0.0", port=8005, stateless_http=True)
+mcp = TracedFastMCP("mcp-registry", host="0.0.0.0", port=8005, stateless_http=True)
 registry_tools.register(mcp)
 
 if __name__ == "__main__":
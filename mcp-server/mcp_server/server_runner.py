@@ -1,8 +1,8 @@
-from mcp.server.fastmcp import FastMCP
 from . import config
+from .traced_mcp import TracedFastMCP
 from .tools import runner_tools, deploy_tools
 
-mcp = FastMCP("mcp-runner", host="0.0.0.0", port=8007, stateless_http=True)
+mcp = TracedFastMCP("mcp-runner", host="0.0.0.0", port=8007, stateless_http=True)
 runner_tools.register(mcp)
 deploy_tools.register(mcp)
 
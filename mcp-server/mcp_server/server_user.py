@@ -1,8 +1,8 @@
-from mcp.server.fastmcp import FastMCP
 from . import config
+from .traced_mcp import TracedFastMCP
 from .tools import user_tools
 
-mcp = FastMCP("mcp-user", host="0.0.0.0", port=8003, stateless_http=True)
+mcp = TracedFastMCP("mcp-user", host="0.0.0.0", port=8003, stateless_http=True)
 user_tools.register(mcp)
 
 if __name__ == "__main__":
@@ -1,42 +1,206 @@
 """deploy_app tool — pull from a registry and run a container, mapped to a
-host port. Talks to the engine via /var/run/docker.sock using `podman --remote`
-(works against both Podman and Docker Desktop's daemon).
+host port. Talks to the engine's REST API on /var/run/docker.sock
+(clients/engine_client.py — Docker Engine or libpod dialect).
 
-Two pre-step issues this tool handles:
+Three pre-step issues this tool handles:
   - Daemon-side `pull` from a compose service name (registry-prod) doesn't
     work because the daemon's network view can't resolve compose DNS. Fix:
-    use `skopeo copy` from inside the runner container (which IS on the
-    lab network) to pull the image into a local OCI tarball, then
-    `podman load` it via the socket.
-  - Idempotency: any existing container with the same name is force-removed
-    first so re-running the tool overwrites cleanly.
+    the runner (which IS on the lab network) reads the manifest and blobs
+    itself and streams them to the engine's /images/load as a
+    docker-archive assembled on the fly — nothing is staged on disk
+    (image_transfer.pull_image).
+  - Redeploys: the manifest is resolved first, and if the engine already
+    holds its config digest (= image ID) the pull and load are skipped and
+    the existing image is just tagged.
+  - Redeploy downtime: the default (strategy "recreate") replaces the
+    container in place, health-checked only with wait_ready, so apps without
+    /health deploy as they always did. strategy "blue-green" first runs the
+    new version next to the old one as hello-app-<env>-next — on the lab
+    network only, checked by name — and it has to answer /health before
+    anything is touched. Only then is the old container swapped out: it is
+    stopped and set aside as hello-app-<env>-prev, so the app is down just
+    for a container start, and a version that never gets healthy never
+    replaces a working one. A container's host ports can't change once it
+    exists, so the one that takes over the env port is a fresh container of
+    the verified image (not the standby itself), and it is health-checked
+    again. If the new container doesn't start (or get healthy), -prev is
+    renamed back and started. Both report time_to_ready_ms and downtime_ms.
+  - Scale-out: replicas=N runs hello-app-<env>-1..N, which share the network
+    alias hello-app-<env>-pool, behind a round-robin balancer container
+    (mcp_server/balancer.py, run from the runner's own image) that takes
+    over the name hello-app-<env> and the env port. The balancer picks up
+    its healthy members by resolving the alias, so a redeploy starts and
+    checks the new replicas first, then removes the old ones, and the
+    balancer keeps serving throughout.
+
+deploy_many rolls one image out to several environments in one call: the
+pulls run one after another, so only the first one actually loads the
+image and the rest find its ID in the engine and just tag it. The
+containers are then started concurrently, and each is polled on /health
+(over the lab network, by container name) before it counts as deployed.
 """
 
 import asyncio
 import json
 import os
-import tempfile
+import socket
+import time
 
+import httpx
 from mcp.server.fastmcp import FastMCP, Context
 
-from .. import config
-from ..engine import engine_cmd
+from .. import config, image_transfer
+from ..clients import engine_client
 
 
 # Host port mapping per environment
 ENV_PORTS = {"dev": 9080, "staging": 9081, "prod": 9082}
+MAX_REPLICAS = 8
+ROLE_LABEL = "mcp-lab.role"
+DEPLOY_NETWORK = "mcp-lab_mcp-lab-net"
+APP_PORT = 8080
+
+
+class _DeployError(Exception):
+    """A deploy step failed; `step` names it for the tool's error JSON."""
+
+    def __init__(self, step: str, message: str):
+        super().__init__(message)
+        self.step = step
+
+
+def _registry_for(environment: str) -> tuple[str, str]:
+    """(registry_client registry name, registry host) an environment
+    deploys from. Compose-internal names — resolved by the runner, which is
+    on the lab network; the daemon never has to."""
+    if environment == "prod":
+        return "prod", os.environ.get("PROD_REGISTRY_HOST", "registry-prod:5000")
+    return "dev", config.DEV_REGISTRY_HOST  # registry-dev:5000
+
+
+def _container_name(environment: str) -> str:
+    return f"hello-app-{environment}"
+
+
+def _health_url(container_name: str) -> str:
+    # By container name over the lab network: the runner is on it, and the
+    # host ports belong to the daemon's host, not to us.
+    return f"http://{container_name}:{APP_PORT}/health"
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.monotonic() - start) * 1000, 1)
+
+
+async def _wait_healthy(url: str, timeout: float) -> float | None:
+    """Poll url until it answers 200, backing off from 100 ms to 1 s.
+    Returns the milliseconds it took, or None if timeout ran out."""
+    start = time.monotonic()
+    delay = 0.1
+    async with httpx.AsyncClient(timeout=2.0) as client:
+        while True:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return _elapsed_ms(start)
+            except httpx.HTTPError:
+                pass
+            remaining = timeout - (time.monotonic() - start)
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, 1.0)
+
+
+async def _balancer_image() -> str:
+    """The runner's own image, which the balancer ships in."""
+    if config.BALANCER_IMAGE:
+        return config.BALANCER_IMAGE
+    own = await engine_client.inspect_container(socket.gethostname())
+    if own is None:
+        raise Exception("cannot find the runner's own container to take the balancer image from; set BALANCER_IMAGE")
+    return own["Image"]
+
+
+async def _remove_replicas(container_name: str) -> int:
+    """Remove hello-app-<env>-1, -2, … up to the first gap.
+    Returns how many there were."""
+    removed = 0
+    for i in range(1, MAX_REPLICAS + 1):
+        if not await engine_client.remove_container(f"{container_name}-{i}"):
+            break
+        removed += 1
+    return removed
+
+
+async def _deploy_replicas(environment: str, local_tag: str, replicas: int, steps: list[str]) -> dict:
+    container_name = _container_name(environment)
+    pool_alias = f"{container_name}-pool"
+    timeout = config.DEPLOY_READY_TIMEOUT
+    staged = [f"{container_name}-{i}-next" for i in range(1, replicas + 1)]
+
+    # 1. Start the new replicas, already in the pool: the balancer only
+    #    routes to members that pass /health, so they join as they come up.
+    async def start(name: str) -> float | None:
+        await engine_client.remove_container(name)  # left over from a failed deploy
+        await engine_client.run_container(name, local_tag, network=DEPLOY_NETWORK, aliases=[pool_alias])
+        return await _wait_healthy(_health_url(name), timeout)
 
+    try:
+        ready = await asyncio.gather(*(start(name) for name in staged))
+    except Exception as e:
+        await asyncio.gather(*(engine_client.remove_container(n) for n in staged), return_exceptions=True)
+        raise _DeployError("engine_run", str(e))
+    if None in ready:
+        await asyncio.gather(*(engine_client.remove_container(n) for n in staged), return_exceptions=True)
+        raise _DeployError("readiness", f"{staged[ready.index(None)]} did not pass /health within {timeout:g}s; "
+                                        f"the running replicas were left alone")
+    time_to_ready_ms = max(ready)
+    steps.append(f"Started {replicas} replicas; all healthy after {time_to_ready_ms:g} ms")
 
-async def _run(*args: str, ctx: Context | None = None) -> tuple[int, bytes, bytes]:
-    if ctx is not None:
-        await ctx.info(f"$ {' '.join(args)}")
-    proc = await asyncio.create_subprocess_exec(
-        *args,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-    )
-    stdout, stderr = await proc.communicate()
-    return proc.returncode, stdout, stderr
+    # 2. Put the balancer on the env port, unless it is already there.
+    downtime_ms = 0.0
+    try:
+        current = await engine_client.inspect_container(container_name)
+        labels = (current or {}).get("Config", {}).get("Labels") or {}
+        if labels.get(ROLE_LABEL) == "balancer":
+            steps.append(f"Balancer '{container_name}' already running")
+        else:
+            image = await _balancer_image()
+            swap_start = time.monotonic()
+            replaced = await engine_client.remove_container(container_name)
+            await engine_client.run_container(
+                container_name, image,
+                network=DEPLOY_NETWORK,
+                ports={APP_PORT: ENV_PORTS[environment]},
+                env={"BALANCER_BACKENDS": f"{pool_alias}:{APP_PORT}", "BALANCER_LISTEN_PORT": str(APP_PORT)},
+                command=["python", "-m", "mcp_server.balancer"],
+                labels={ROLE_LABEL: "balancer"},
+            )
+            if await _wait_healthy(_health_url(container_name), timeout) is None:
+                raise _DeployError("readiness", f"balancer {container_name} did not pass /health within {timeout:g}s")
+            if replaced:
+                downtime_ms = _elapsed_ms(swap_start)
+            steps.append(f"Started balancer '{container_name}' on port {ENV_PORTS[environment]}")
+    except _DeployError:
+        raise
+    except Exception as e:
+        raise _DeployError("balancer", str(e))
+
+    # 3. Retire the old replicas (the balancer drops them as they go) and
+    #    give the new ones their names.
+    try:
+        removed = await _remove_replicas(container_name)
+        for i, name in enumerate(staged, 1):
+            await engine_client.rename_container(name, f"{container_name}-{i}")
+    except Exception as e:
+        raise _DeployError("engine_rm", str(e))
+    steps.append(f"Removed {removed} old replica(s)")
+
+    return {
+        "replicas": [f"{container_name}-{i}" for i in range(1, replicas + 1)],
+        "time_to_ready_ms": time_to_ready_ms,
+        "downtime_ms": downtime_ms,
+    }
 
 
 def register(mcp: FastMCP):
@@ -45,16 +209,34 @@ def register(mcp: FastMCP):
         image_name: str = "hello-app",
         tag: str = "latest",
         environment: str = "dev",
+        strategy: str = "recreate",
+        replicas: int = 1,
+        wait_ready: bool | None = None,
         ctx: Context | None = None,
     ) -> str:
         """
         Deploy an application to a specific environment.
 
-        Pulls the image from the appropriate registry (via skopeo so compose
-        DNS works) and runs it as a container on the mcp-lab-net network.
+        Pulls the image from the appropriate registry (streamed through the
+        runner so compose DNS works; skipped when the engine already has that
+        digest) and runs it as a container on the mcp-lab-net network.
 
         Port mapping: dev→9080, staging→9081, prod→9082.
 
+        The default "recreate" strategy replaces the container straight away,
+        and only checks /health with wait_ready, so apps without /health
+        deploy as before. "blue-green" first runs the new version beside the
+        old one (reachable only on the lab network) and it must pass its
+        /health check before the running container is replaced; if it never
+        gets healthy the old one keeps serving. The container then started on
+        the env port is a new one from that verified image, checked again.
+        If the new container fails to start or get healthy, the previous one
+        is started again.
+
+        replicas > 1 runs that many containers behind a round-robin load
+        balancer on the env port; redeploys start and health-check the new
+        replicas before retiring the old ones, so the app stays up.
+
         DEFAULTS: when the user says "deploy the hello world app" with no
         further specifics, call this tool with NO arguments — it deploys
         "hello-app:latest" to "dev". Only ask the user for image_name / tag /
@@ -65,93 +247,296 @@ def register(mcp: FastMCP):
             image_name: Image to deploy. Defaults to "hello-app".
             tag: Image tag. Defaults to "latest".
             environment: dev / staging / prod. Defaults to "dev".
+            strategy: "recreate" (default) or "blue-green" (zero-downtime,
+                needs /health).
+            replicas: Number of app containers, 1 to 8. Defaults to 1.
+            wait_ready: Wait for /health before reporting success. Defaults
+                to true for blue-green (which needs it) and false for recreate.
 
         Returns:
-            JSON string with deployment status and accessible URL.
+            JSON string with deployment status, accessible URL, and
+            time_to_ready_ms / downtime_ms.
         """
         if environment not in ENV_PORTS:
             return json.dumps({
                 "status": "error",
                 "error": f"Invalid environment: {environment}. Must be one of: dev, staging, prod.",
             }, indent=2)
+        if strategy not in ("blue-green", "recreate"):
+            return json.dumps({
+                "status": "error",
+                "error": f"Invalid strategy: {strategy}. Must be one of: blue-green, recreate.",
+            }, indent=2)
+        if wait_ready is None:
+            wait_ready = strategy == "blue-green"
+        if strategy == "blue-green" and not wait_ready:
+            return json.dumps({
+                "status": "error",
+                "error": "blue-green needs the /health check; use strategy \"recreate\" for apps without /health.",
+            }, indent=2)
+        if not 1 <= replicas <= MAX_REPLICAS:
+            return json.dumps({
+                "status": "error",
+                "error": f"Invalid replicas: {replicas}. Must be between 1 and {MAX_REPLICAS}.",
+            }, indent=2)
 
-        # Use the compose-internal registry hostname so skopeo (running on
-        # the lab network) can reach it.
-        if environment == "prod":
-            registry_host = os.environ.get("PROD_REGISTRY_HOST", "registry-prod:5000")
-        else:
-            registry_host = config.DEV_REGISTRY_HOST  # registry-dev:5000
-
+        registry, registry_host = _registry_for(environment)
         full_image_remote = f"{registry_host}/{image_name}:{tag}"
         local_tag = f"localhost/{image_name}:{tag}-{environment}"
-        container_name = f"hello-app-{environment}"
+        container_name = _container_name(environment)
+        standby_name = f"{container_name}-next"
         host_port = ENV_PORTS[environment]
+        timeout = config.DEPLOY_READY_TIMEOUT
 
         steps: list[str] = []
 
-        # 1. Remove old container by the same name (idempotent)
-        rc, _, _ = await _run(
-            *engine_cmd("rm", "-f", container_name),
-            ctx=ctx,
-        )
-        steps.append(f"Removed old container '{container_name}' (if any)")
-
-        # 2. skopeo copy from registry into a local tarball, then podman load.
-        #    This avoids the daemon-side DNS problem.
-        with tempfile.TemporaryDirectory() as workdir:
-            tarball = os.path.join(workdir, "img.tar")
-            rc, _, stderr = await _run(
-                "skopeo", "copy", "--src-tls-verify=false",
-                f"docker://{full_image_remote}",
-                f"docker-archive:{tarball}:{local_tag}",
-                ctx=ctx,
-            )
-            if rc != 0:
-                return json.dumps({
-                    "status": "error",
-                    "step": "skopeo_pull",
-                    "error": stderr.decode(errors="replace").strip(),
-                    "image": full_image_remote,
-                }, indent=2)
-            steps.append(f"Fetched {full_image_remote} via skopeo")
-
-            rc, _, stderr = await _run(
-                *engine_cmd("load", "-i", tarball),
-                ctx=ctx,
-            )
-            if rc != 0:
-                return json.dumps({
-                    "status": "error",
-                    "step": "engine_load",
-                    "error": stderr.decode(errors="replace").strip(),
-                }, indent=2)
-            steps.append(f"Loaded image into local engine as {local_tag}")
-
-        # 3. Run the container on the lab network with host port mapping.
-        rc, stdout, stderr = await _run(
-            *engine_cmd(
-                "run", "-d",
-                "--name", container_name,
-                "--network", "mcp-lab_mcp-lab-net",
-                "-p", f"{host_port}:8080",
-                local_tag,
-            ),
-            ctx=ctx,
-        )
-        if rc != 0:
+        def failed(step: str, error: str) -> str:
             return json.dumps({
                 "status": "error",
-                "step": "engine_run",
-                "error": stderr.decode(errors="replace").strip(),
+                "step": step,
+                "error": error,
                 "steps_completed": steps,
             }, indent=2)
-        container_id = stdout.decode().strip()[:12]
-        steps.append(f"Started container {container_id}")
+
+        # 1-2. Resolve the tag to a manifest, then pull only if the engine
+        #      doesn't already hold its config digest (the image ID).
+        try:
+            pulled = await image_transfer.pull_image(image_name, tag, registry, local_tag, ctx=ctx)
+        except Exception as e:
+            return json.dumps({
+                "status": "error",
+                "step": "image_pull",
+                "error": str(e),
+                "image": full_image_remote,
+            }, indent=2)
+        steps.append(f"Resolved {full_image_remote} to {pulled['digest'][:19]}")
+        if pulled["pulled"]:
+            steps.append(f"Streamed {full_image_remote} into local engine as {local_tag}")
+        else:
+            steps.append(f"Engine already has {pulled['image_id'][:19]}; tagged as {local_tag}, skipped pull")
+
+        if replicas > 1:
+            try:
+                scaled = await _deploy_replicas(environment, local_tag, replicas, steps)
+            except _DeployError as e:
+                return failed(e.step, str(e))
+            return json.dumps({
+                "status": "success",
+                "message": f"Deployed {image_name}:{tag} to {environment} as {replicas} replicas.",
+                "container": container_name,
+                "app_url": f"http://localhost:{host_port}",
+                "strategy": "rolling",
+                **scaled,
+                "steps": steps,
+            }, indent=2)
+
+        # 3. Blue/green: start the new version beside the old one and wait
+        #    for it to answer /health. Nothing live has been touched yet, and
+        #    the standby publishes no host port: it is checked by name.
+        time_to_ready_ms = None
+        if strategy == "blue-green":
+            try:
+                await engine_client.remove_container(standby_name)  # left over from a failed deploy
+                await engine_client.run_container(standby_name, local_tag, network=DEPLOY_NETWORK)
+            except Exception as e:
+                return failed("engine_run", str(e))
+            time_to_ready_ms = await _wait_healthy(_health_url(standby_name), timeout)
+            if time_to_ready_ms is None:
+                try:
+                    await engine_client.remove_container(standby_name)
+                except Exception:
+                    pass
+                return failed(
+                    "readiness",
+                    f"{standby_name} did not pass /health within {timeout:g}s; "
+                    f"'{container_name}' was left running",
+                )
+            steps.append(f"Started {standby_name}; healthy after {time_to_ready_ms:g} ms")
+
+        # 4. Swap: set the old container aside (stopped, which frees the host
+        #    port, and renamed) and run the new version under the real name
+        #    and port — a new container of the image the standby verified, as
+        #    ports can't be added to the standby. Should it fail to start or
+        #    get healthy, the old one is put back.
+        previous_name = f"{container_name}-prev"
+        swap_start = time.monotonic()
+        try:
+            await engine_client.remove_container(previous_name)  # left over from a failed deploy
+            replaced = await engine_client.stop_container(container_name)
+            if replaced:
+                await engine_client.rename_container(container_name, previous_name)
+        except Exception as e:
+            return failed("engine_stop", str(e))
+        steps.append(f"Stopped old container '{container_name}'" if replaced
+                     else f"No previous '{container_name}' to replace")
+
+        async def roll_back(step: str, error: str) -> str:
+            try:
+                await engine_client.remove_container(container_name)
+                if strategy == "blue-green":
+                    await engine_client.remove_container(standby_name)
+                if replaced:
+                    await engine_client.rename_container(previous_name, container_name)
+                    await engine_client.start_container(container_name)
+                    error += f"; rolled back to the previous '{container_name}'"
+            except Exception as e:
+                error += f"; rollback failed: {e}"
+            return failed(step, error)
+
+        try:
+            container_id = await engine_client.run_container(
+                container_name, local_tag,
+                network=DEPLOY_NETWORK,
+                ports={APP_PORT: host_port},
+            )
+        except Exception as e:
+            return await roll_back("engine_run", str(e))
+        container_id = container_id[:12]
+        run_start = time.monotonic()
+        if wait_ready:
+            ready_ms = await _wait_healthy(_health_url(container_name), timeout)
+            if ready_ms is None:
+                return await roll_back("readiness", f"{container_name} did not pass /health within {timeout:g}s")
+            if time_to_ready_ms is None:
+                time_to_ready_ms = _elapsed_ms(run_start)
+        downtime_ms = _elapsed_ms(swap_start) if replaced else 0.0
+        steps.append(f"Started container {container_id}; "
+                     f"{'healthy' if wait_ready else 'not health-checked'}, {downtime_ms:g} ms of downtime")
+
+        # 5. Clean up the old container, the standby, and any replicas of an
+        #    earlier scaled-out deploy (their balancer was the container just
+        #    replaced).
+        try:
+            if replaced:
+                await engine_client.remove_container(previous_name)
+                steps.append(f"Removed old container '{container_name}'")
+            if strategy == "blue-green":
+                await engine_client.remove_container(standby_name)
+                steps.append(f"Removed {standby_name}")
+            if removed := await _remove_replicas(container_name):
+                steps.append(f"Removed {removed} replica(s) of the previous deploy")
+        except Exception as e:
+            steps.append(f"Cleanup failed: {e}")
 
         return json.dumps({
             "status": "success",
             "message": f"Deployed {image_name}:{tag} to {environment}.",
             "container": container_name,
             "app_url": f"http://localhost:{host_port}",
+            "strategy": strategy,
+            "time_to_ready_ms": time_to_ready_ms,
+            "downtime_ms": downtime_ms,
             "steps": steps,
         }, indent=2)
+
+    @mcp.tool()
+    async def deploy_many(
+        image_name: str = "hello-app",
+        tag: str = "latest",
+        environments: list[str] | None = None,
+        wait_ready: bool = True,
+        ctx: Context | None = None,
+    ) -> str:
+        """
+        Deploy one image to several environments at once (e.g. dev, staging
+        and prod) and report a single combined result.
+
+        The image is pulled and loaded into the engine once; every
+        environment's container is then started in parallel. With wait_ready,
+        an environment only counts as deployed once its app answers /health.
+        Prod deploys from the prod registry, so promote the tag first.
+
+        Port mapping: dev→9080, staging→9081, prod→9082.
+
+        Args:
+            image_name: Image to deploy. Defaults to "hello-app".
+            tag: Image tag. Defaults to "latest".
+            environments: Any of dev / staging / prod. Defaults to all three.
+            wait_ready: Poll each container's /health before reporting
+                success. Defaults to true.
+
+        Returns:
+            JSON string with an overall status and one result per environment.
+        """
+        environments = list(dict.fromkeys(environments or ENV_PORTS))
+        invalid = [e for e in environments if e not in ENV_PORTS]
+        if invalid:
+            return json.dumps({
+                "status": "error",
+                "error": f"Invalid environment(s): {', '.join(invalid)}. Must be any of: dev, staging, prod.",
+            }, indent=2)
+
+        results: dict[str, dict] = {}
+        loads = 0
+
+        # 1. Pull one environment at a time: the first load puts the image ID
+        #    in the engine, so the others only resolve and tag it.
+        for environment in environments:
+            registry, registry_host = _registry_for(environment)
+            local_tag = f"localhost/{image_name}:{tag}-{environment}"
+            try:
+                pulled = await image_transfer.pull_image(image_name, tag, registry, local_tag, ctx=ctx)
+            except Exception as e:
+                results[environment] = {
+                    "status": "error",
+                    "step": "image_pull",
+                    "error": str(e),
+                    "image": f"{registry_host}/{image_name}:{tag}",
+                }
+                continue
+            loads += pulled["pulled"]
+            results[environment] = {"digest": pulled["digest"], "local_tag": local_tag}
+
+        # 2. Replace and start every pulled environment's container at once.
+        async def start(environment: str) -> dict:
+            container_name = _container_name(environment)
+            host_port = ENV_PORTS[environment]
+            # Replaces everything deploy_app may have left running there: a
+            # scaled-out environment's balancer (under the env's name) and
+            # replicas, and a blue/green standby.
+            try:
+                await engine_client.remove_container(container_name)
+                await engine_client.remove_container(f"{container_name}-next")
+                await _remove_replicas(container_name)
+            except Exception as e:
+                return {"status": "error", "step": "engine_rm", "error": str(e)}
+            try:
+                container_id = await engine_client.run_container(
+                    container_name, results[environment]["local_tag"],
+                    network=DEPLOY_NETWORK,
+                    ports={APP_PORT: host_port},
+                )
+            except Exception as e:
+                return {"status": "error", "step": "engine_run", "error": str(e)}
+            out = {
+                "status": "success",
+                "container": container_name,
+                "container_id": container_id[:12],
+                "app_url": f"http://localhost:{host_port}",
+                "digest": results[environment]["digest"],
+            }
+            if wait_ready:
+                ready_ms = await _wait_healthy(
+                    _health_url(container_name), config.DEPLOY_READY_TIMEOUT,
+                )
+                if ready_ms is None:
+                    out.update(status="error", step="readiness",
+                               error=f"/health not ready after {config.DEPLOY_READY_TIMEOUT:g}s")
+                else:
+                    out["ready_ms"] = ready_ms
+            if ctx is not None:
+                await ctx.info(f"{environment}: {out['status']}")
+            return out
+
+        started = [e for e in environments if "local_tag" in results[e]]
+        for environment, out in zip(started, await asyncio.gather(*(start(e) for e in started))):
+            results[environment] = out
+
+        succeeded = [e for e in environments if results[e]["status"] == "success"]
+        status = "success" if len(succeeded) == len(environments) else "partial" if succeeded else "error"
+        return json.dumps({
+            "status": status,
+            "message": f"Deployed {image_name}:{tag} to {len(succeeded)}/{len(environments)} environment(s).",
+            "image_loads": loads,
+            "environments": results,
+        }, indent=2)
@@ -1,7 +1,6 @@
 from mcp.server.fastmcp import FastMCP
-import httpx
 from .. import config
-from ..clients import check_response
+from ..clients import check_response, http_client
 
 
 def register(mcp: FastMCP):
@@ -20,7 +19,7 @@ def register(mcp: FastMCP):
         Returns the promotion result as JSON.
         """
         import json
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             resp = await client.post(
                 f"{config.PROMOTION_SERVICE_URL}/promote",
                 json={"image_name": image_name, "tag": tag, "promoted_by": promoted_by},
@@ -30,19 +29,71 @@ def register(mcp: FastMCP):
             return json.dumps(resp.json(), indent=2)
 
     @mcp.tool()
-    async def list_promotions() -> str:
-        """List all image promotion records. Returns a JSON array of promotion objects with status and audit info."""
+    async def list_promotions(
+        image_name: str | None = None,
+        tag: str | None = None,
+        status: str | None = None,
+        promoted_by: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        limit: int = 20,
+        cursor: int | None = None,
+        summary: bool = False,
+    ) -> str:
+        """List image promotion records, newest first.
+
+        Args:
+            image_name: only promotions of this image (e.g. "hello-app").
+            tag: only promotions of this tag.
+            status: "success" or "failed".
+            promoted_by: only promotions recorded for this username.
+            since / until: promoted_at bounds, e.g. "2026-05-01" or
+                "2026-05-01T12:00:00".
+            limit: page size (1-500, default 20).
+            cursor: pass the previous response's `next_cursor` to get the
+                next (older) page.
+            summary: when true, return one compact line per promotion
+                instead of the full audit record.
+
+        Returns JSON with `promotions` and `next_cursor` (null on the last page).
+        """
         import json
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(f"{config.PROMOTION_SERVICE_URL}/promotions", timeout=10.0)
+        params = {
+            "image_name": image_name,
+            "tag": tag,
+            "status": status,
+            "promoted_by": promoted_by,
+            "since": since,
+            "until": until,
+            "limit": limit,
+            "cursor": cursor,
+        }
+        async with http_client() as client:
+            resp = await client.get(
+                f"{config.PROMOTION_SERVICE_URL}/promotions",
+                params={k: v for k, v in params.items() if v is not None},
+                timeout=10.0,
+            )
             check_response(resp)
-            return json.dumps(resp.json(), indent=2)
+        rows = resp.json()
+        next_cursor = resp.headers.get("x-next-cursor")
+        if summary:
+            rows = [
+                f"#{r['id']} {r['image_name']}:{r['tag']} {r['status']} "
+                f"by {r['promoted_by']} at {r['promoted_at']}"
+                + (f" {r['digest'][:19]}" if r.get("digest") else "")
+                for r in rows
+            ]
+        return json.dumps({
+            "promotions": rows,
+            "next_cursor": int(next_cursor) if next_cursor else None,
+        }, indent=None if summary else 2)
 
     @mcp.tool()
     async def get_promotion_status(promotion_id: int) -> str:
         """Get the status of a specific promotion by its ID. Returns the promotion record as JSON."""
         import json
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             resp = await client.get(f"{config.PROMOTION_SERVICE_URL}/promotions/{promotion_id}", timeout=10.0)
             check_response(resp)
             return json.dumps(resp.json(), indent=2)
@@ -4,11 +4,30 @@ from ..clients import registry_client
 
 def register(mcp: FastMCP):
     @mcp.tool()
-    async def list_registry_images(registry: str = "dev") -> str:
-        """List all images in a container registry. Registry must be 'dev' or 'prod'. Returns image names as JSON array."""
+    async def list_registry_images(
+        registry: str = "dev",
+        prefix: str | None = None,
+        limit: int = 100,
+        start_after: str | None = None,
+    ) -> str:
+        """List images in a container registry. Registry must be 'dev' or 'prod'.
+
+        Args:
+            registry: "dev" or "prod".
+            prefix: only images whose name starts with this (e.g. "team-a/").
+            limit: maximum number of names to return (default 100).
+            start_after: continue a previous listing — pass its `next_start_after`.
+
+        Returns image names as JSON. When more names exist beyond `limit`,
+        `truncated` is true and `next_start_after` is set.
+        """
         import json
-        images = await registry_client.list_images(registry)
-        return json.dumps({"registry": registry, "images": images}, indent=2)
+
+        images, truncated = await registry_client.catalog_snapshot(registry, prefix, max(1, limit), start_after)
+        result = {"registry": registry, "images": images, "truncated": truncated}
+        if truncated:
+            result["next_start_after"] = images[-1]
+        return json.dumps(result, indent=2)
 
     @mcp.tool()
     async def list_registries() -> str:
@@ -36,3 +55,41 @@ def register(mcp: FastMCP):
         import json
         await registry_client.tag_image(image_name, current_tag, new_tag, registry)
         return json.dumps({"status": "success", "image": image_name, "from_tag": current_tag, "to_tag": new_tag, "registry": registry}, indent=2)
+
+    @mcp.tool()
+    async def describe_registry(registry: str = "dev", prefix: str | None = None, limit: int = 50) -> str:
+        """Describe everything in a registry in ONE call: every image, every tag,
+        and for each tag its digest, total compressed size (bytes) and creation
+        time. Use this instead of chaining list_registry_images → list_image_tags →
+        get_image_manifest when the user asks "what's in dev/prod?".
+
+        Args:
+            registry: "dev" or "prod".
+            prefix: only images whose name starts with this.
+            limit: maximum number of images to describe (default 50).
+
+        Returns compact JSON: {"registry", "images": {image: {tag: {digest, size, created}}}, "truncated"}.
+        """
+        import json
+        images, truncated = await registry_client.describe_images(registry, prefix, max(1, limit))
+        return json.dumps(
+            {"registry": registry, "images": images, "truncated": truncated},
+            separators=(",", ":"),
+        )
+
+    @mcp.tool()
+    async def diff_registries(prefix: str | None = None) -> str:
+        """Compare registry-dev against registry-prod by digest in ONE call.
+
+        Use this to plan promotions ("what's in dev but not prod?", "is prod
+        running the same latest as dev?") instead of listing both registries.
+
+        Args:
+            prefix: only compare images whose name starts with this.
+
+        Returns JSON: only_in_dev / only_in_prod ("image:tag" lists),
+        digest_differs (same image:tag, different content) and an in_sync count.
+        """
+        import json
+        result = await registry_client.diff_registries(prefix)
+        return json.dumps(result, separators=(",", ":"))
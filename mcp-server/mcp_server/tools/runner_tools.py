@@ -4,60 +4,85 @@ Build/scan/deploy implemented against an engine socket mounted at
 /var/run/docker.sock.
 
 Build pipeline (per plan D-014):
-  1. `git clone` the repo via subprocess
-  2. `podman --remote --url unix:///var/run/docker.sock build -t TAG .`
-     — talks to the engine socket; no daemon-side push side-effects
-  3. `podman --remote ... save -o /tmp/img.tar TAG` to an OCI tarball
-  4. `skopeo copy --dest-tls-verify=false docker-archive:/tmp/img.tar
-     docker://registry-dev:5000/IMAGE:TAG`
+  0. `git ls-remote` for the HEAD commit; if that commit and Dockerfile were
+     already built for this image (build_cache.py), retag the pushed digest
+     in registry-dev and stop there
+  1. Check out that commit from a persistent bare mirror (git_mirror.py)
+     — no transfer if the mirror already has it, an incremental
+     `git fetch` otherwise
+  2. POST /build on the engine socket (clients/engine_client.py — Docker
+     Engine or libpod API); build output streams back as JSON and is
+     relayed through ctx.info. No daemon-side push side-effects.
+     Layer cache is registry-backed: registry-dev's <image>:buildcache is
+     pulled into the engine first (image_transfer.pull_image) and offered
+     as cache-from, and after the push that tag is pointed at the new
+     image (cache-to). The plain REST /build has no BuildKit session for
+     `--cache-to type=registry`, and the daemon can't resolve
+     registry-dev anyway, so both directions go through the runner.
+  3. Push to registry-dev (image_transfer.push_image): HEAD the image's config and
+     layer blobs; only if some are missing, stream GET /images/{TAG}/get
+     and upload just those tar members straight into the registry. Nothing
+     is staged on disk, and unchanged layers are never re-sent.
      — push happens FROM the runner container, which IS on the
      mcp-lab-net network and CAN resolve `registry-dev`. The daemon
      is NOT involved in the push, so it doesn't need lab-network DNS.
 
+Steps 1-3 hold one of BUILD_CONCURRENCY build slots, and builds of the
+same image:tag are single-flighted (build_scheduler.py).
+
+scan_image reads the image's layers from registry-dev (scanner.py) and
+matches their packages against the offline DB at VULN_DB_PATH
+(vuln_db.py); no engine involvement.
+
 Workshop notes:
-  - The runner container needs `podman` and `skopeo` (Debian apt packages)
+  - The runner container needs `git` (Debian apt package)
   - The runner needs `--security-opt label=disable` to bypass rootless
     Podman's SELinux denial of /var/run/docker.sock access
   - Docker Desktop users get the same code path; `--security-opt label=disable`
     is a no-op there.
 """
 
-import asyncio
 import json
 import os
-import shutil
-import tempfile
 import urllib.parse
 
 from mcp.server.fastmcp import FastMCP, Context
 
-from .. import config
-from ..engine import engine_cmd
+from .. import build_cache, config, git_mirror, image_transfer, scanner, vuln_db
+from ..build_scheduler import BuildScheduler
+from ..clients import engine_client, registry_client
 
 
-async def _run(
-    *args: str,
-    cwd: str | None = None,
-    env: dict | None = None,
-    ctx: Context | None = None,
-    log_args: tuple[str, ...] | None = None,
-) -> tuple[int, bytes, bytes]:
-    """Run a subprocess, optionally logging via the FastMCP context.
+_scheduler = BuildScheduler(config.BUILD_CONCURRENCY)
 
-    log_args: when supplied, logged in place of args (used to scrub embedded
-    HTTP-Basic credentials from the clone URL before they reach ctx.info).
-    """
+
+async def _retag_cached(cache_key: str, image_name: str, tag: str) -> str | None:
+    """Point tag at a previously built digest; None on a miss, or if the
+    registry no longer has that manifest."""
+    entry = build_cache.lookup(cache_key)
+    if entry is None:
+        return None
+    try:
+        await registry_client.tag_image(image_name, entry["digest"], tag)
+    except Exception:
+        build_cache.forget(cache_key)
+        return None
+    return entry["digest"]
+
+
+async def _seed_layer_cache(image_name: str, ctx: Context | None) -> list[str] | None:
+    """Load registry-dev's cache image into the engine for cache-from;
+    None when there is none yet (first build, or the registry was wiped)."""
+    cache_ref = f"localhost/{image_name}:{config.BUILD_CACHE_TAG}"
+    try:
+        seeded = await image_transfer.pull_image(image_name, config.BUILD_CACHE_TAG, "dev", cache_ref, ctx=ctx)
+    except Exception:
+        if ctx is not None:
+            await ctx.info(f"no {image_name}:{config.BUILD_CACHE_TAG} in {config.DEV_REGISTRY_HOST}; building without registry cache")
+        return None
     if ctx is not None:
-        await ctx.info(f"$ {' '.join(log_args if log_args is not None else args)}")
-    proc = await asyncio.create_subprocess_exec(
-        *args,
-        cwd=cwd,
-        env=env,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-    )
-    stdout, stderr = await proc.communicate()
-    return proc.returncode, stdout, stderr
+        await ctx.info(f"using layer cache {seeded['image_id'][:19]} from {config.DEV_REGISTRY_HOST}")
+    return [cache_ref]
 
 
 def _inject_clone_credentials(
@@ -99,6 +124,122 @@ def _inject_clone_credentials(
     return urllib.parse.urlunparse(parsed._replace(netloc=netloc))
 
 
+async def _build_image(
+    repo_url: str,
+    image_name: str,
+    tag: str,
+    username: str | None,
+    password: str | None,
+    ctx: Context | None,
+    build_args: dict[str, str] | None = None,
+    target: str | None = None,
+    registry_cache: bool = True,
+) -> str:
+    options = {k: v for k, v in (("build_args", build_args), ("target", target)) if v}
+    registry_image = f"{config.DEV_REGISTRY_HOST}/{image_name}:{tag}"
+    local_tag = f"localhost/{image_name}:{tag}"
+
+    # 1. resolve the commit being built — a ref advertisement only.
+    #    Credentials are embedded in the URL (so we don't need a TTY) and
+    #    git's terminal prompt is disabled so a 401 fails fast with a
+    #    readable error instead of "could not read Username for ...".
+    clone_url = _inject_clone_credentials(repo_url, username, password)
+    git_env = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+    try:
+        commit = await git_mirror.resolve_head(repo_url, clone_url, git_env, ctx=ctx)
+    except git_mirror.GitError as e:
+        return json.dumps({
+            "status": "error",
+            "step": e.step,
+            "error": str(e),
+            "repo_url": repo_url,
+        }, indent=2)
+
+    # 2. same commit + Dockerfile already built and pushed? Just retag.
+    dockerfile = await git_mirror.blob_id(repo_url, commit, "Dockerfile")
+    if dockerfile is not None:
+        cache_key = build_cache.key(repo_url, commit, dockerfile, image_name, options)
+        digest = await _retag_cached(cache_key, image_name, tag)
+        if digest is not None:
+            if ctx is not None:
+                await ctx.info(f"{commit[:12]} already built as {digest[:19]}; retagged")
+            return json.dumps({
+                "status": "success",
+                "cache": "hit",
+                "image": registry_image,
+                "digest": digest,
+                "repo_url": repo_url,
+                "commit": commit,
+                "message": f"{image_name} was already built from {commit[:12]}; tagged it {tag} in {config.DEV_REGISTRY_HOST}.",
+            }, indent=2)
+
+    # 3-5 hold one of the runner's build slots (queued FIFO when all
+    # BUILD_CONCURRENCY are busy).
+    async with _scheduler.slot(ctx):
+        cache_from = await _seed_layer_cache(image_name, ctx) if registry_cache else None
+
+        # 3. git checkout from the persistent mirror cache
+        try:
+            async with git_mirror.checkout(repo_url, clone_url, git_env, ctx=ctx, commit=commit) as (workdir, _):
+                # 4. engine build over the socket API; each build-output line
+                #    is relayed to the client as it arrives.
+                try:
+                    await engine_client.build(
+                        workdir, local_tag,
+                        on_log=ctx.info if ctx is not None else None,
+                        build_args=build_args,
+                        target=target,
+                        cache_from=cache_from,
+                    )
+                except Exception as e:
+                    return json.dumps({
+                        "status": "error",
+                        "step": "engine_build",
+                        "error": str(e),
+                    }, indent=2)
+        except git_mirror.GitError as e:
+            return json.dumps({
+                "status": "error",
+                "step": e.step,
+                "error": str(e),
+                "repo_url": repo_url,
+            }, indent=2)
+
+        # 5. push to registry-dev straight from the engine (no tarball)
+        try:
+            pushed = await image_transfer.push_image(local_tag, image_name, tag, ctx=ctx)
+        except Exception as e:
+            return json.dumps({
+                "status": "error",
+                "step": "registry_push",
+                "error": str(e),
+            }, indent=2)
+
+    if registry_cache and tag != config.BUILD_CACHE_TAG:
+        try:
+            await registry_client.tag_image(image_name, pushed["digest"], config.BUILD_CACHE_TAG)
+        except Exception as e:
+            # The image itself is pushed; a stale cache tag only costs speed.
+            if ctx is not None:
+                await ctx.info(f"could not update {image_name}:{config.BUILD_CACHE_TAG}: {e}")
+
+    dockerfile = await git_mirror.blob_id(repo_url, commit, "Dockerfile")
+    if dockerfile is not None:
+        build_cache.store(build_cache.key(repo_url, commit, dockerfile, image_name, options), pushed["digest"])
+
+    return json.dumps({
+        "status": "success",
+        "cache": "miss",
+        "image": registry_image,
+        "digest": pushed["digest"],
+        "blobs_reused": pushed["blobs_reused"],
+        "bytes_pushed": pushed["bytes_pushed"],
+        "repo_url": repo_url,
+        "commit": commit,
+        "message": f"Built {image_name}:{tag} and pushed to {config.DEV_REGISTRY_HOST}.",
+    }, indent=2)
+
+
 def register(mcp: FastMCP):
     @mcp.tool()
     async def build_image(
@@ -107,6 +248,9 @@ def register(mcp: FastMCP):
         tag: str = "latest",
         username: str | None = None,
         password: str | None = None,
+        build_args: dict[str, str] | None = None,
+        target: str | None = None,
+        registry_cache: bool = True,
         ctx: Context | None = None,
     ) -> str:
         """
@@ -131,78 +275,24 @@ def register(mcp: FastMCP):
             tag: Image tag. Defaults to "latest".
             username: Optional Gitea username for HTTP Basic auth on the clone.
             password: Optional Gitea password (or PAT) paired with username.
+            build_args: Optional Dockerfile ARG values, e.g. {"VERSION": "1.2"}.
+            target: Optional multi-stage build target to stop at.
+            registry_cache: Reuse layers from the dev registry's build cache and
+                update it afterwards. Defaults to true.
 
         Returns:
             JSON string with build status and the full registry-qualified image name.
         """
-        registry_image = f"{config.DEV_REGISTRY_HOST}/{image_name}:{tag}"
-        local_tag = f"localhost/{image_name}:{tag}"
-
-        with tempfile.TemporaryDirectory() as workdir:
-            # 1. git clone — embed credentials in the URL (so we don't need a TTY)
-            #    and disable git's terminal prompt so a 401 fails fast with a
-            #    readable error instead of "could not read Username for ...".
-            clone_url = _inject_clone_credentials(repo_url, username, password)
-            git_env = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
-            rc, _, stderr = await _run(
-                "git", "clone", "--depth", "1", clone_url, ".",
-                cwd=workdir, env=git_env, ctx=ctx,
-                log_args=("git", "clone", "--depth", "1", repo_url, "."),
-            )
-            if rc != 0:
-                return json.dumps({
-                    "status": "error",
-                    "step": "git_clone",
-                    "error": stderr.decode(errors="replace").strip(),
-                    "repo_url": repo_url,
-                }, indent=2)
-
-            # 2. engine build via the local socket (docker → docker build,
-            #    podman → podman --remote build).
-            rc, _, stderr = await _run(
-                *engine_cmd("build", "-t", local_tag, "."),
-                cwd=workdir, ctx=ctx,
-            )
-            if rc != 0:
-                return json.dumps({
-                    "status": "error",
-                    "step": "engine_build",
-                    "error": stderr.decode(errors="replace").strip(),
-                }, indent=2)
-
-            # 3. engine save → OCI tarball (so skopeo can push it)
-            tarball = os.path.join(workdir, "img.tar")
-            rc, _, stderr = await _run(
-                *engine_cmd("save", "-o", tarball, local_tag),
-                ctx=ctx,
-            )
-            if rc != 0:
-                return json.dumps({
-                    "status": "error",
-                    "step": "engine_save",
-                    "error": stderr.decode(errors="replace").strip(),
-                }, indent=2)
-
-            # 4. skopeo push to registry-dev (bypasses daemon-side DNS)
-            rc, _, stderr = await _run(
-                "skopeo", "copy", "--dest-tls-verify=false",
-                f"docker-archive:{tarball}",
-                f"docker://{registry_image}",
-                ctx=ctx,
-            )
-            if rc != 0:
-                return json.dumps({
-                    "status": "error",
-                    "step": "skopeo_push",
-                    "error": stderr.decode(errors="replace").strip(),
-                }, indent=2)
-
-        return json.dumps({
-            "status": "success",
-            "image": registry_image,
-            "repo_url": repo_url,
-            "message": f"Built {image_name}:{tag} and pushed to {config.DEV_REGISTRY_HOST}.",
-        }, indent=2)
+        return await _scheduler.single_flight(
+            (image_name, tag),
+            (repo_url, username, password,
+             json.dumps(build_args or {}, sort_keys=True), target, registry_cache),
+            lambda: _build_image(
+                repo_url, image_name, tag, username, password, ctx,
+                build_args=build_args, target=target, registry_cache=registry_cache,
+            ),
+            ctx=ctx,
+        )
 
     @mcp.tool()
     async def scan_image(
@@ -211,8 +301,13 @@ def register(mcp: FastMCP):
         ctx: Context | None = None,
     ) -> str:
         """
-        Run a (mock) security scan on a container image and return a JSON
-        report of vulnerabilities.
+        Scan a container image in the dev registry for known vulnerabilities
+        and return a JSON report.
+
+        The image's layers are read for installed Debian/Alpine packages and
+        Python distributions, which are matched against the runner's offline
+        vulnerability DB. Layers already scanned (e.g. a shared base image)
+        are not read again. FAILED means at least one CRITICAL finding.
 
         DEFAULTS: if the user just says "scan the image" or "scan the hello world
         app", call with no arguments — defaults to "hello-app:latest".
@@ -224,43 +319,33 @@ def register(mcp: FastMCP):
         Returns:
             JSON string with security report.
         """
-        import random
-
         if ctx is not None:
             await ctx.info(f"Scanning {image_name}:{tag}...")
 
-        vulnerabilities = []
-
-        # 20% chance of finding a "critical" vulnerability if not 'auth-service' (just for demo)
-        if "auth-service" not in image_name and random.random() < 0.2:
-            vulnerabilities.append({
-                "id": "CVE-2026-1234",
-                "severity": "CRITICAL",
-                "package": "openssl",
-                "fixed_version": "3.0.15",
-                "description": "Buffer overflow in SSL handshake.",
-            })
-
-        # Always find some low/medium issues
-        vulnerabilities.append({
-            "id": "CVE-2026-5678",
-            "severity": "LOW",
-            "package": "curl",
-            "fixed_version": "8.10.1",
-            "description": "Minor information leak.",
-        })
-
+        try:
+            report = await scanner.scan_image(image_name, tag, ctx=ctx)
+        except scanner.ScanError as e:
+            return json.dumps({
+                "status": "error",
+                "step": e.step,
+                "error": str(e),
+                "image": f"{image_name}:{tag}",
+            }, indent=2)
+
+        vulnerabilities = report["vulnerabilities"]
         status = "PASSED" if not any(v["severity"] == "CRITICAL" for v in vulnerabilities) else "FAILED"
 
         return json.dumps({
             "status": status,
             "image": f"{image_name}:{tag}",
-            "scanner": "Trivy (Mock)",
+            "digest": report["digest"],
+            "scanner": "mcp-runner (offline DB)",
             "vulnerabilities": vulnerabilities,
             "summary": {
-                "critical": sum(1 for v in vulnerabilities if v["severity"] == "CRITICAL"),
-                "high": 0,
-                "medium": 0,
-                "low": sum(1 for v in vulnerabilities if v["severity"] == "LOW"),
+                severity.lower(): sum(1 for v in vulnerabilities if v["severity"] == severity)
+                for severity in vuln_db.SEVERITIES
             },
+            "packages": report["packages"],
+            "layers": report["layers"],
+            "layers_scanned": report["layers_scanned"],
         }, indent=2)
@@ -0,0 +1,30 @@
+"""FastMCP with a span around every tool call (see tracing.py).
+
+The span continues the trace of the HTTP request that carried the call
+when chat-ui sent a traceparent, so a tool handler — and the upstream
+requests, engine calls and git subprocesses it makes — show up under the
+chat turn that asked for it.
+"""
+from typing import Any
+
+from mcp.server.fastmcp import FastMCP
+
+from . import tracing
+
+
+class TracedFastMCP(FastMCP):
+    def __init__(self, name: str, *args, **kwargs):
+        super().__init__(name, *args, **kwargs)
+        tracing.set_service(name)
+
+    async def call_tool(self, name: str, arguments: dict[str, Any]):
+        try:
+            request = self.get_context().request_context.request
+        except (LookupError, ValueError):
+            request = None
+        headers = request.headers if request is not None else {}
+        with tracing.remote(headers), tracing.span(f"tool {name}", "server", **{
+            "mcp.server": self.name,
+            "mcp.tool": name,
+        }):
+            return await super().call_tool(name, arguments)
@@ -0,0 +1,336 @@
+"""Request tracing across chat-ui, the MCP servers and promotion-service.
+
+A chat turn's time is spread over several processes: the model, MCP
+handshakes, tool handlers, upstream HTTP, git subprocesses. Each of them
+opens spans with `span(name, kind, **attributes)`; a span opened while
+another is current (in the same task, or a task started from it) is its
+child. Across processes the W3C `traceparent` header carries the trace:
+`inject()` / TracingTransport add it to outgoing requests and `remote()`
+continues it on the receiving side.
+
+Finished spans are appended to TRACE_DIR/<service>.jsonl, one OTLP/JSON
+ExportTraceServiceRequest per line (what the OpenTelemetry collector's
+file exporter writes), so the files load into any OTLP tool as they are.
+A request's spans are buffered and written in one line when its outermost
+local span ends; a writer thread does the file I/O, so ending a span never
+blocks the event loop on disk. Files over TRACE_FILE_MAX_MB are rotated to
+`.1`. `load_trace()` reads one trace back out of every service's file
+(after `flush()`); chat-ui uses it to show a turn's spans.
+
+With TRACE_DIR unset, tracing is off: span() hands back a no-op span and
+no header is sent.
+
+chat-ui's and promotion-service's images copy this file in (see their
+Dockerfiles), so it must only depend on the standard library and httpx.
+"""
+import atexit
+import glob
+import json
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import httpx
+
+
+TRACE_DIR = os.environ.get("TRACE_DIR", "")
+TRACE_FILE_MAX_MB = float(os.environ.get("TRACE_FILE_MAX_MB", "16"))
+SERVICE = os.environ.get("OTEL_SERVICE_NAME", "")
+
+_KINDS = {"internal": 1, "server": 2, "client": 3}
+_KIND_NAMES = {v: k for k, v in _KINDS.items()}
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+def set_service(name: str) -> None:
+    """Name this process's spans, unless OTEL_SERVICE_NAME already does."""
+    global SERVICE
+    if not os.environ.get("OTEL_SERVICE_NAME"):
+        SERVICE = name
+
+
+class _Batch:
+    """Spans of one local request, written together when its root ends."""
+    __slots__ = ("spans", "written")
+
+    def __init__(self):
+        self.spans: list["Span"] = []
+        self.written = False
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind",
+                 "start_ns", "end_ns", "attributes", "error", "_batch")
+
+    def __init__(self, name: str, kind: str, trace_id: str, parent_id: str,
+                 batch: _Batch, attributes: dict):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error: str | None = None
+        self._batch = batch
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def fail(self, message: str) -> None:
+        self.error = message
+
+
+class _NoopSpan:
+    trace_id = span_id = parent_id = traceparent = None
+
+    def set(self, key: str, value) -> None:
+        pass
+
+    def fail(self, message: str) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+_current: ContextVar[Span | None] = ContextVar("trace_span", default=None)
+# traceparent of the caller, when this process is continuing its trace.
+_remote: ContextVar[tuple[str, str] | None] = ContextVar("trace_remote", default=None)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    if not TRACE_DIR:
+        yield _NOOP
+        return
+    parent = _current.get()
+    if parent is not None:
+        trace_id, parent_id, batch = parent.trace_id, parent.span_id, parent._batch
+    else:
+        trace_id, parent_id = _remote.get() or (secrets.token_hex(16), "")
+        batch = _Batch()
+    s = Span(name, kind, trace_id, parent_id, batch, attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        if s.error is None:
+            s.fail(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        _current.reset(token)
+        if batch.written:
+            # Outlived its root (a task left running); write it on its own.
+            _export([s])
+        else:
+            batch.spans.append(s)
+            if parent is None:
+                batch.written = True
+                _export(batch.spans)
+
+
+def current() -> Span | None:
+    return _current.get()
+
+
+def traceparent() -> str | None:
+    s = _current.get()
+    return s.traceparent if s is not None else None
+
+
+def inject(headers: dict) -> dict:
+    """`headers`, plus the current span's traceparent if there is one."""
+    value = traceparent()
+    return {**headers, "traceparent": value} if value else headers
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str] | None:
+    m = _TRACEPARENT.match((value or "").strip().lower())
+    if not m or m.group(1) == "0" * 32 or m.group(2) == "0" * 16:
+        return None
+    return m.group(1), m.group(2)
+
+
+@contextmanager
+def remote(headers):
+    """Make the next span opened here a child of the caller's span named
+    by the `traceparent` in `headers` (any mapping), if it sent one."""
+    parent = parse_traceparent(headers.get("traceparent")) if TRACE_DIR else None
+    if parent is None:
+        yield
+        return
+    token = _remote.set(parent)
+    current_token = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(current_token)
+        _remote.reset(token)
+
+
+class TracingTransport(httpx.AsyncBaseTransport):
+    """One client span per request, timed to the response headers, with
+    the traceparent that continues it upstream."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        url = request.url
+        with span(f"{request.method} {url.host}{url.path}", "client", **{
+            "http.request.method": request.method,
+            "server.address": url.host,
+            "url.path": url.path,
+        }) as s:
+            if s.traceparent:
+                request.headers["traceparent"] = s.traceparent
+            response = await self.inner.handle_async_request(request)
+            s.set("http.response.status_code", response.status_code)
+            if response.status_code >= 500:
+                s.fail(f"HTTP {response.status_code}")
+            return response
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+def instrument(transport: httpx.AsyncBaseTransport | None = None) -> httpx.AsyncBaseTransport | None:
+    """`transport` (default: httpx's own) wrapped in a TracingTransport when
+    tracing is on; otherwise `transport` unchanged."""
+    if not TRACE_DIR:
+        return transport
+    return TracingTransport(transport or httpx.AsyncHTTPTransport())
+
+
+# ─── OTLP/JSON export ───────────────────────────────────────────────────
+
+def _value(v) -> dict:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+def _otlp_span(s: Span) -> dict:
+    out = {
+        "traceId": s.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": _KINDS.get(s.kind, 1),
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns),
+        "attributes": [{"key": k, "value": _value(v)} for k, v in s.attributes.items() if v is not None],
+        "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+    }
+    if s.parent_id:
+        out["parentSpanId"] = s.parent_id
+    return out
+
+
+# (directory, service, spans) batches waiting for the writer thread.
+_pending: queue.Queue = queue.Queue()
+_writer: threading.Thread | None = None
+_writer_lock = threading.Lock()
+
+
+def _export(spans: list[Span]) -> None:
+    """Hand `spans` to the writer thread, starting it on first use."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_write_loop, name="trace-export", daemon=True)
+                _writer.start()
+    _pending.put((TRACE_DIR, SERVICE or "unknown", spans))
+
+
+def _write_loop() -> None:
+    while True:
+        directory, service, spans = _pending.get()
+        try:
+            _write(directory, service, spans)
+        finally:
+            _pending.task_done()
+
+
+def _write(directory: str, service: str, spans: list[Span]) -> None:
+    line = json.dumps({"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service}}]},
+        "scopeSpans": [{"scope": {"name": "mcp-lab"}, "spans": [_otlp_span(s) for s in spans]}],
+    }]}, separators=(",", ":"))
+    path = os.path.join(directory, f"{service}.jsonl")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(path) and os.path.getsize(path) > TRACE_FILE_MAX_MB * 1024 * 1024:
+            os.replace(path, path + ".1")
+        with open(path, "a") as f:
+            f.write(line + "\n")
+    except OSError:
+        pass  # a full or read-only disk must not fail the request being traced
+
+
+def flush() -> None:
+    """Block until every span ended so far is written."""
+    _pending.join()
+
+
+atexit.register(flush)
+
+
+def _plain(value: dict):
+    for key in ("stringValue", "boolValue", "doubleValue"):
+        if key in value:
+            return value[key]
+    if "intValue" in value:
+        return int(value["intValue"])
+    return None
+
+
+def load_trace(trace_id: str, directory: str | None = None) -> list[dict]:
+    """Every span of `trace_id` in any service's file, oldest first."""
+    directory = TRACE_DIR if directory is None else directory
+    if not directory or not re.fullmatch(r"[0-9a-f]{32}", trace_id or ""):
+        return []
+    flush()
+    spans = []
+    for path in glob.glob(os.path.join(directory, "*.jsonl*")):
+        try:
+            with open(path) as f:
+                lines = [line for line in f if trace_id in line]
+        except OSError:
+            continue
+        for line in lines:
+            for rs in json.loads(line).get("resourceSpans", []):
+                attrs = {a["key"]: _plain(a["value"]) for a in rs.get("resource", {}).get("attributes", [])}
+                for ss in rs.get("scopeSpans", []):
+                    for s in ss.get("spans", []):
+                        if s["traceId"] != trace_id:
+                            continue
+                        status = s.get("status", {})
+                        spans.append({
+                            "trace_id": s["traceId"],
+                            "span_id": s["spanId"],
+                            "parent_id": s.get("parentSpanId") or None,
+                            "name": s["name"],
+                            "service": attrs.get("service.name", "unknown"),
+                            "kind": _KIND_NAMES.get(s.get("kind"), "internal"),
+                            "start_ns": int(s["startTimeUnixNano"]),
+                            "end_ns": int(s["endTimeUnixNano"]),
+                            "attributes": {a["key"]: _plain(a["value"]) for a in s.get("attributes", [])},
+                            "error": status.get("message") if status.get("code") == 2 else None,
+                        })
+    spans.sort(key=lambda s: s["start_ns"])
+    return spans
@@ -0,0 +1,226 @@
+"""Offline vulnerability database for scan_image.
+
+The DB is one tab-separated text file, sorted by package name:
+
+    # mcp-vulndb 1
+    <package>\t<ecosystem>\t<id>\t<severity>\t<introduced>\t<fixed>\t<summary>
+
+One line per affected version range: `introduced` "0" means every version
+before `fixed`, and an empty `fixed` means no fixed release yet. Ecosystems
+follow OSV naming ("Debian:12", "Alpine:v3.19", "PyPI").
+
+The file is memory-mapped rather than loaded, and lookups binary-search it
+by package name, so opening a full snapshot costs nothing and a scan only
+touches the lines for the packages it finds. `python -m mcp_server.vuln_db
+build OSV_DIR OUT` converts an offline OSV export (the per-ecosystem
+`all.zip` files from osv.dev, unzipped) into this format.
+"""
+
+import json
+import mmap
+import os
+import re
+import sys
+import threading
+
+from . import config
+
+
+HEADER = b"# mcp-vulndb 1\n"
+SEVERITIES = ("CRITICAL", "HIGH", "MEDIUM", "LOW", "UNKNOWN")
+
+
+def _order(c: str) -> int:
+    # dpkg ordering for the non-digit parts: `~` sorts before everything,
+    # even the end of the string; letters sort before other characters.
+    if c == "~":
+        return -1
+    if c.isalpha():
+        return ord(c)
+    return ord(c) + 256
+
+
+def _compare_part(a: str, b: str) -> int:
+    i = j = 0
+    while i < len(a) or j < len(b):
+        while (i < len(a) and not a[i].isdigit()) or (j < len(b) and not b[j].isdigit()):
+            ac = _order(a[i]) if i < len(a) and not a[i].isdigit() else 0
+            bc = _order(b[j]) if j < len(b) and not b[j].isdigit() else 0
+            if ac != bc:
+                return -1 if ac < bc else 1
+            i += 1
+            j += 1
+        si = i
+        while i < len(a) and a[i].isdigit():
+            i += 1
+        sj = j
+        while j < len(b) and b[j].isdigit():
+            j += 1
+        an, bn = int(a[si:i] or 0), int(b[sj:j] or 0)
+        if an != bn:
+            return -1 if an < bn else 1
+    return 0
+
+
+def compare_versions(a: str, b: str) -> int:
+    """Compare two package versions the way dpkg does (`epoch:upstream-revision`).
+
+    That ordering is also right for apk versions and plain dotted PyPI
+    releases, which is everything the scanner reports.
+    """
+    def split(v: str) -> tuple[int, str, str]:
+        epoch, _, rest = v.partition(":") if ":" in v else ("0", "", v)
+        upstream, _, revision = rest.rpartition("-") if "-" in rest else (rest, "", "")
+        return int(epoch) if epoch.isdigit() else 0, upstream, revision
+
+    ea, ua, ra = split(a)
+    eb, ub, rb = split(b)
+    if ea != eb:
+        return -1 if ea < eb else 1
+    return _compare_part(ua, ub) or _compare_part(ra, rb)
+
+
+class VulnDB:
+    """A memory-mapped DB file; see the module docstring for the format."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(HEADER)] != HEADER:
+            self._map.close()
+            raise ValueError(f"{path} is not an mcp-vulndb file")
+        self._start = len(HEADER)
+
+    def close(self) -> None:
+        self._map.close()
+
+    def _line_start(self, pos: int) -> int:
+        return max(self._start, self._map.rfind(b"\n", self._start, pos) + 1)
+
+    def _first_line(self, name: bytes) -> int:
+        """Offset of the first line whose package is >= name."""
+        lo, hi = self._start, len(self._map)
+        while lo < hi:
+            mid = self._line_start((lo + hi) // 2)
+            end = self._map.find(b"\n", mid)
+            end = len(self._map) if end < 0 else end
+            if self._map[mid:end].split(b"\t", 1)[0] < name:
+                lo = end + 1
+            else:
+                hi = mid
+        return lo
+
+    def entries(self, package: str, ecosystem: str) -> list[dict]:
+        """Every affected range recorded for `package` in `ecosystem`."""
+        name = package.encode()
+        pos = self._first_line(name)
+        out = []
+        while pos < len(self._map):
+            end = self._map.find(b"\n", pos)
+            end = len(self._map) if end < 0 else end
+            fields = self._map[pos:end].decode().split("\t")
+            if fields[0] != package:
+                break
+            if len(fields) == 7 and fields[1] == ecosystem:
+                out.append({
+                    "id": fields[2], "severity": fields[3], "introduced": fields[4],
+                    "fixed": fields[5], "summary": fields[6],
+                })
+            pos = end + 1
+        return out
+
+    def match(self, package: str, ecosystem: str, version: str) -> list[dict]:
+        """The entries whose affected range contains `version`."""
+        hits = []
+        for entry in self.entries(package, ecosystem):
+            if entry["introduced"] != "0" and compare_versions(version, entry["introduced"]) < 0:
+                continue
+            if entry["fixed"] and compare_versions(version, entry["fixed"]) >= 0:
+                continue
+            hits.append(entry)
+        return hits
+
+
+_open: VulnDB | None = None
+_open_key: tuple[str, int] | None = None
+_open_lock = threading.Lock()
+
+
+def load() -> VulnDB:
+    """The DB at VULN_DB_PATH, remapped whenever the file is replaced."""
+    global _open, _open_key
+    path = config.VULN_DB_PATH
+    key = (path, os.stat(path).st_mtime_ns)
+    with _open_lock:
+        if _open_key != key:
+            _open = VulnDB(path)
+            _open_key = key
+        return _open
+
+
+# ─── building a DB from an OSV export ───
+
+def _clean(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _osv_lines(record: dict) -> list[tuple[str, ...]]:
+    """(package, ecosystem, id, severity, introduced, fixed, summary) per
+    affected range. A range with no `fixed` event (only `last_affected` or
+    nothing) is recorded as open-ended."""
+    severity = str(record.get("database_specific", {}).get("severity", "")).upper()
+    summary = _clean(record.get("summary") or record.get("details", "")[:200])
+    lines = []
+    for affected in record.get("affected", []):
+        pkg = affected.get("package", {})
+        if not pkg.get("name") or not pkg.get("ecosystem"):
+            continue
+        # GHSA records carry a severity; Debian's carry an urgency instead.
+        sev = severity or str(affected.get("ecosystem_specific", {}).get("urgency", "")).upper()
+        sev = {"MODERATE": "MEDIUM", "UNIMPORTANT": "LOW"}.get(sev, sev)
+        if sev not in SEVERITIES:
+            sev = "UNKNOWN"
+        for rng in affected.get("ranges", []):
+            if rng.get("type") not in ("ECOSYSTEM", "SEMVER"):
+                continue
+            introduced = None
+            for event in rng.get("events", []):
+                if "introduced" in event:
+                    introduced = event["introduced"]
+                elif "fixed" in event and introduced is not None:
+                    lines.append((pkg["name"], pkg["ecosystem"], record["id"], sev,
+                                  introduced, event["fixed"], summary))
+                    introduced = None
+            if introduced is not None:
+                lines.append((pkg["name"], pkg["ecosystem"], record["id"], sev,
+                              introduced, "", summary))
+    return lines
+
+
+def write_db(records, path: str) -> int:
+    """Write OSV records as a DB file at `path` (atomically); return the
+    number of lines written."""
+    lines = sorted({line for record in records for line in _osv_lines(record)})
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(HEADER.decode())
+        for line in lines:
+            f.write("\t".join(x.replace("\t", " ") for x in line) + "\n")
+    os.replace(tmp, path)
+    return len(lines)
+
+
+def _iter_osv(directory: str):
+    for dirpath, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.endswith(".json"):
+                with open(os.path.join(dirpath, name), encoding="utf-8") as f:
+                    yield json.load(f)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "build":
+        sys.exit("usage: python -m mcp_server.vuln_db build OSV_DIR OUT")
+    count = write_db(_iter_osv(sys.argv[2]), sys.argv[3])
+    print(f"wrote {count} affected ranges to {sys.argv[3]}")
@@ -1,5 +1,32 @@
 import sys
 from pathlib import Path
 
+import httpx
+import pytest
+
 # Make `mcp_server` importable when running pytest from mcp-server/
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(autouse=True)
+def _runner_cache_dir(tmp_path, monkeypatch):
+    """Keep the runner's persistent caches (git mirrors, ...) per-test."""
+    from mcp_server import config
+    monkeypatch.setattr(config, "RUNNER_CACHE_DIR", str(tmp_path / "runner-cache"))
+
+
+@pytest.fixture
+def mock_http(monkeypatch):
+    """`mock_http(handler)`: every httpx.AsyncClient opened afterwards sends
+    its requests to `handler` through a MockTransport. Calling it again
+    re-points clients opened after that."""
+    real_client = httpx.AsyncClient
+
+    def install(handler):
+        def fake_client(*args, **kwargs):
+            kwargs["transport"] = httpx.MockTransport(handler)
+            return real_client(*args, **kwargs)
+
+        monkeypatch.setattr(httpx, "AsyncClient", fake_client)
+
+    return install
@@ -0,0 +1,109 @@
+"""balancer — round-robin TCP proxy in front of deploy_app's replicas.
+
+Real sockets on localhost: two tiny HTTP backends behind a Pool, checked
+for round-robin spread, health-checked membership, and failover when a
+backend goes away between refreshes.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from mcp_server import balancer
+
+
+class Backend:
+    def __init__(self, name: str):
+        self.name = name
+        self.healthy = True
+        self.server: asyncio.Server | None = None
+
+    async def handle(self, reader, writer):
+        request = await reader.readuntil(b"\r\n\r\n")
+        if request.startswith(b"GET /health") and not self.healthy:
+            body, status = b"down", b"503 Service Unavailable"
+        else:
+            body, status = self.name.encode(), b"200 OK"
+        writer.write(b"HTTP/1.1 " + status + b"\r\nConnection: close\r\nContent-Length: "
+                     + str(len(body)).encode() + b"\r\n\r\n" + body)
+        await writer.drain()
+        writer.close()
+
+    async def start(self) -> tuple[str, int]:
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+
+@pytest.fixture
+async def lab():
+    backends = [Backend("a"), Backend("b")]
+    pool = balancer.Pool([await b.start() for b in backends], timeout=1.0)
+    await pool.refresh()
+    server = await balancer.serve(pool, 0, host="127.0.0.1")
+    url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/"
+
+    async def get() -> httpx.Response:
+        async with httpx.AsyncClient() as client:
+            return await client.get(url)
+
+    yield backends, pool, get
+    server.close()
+    for b in backends:
+        if b.server.is_serving():
+            await b.stop()
+
+
+@pytest.mark.asyncio
+async def test_connections_are_spread_round_robin(lab):
+    _, pool, get = lab
+    assert len(pool.members) == 2
+    bodies = [(await get()).text for _ in range(4)]
+    assert sorted(bodies) == ["a", "a", "b", "b"]
+    assert bodies[0] != bodies[1]
+
+
+@pytest.mark.asyncio
+async def test_unhealthy_backend_leaves_the_pool_on_refresh(lab):
+    backends, pool, get = lab
+    backends[1].healthy = False
+    await pool.refresh()
+
+    assert [(await get()).text for _ in range(3)] == ["a", "a", "a"]
+
+    backends[1].healthy = True
+    await pool.refresh()
+    assert len(pool.members) == 2
+
+
+@pytest.mark.asyncio
+async def test_dead_backend_fails_over_before_the_next_refresh(lab):
+    backends, pool, get = lab
+    await backends[0].stop()
+
+    responses = [await get() for _ in range(3)]
+
+    assert [r.text for r in responses] == ["b", "b", "b"]
+    assert len(pool.members) == 1
+
+
+@pytest.mark.asyncio
+async def test_no_healthy_backends_is_a_503(lab):
+    backends, pool, get = lab
+    for b in backends:
+        b.healthy = False
+    await pool.refresh()
+
+    assert (await get()).status_code == 503
+
+
+def test_backends_spec_is_parsed():
+    assert balancer.parse_backends("hello-app-dev-pool:8080, 10.0.0.2:81") == [
+        ("hello-app-dev-pool", 8080), ("10.0.0.2", 81),
+    ]
+    with pytest.raises(ValueError):
+        balancer.parse_backends("no-port")
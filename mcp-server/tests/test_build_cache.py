@@ -0,0 +1,180 @@
+"""build_image — commit-keyed result cache.
+
+A second build of the same commit + Dockerfile must not rebuild or repush:
+it retags the digest recorded the first time and reports `cache: hit`.
+Real git against a local repo; engine and registry are in-memory fakes.
+"""
+
+import hashlib
+import importlib
+import io
+import json
+import subprocess
+import tarfile
+
+import httpx
+import pytest
+from mcp.server.fastmcp import FastMCP
+
+from mcp_server import config, image_transfer
+from mcp_server.clients import registry_client
+from mcp_server.tools import runner_tools
+
+
+def _git(cwd, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+        cwd=cwd, check=True, capture_output=True,
+    )
+
+
+def _export() -> bytes:
+    """An image export holding only the manifest.json that names the config."""
+    index = json.dumps([{"Config": f"{'c' * 64}.json", "Layers": ["l1/layer.tar"]}]).encode()
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        info = tarfile.TarInfo("manifest.json")
+        info.size = len(index)
+        tar.addfile(info, io.BytesIO(index))
+    return buf.getvalue()
+
+
+class FakeLab:
+    def __init__(self):
+        self.manifests: dict[str, bytes] = {}   # tag or digest -> raw
+        self.builds = 0
+        self.loads = 0
+        self.pruned = False  # engine has lost every image but the one just built
+        self.requests: list[httpx.Request] = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        path = request.url.path
+        if request.url.host == "engine":
+            if path == "/build":
+                self.builds += 1
+                return httpx.Response(200, content=b'{"aux":{"ID":"sha256:cfg"}}\n')
+            if path == "/images/load":
+                self.loads += 1
+                return httpx.Response(200, content=b'{"stream":"Loaded image: localhost/hello-app:buildcache\\n"}\n')
+            if path.endswith("/tag"):
+                return httpx.Response(201)
+            if path.endswith("/get"):
+                return httpx.Response(200, content=_export())
+            if self.pruned and path.startswith("/images/sha256:"):
+                return httpx.Response(404, json={"message": "no such image"})
+            return httpx.Response(200, json={"Id": "sha256:cfg", "RootFS": {"Layers": ["sha256:l1"]}})
+        if "/blobs/" in path:  # every blob already present: nothing to upload
+            if request.method == "GET":
+                return httpx.Response(200, content=b"x" * 10)
+            return httpx.Response(200, headers={"Content-Length": "10"})
+        ref = path.rsplit("/", 1)[1]
+        if request.method == "PUT":
+            digest = f"sha256:{hashlib.sha256(request.content).hexdigest()}"
+            self.manifests[ref] = self.manifests[digest] = request.content
+            return httpx.Response(201, headers={"Docker-Content-Digest": digest})
+        raw = self.manifests.get(ref)
+        if raw is None:
+            return httpx.Response(404, json={"errors": [{"code": "MANIFEST_UNKNOWN"}]})
+        return httpx.Response(200, content=raw, headers={
+            "Content-Type": image_transfer.OCI_MANIFEST,
+            "Docker-Content-Digest": f"sha256:{hashlib.sha256(raw).hexdigest()}",
+        })
+
+
+@pytest.fixture
+def lab(tmp_path, monkeypatch, mock_http):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    _git(repo, "init", "-q", "-b", "main")
+    (repo / "Dockerfile").write_text("FROM scratch\n")
+    _git(repo, "add", ".")
+    _git(repo, "commit", "-q", "-m", "init")
+
+    fake = FakeLab()
+    mock_http(fake.handler)
+    monkeypatch.setenv("CONTAINER_ENGINE_FORCE", "docker")
+    monkeypatch.setattr(config, "DEV_REGISTRY_URL", "http://registry-dev:5000")
+    registry_client.clear_cache()
+
+    importlib.reload(runner_tools)
+    mcp = FastMCP("test-runner")
+    runner_tools.register(mcp)
+    build = mcp._tool_manager._tools["build_image"].fn
+
+    async def run(**kwargs):
+        return json.loads(await build(repo_url=f"file://{repo}", image_name="hello-app", **kwargs))
+
+    yield fake, repo, run
+    registry_client.clear_cache()
+
+
+@pytest.mark.asyncio
+async def test_same_commit_is_retagged_not_rebuilt(lab):
+    fake, _, build = lab
+    first = await build(tag="latest")
+    assert first["cache"] == "miss"
+    assert fake.builds == 1
+
+    second = await build(tag="v1.0.0")
+    assert second["status"] == "success"
+    assert second["cache"] == "hit"
+    assert second["digest"] == first["digest"]
+    assert second["commit"] == first["commit"]
+    assert fake.builds == 1
+    assert fake.manifests["v1.0.0"] == fake.manifests["latest"]
+
+
+@pytest.mark.asyncio
+async def test_new_commit_misses(lab):
+    fake, repo, build = lab
+    await build()
+    (repo / "Dockerfile").write_text("FROM busybox\n")
+    _git(repo, "commit", "-q", "-am", "v2")
+
+    out = await build()
+    assert out["cache"] == "miss"
+    assert fake.builds == 2
+
+
+@pytest.mark.asyncio
+async def test_hit_is_dropped_when_registry_lost_the_image(lab):
+    fake, _, build = lab
+    await build()
+    fake.manifests.clear()
+    registry_client.clear_cache()
+
+    out = await build()
+    assert out["cache"] == "miss"
+    assert fake.builds == 2
+
+
+@pytest.mark.asyncio
+async def test_build_exports_and_reuses_registry_layer_cache(lab):
+    fake, repo, build = lab
+    await build()
+    assert fake.manifests["buildcache"] == fake.manifests["latest"]
+    first_build = next(r for r in fake.requests if r.url.path == "/build")
+    assert "cachefrom" not in first_build.url.params  # nothing to seed from yet
+
+    # New commit on a pruned engine: layers come from registry-dev's cache.
+    (repo / "Dockerfile").write_text("FROM scratch\nLABEL v=2\n")
+    _git(repo, "commit", "-q", "-am", "v2")
+    fake.pruned = True
+    fake.requests.clear()
+    out = await build(build_args={"V": "2"}, target="final")
+    assert out["cache"] == "miss"
+    assert fake.loads == 1
+    params = next(r for r in fake.requests if r.url.path == "/build").url.params
+    assert json.loads(params["cachefrom"]) == ["localhost/hello-app:buildcache"]
+    assert json.loads(params["buildargs"]) == {"V": "2"}
+    assert params["target"] == "final"
+
+
+@pytest.mark.asyncio
+async def test_build_options_are_part_of_the_cache_key(lab):
+    fake, _, build = lab
+    await build(target="test")
+    out = await build(target="runtime")
+    assert out["cache"] == "miss"
+    assert fake.builds == 2
@@ -0,0 +1,111 @@
+"""BuildScheduler — bounded build slots and per-image:tag single flight."""
+
+import asyncio
+
+import pytest
+
+from mcp_server.build_scheduler import BuildScheduler
+
+
+class FakeCtx:
+    def __init__(self):
+        self.progress: list[str] = []
+        self.infos: list[str] = []
+
+    async def report_progress(self, progress, total=None, message=None):
+        self.progress.append(message)
+
+    async def info(self, message):
+        self.infos.append(message)
+
+
+@pytest.mark.asyncio
+async def test_slots_bound_concurrency_and_report_queue_position():
+    scheduler = BuildScheduler(limit=1)
+    running = 0
+    peak = 0
+    order: list[int] = []
+    ctxs = [FakeCtx() for _ in range(3)]
+
+    async def build(i):
+        nonlocal running, peak
+        async with scheduler.slot(ctxs[i]):
+            running += 1
+            peak = max(peak, running)
+            order.append(i)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(build(i) for i in range(3)))
+
+    assert peak == 1
+    assert order == [0, 1, 2]
+    assert ctxs[0].progress == []
+    assert ctxs[2].progress[0].startswith("queued for a build slot: position 2")
+    assert ctxs[2].progress[-1].startswith("queued for a build slot: position 1")
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue():
+    scheduler = BuildScheduler(limit=1)
+    release = asyncio.Event()
+
+    async def holder():
+        async with scheduler.slot():
+            await release.wait()
+
+    async def waiter():
+        async with scheduler.slot():
+            pass
+
+    h = asyncio.create_task(holder())
+    await asyncio.sleep(0)
+    w = asyncio.create_task(waiter())
+    await asyncio.sleep(0)
+    w.cancel()
+    release.set()
+    await h
+    # The slot is free again despite the cancelled ticket.
+    await asyncio.wait_for(waiter(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_share_one_build():
+    scheduler = BuildScheduler(limit=4)
+    runs = 0
+
+    async def run():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.01)
+        return "built"
+
+    ctx = FakeCtx()
+    results = await asyncio.gather(
+        scheduler.single_flight(("hello-app", "latest"), ("repo", None), run),
+        scheduler.single_flight(("hello-app", "latest"), ("repo", None), run, ctx=ctx),
+    )
+    assert results == ["built", "built"]
+    assert runs == 1
+    assert "already running" in ctx.infos[0]
+
+
+@pytest.mark.asyncio
+async def test_different_request_for_same_tag_waits_its_turn():
+    scheduler = BuildScheduler(limit=4)
+    events: list[str] = []
+
+    def make(name):
+        async def run():
+            events.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            events.append(f"{name} end")
+            return name
+        return run
+
+    results = await asyncio.gather(
+        scheduler.single_flight(("hello-app", "latest"), ("repo-a", None), make("a")),
+        scheduler.single_flight(("hello-app", "latest"), ("repo-b", None), make("b")),
+    )
+    assert results == ["a", "b"]
+    assert events == ["a start", "a end", "b start", "b end"]
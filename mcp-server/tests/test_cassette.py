@@ -0,0 +1,148 @@
+"""clients/cassette.py — record upstream responses once, replay them offline.
+
+Recording goes through a stubbed network (httpx.AsyncHTTPTransport is
+swapped for a MockTransport); replay must not touch it at all.
+"""
+
+import json
+import time
+
+import httpx
+import pytest
+
+from mcp_server import config
+from mcp_server.clients import cassette, registry_client, user_api_client
+
+USERS = [{"id": 1, "username": "alice"}, {"id": 2, "username": "bob"}]
+BLOB = bytes(range(256))
+
+
+class Upstream:
+    def __init__(self):
+        self.calls = 0
+        self.users = list(USERS)
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        path = request.url.path
+        if path == "/users" and request.method == "POST":
+            body = json.loads(request.content)
+            self.users.append({"id": len(self.users) + 1, **body})
+            return httpx.Response(201, json=self.users[-1])
+        if path == "/users":
+            return httpx.Response(200, json=self.users, headers={"Date": "Mon, 01 Jan 2026 00:00:00 GMT"})
+        if path.startswith("/v2/hello-app/blobs/") and request.method == "HEAD":
+            return httpx.Response(200, headers={"Content-Length": str(len(BLOB))})
+        if path.startswith("/v2/hello-app/blobs/"):
+            return httpx.Response(200, content=BLOB, headers={"Content-Type": "application/octet-stream"})
+        return httpx.Response(404, json={"detail": "not found"})
+
+
+@pytest.fixture
+def upstream(monkeypatch, tmp_path):
+    fake = Upstream()
+    monkeypatch.setattr(httpx, "AsyncHTTPTransport", lambda *a, **kw: httpx.MockTransport(fake.handler))
+    monkeypatch.setattr(config, "USER_API_URL", "http://localhost:8001")
+    monkeypatch.setattr(config, "DEV_REGISTRY_URL", "http://localhost:5001")
+    monkeypatch.setattr(config, "CASSETTE_PATH", str(tmp_path / "cassette.jsonl"))
+    monkeypatch.setattr(config, "CASSETTE_LATENCY", "")
+    cassette.reset()
+    yield fake
+    cassette.reset()
+
+
+def _mode(monkeypatch, mode: str) -> None:
+    monkeypatch.setattr(config, "CASSETTE_MODE", mode)
+
+
+async def test_off_by_default(upstream, monkeypatch):
+    _mode(monkeypatch, "")
+    assert cassette.transport() is None
+
+
+async def test_record_then_replay_without_upstream(upstream, monkeypatch, tmp_path):
+    _mode(monkeypatch, "record")
+    assert await user_api_client.list_users() == USERS
+    assert upstream.calls == 1
+
+    lines = (tmp_path / "cassette.jsonl").read_text().splitlines()
+    entry = json.loads(lines[0])
+    assert entry["key"] == "GET user-api/users"
+    assert "date" not in entry["headers"]
+
+    _mode(monkeypatch, "replay")
+    # The lab's address for the same service: keys are by service, not host.
+    monkeypatch.setattr(config, "USER_API_URL", "http://user-api:8001")
+    for _ in range(3):  # the last recording keeps answering
+        assert await user_api_client.list_users() == USERS
+    assert upstream.calls == 1
+
+
+async def test_repeated_key_replays_in_order(upstream, monkeypatch):
+    _mode(monkeypatch, "record")
+    await user_api_client.list_users()
+    await user_api_client.create_user("carol", "carol@example.com", "Carol", "developer")
+    await user_api_client.list_users()
+
+    _mode(monkeypatch, "replay")
+    assert len(await user_api_client.list_users()) == 2
+    assert (await user_api_client.create_user("carol", "carol@example.com", "Carol", "developer"))["username"] == "carol"
+    assert len(await user_api_client.list_users()) == 3
+
+
+async def test_request_body_is_part_of_the_key(upstream, monkeypatch):
+    _mode(monkeypatch, "record")
+    await user_api_client.create_user("carol", "carol@example.com", "Carol", "developer")
+
+    _mode(monkeypatch, "replay")
+    with pytest.raises(cassette.CassetteMiss, match="POST user-api/users #"):
+        await user_api_client.create_user("dave", "dave@example.com", "Dave", "developer")
+
+
+async def test_binary_bodies_and_head_lengths_survive(upstream, monkeypatch):
+    digest = "sha256:" + "b" * 64
+    _mode(monkeypatch, "record")
+    recorded = b"".join([c async for c in registry_client.iter_blob("hello-app", digest)])
+    sizes = await registry_client.blob_sizes("hello-app", [digest])
+
+    _mode(monkeypatch, "replay")
+    assert b"".join([c async for c in registry_client.iter_blob("hello-app", digest)]) == recorded == BLOB
+    assert await registry_client.blob_sizes("hello-app", [digest]) == sizes == {digest: len(BLOB)}
+
+
+async def test_unrecorded_request_is_a_miss(upstream, monkeypatch, tmp_path):
+    (tmp_path / "cassette.jsonl").write_text("")
+    _mode(monkeypatch, "replay")
+    with pytest.raises(cassette.CassetteMiss, match="GET user-api/users/7"):
+        await user_api_client.get_user(7)
+    assert upstream.calls == 0
+
+
+async def test_simulated_latency(upstream, monkeypatch):
+    _mode(monkeypatch, "record")
+    await user_api_client.list_users()
+
+    _mode(monkeypatch, "replay")
+    monkeypatch.setattr(config, "CASSETTE_LATENCY", "50")
+    start = time.perf_counter()
+    await user_api_client.list_users()
+    assert time.perf_counter() - start >= 0.05
+
+
+async def test_gzip_cassette(upstream, monkeypatch, tmp_path):
+    path = tmp_path / "cassette.jsonl.gz"
+    monkeypatch.setattr(config, "CASSETTE_PATH", str(path))
+    _mode(monkeypatch, "record")
+    await user_api_client.list_users()
+    assert path.read_bytes()[:2] == b"\x1f\x8b"
+
+    _mode(monkeypatch, "replay")
+    assert await user_api_client.list_users() == USERS
+
+
+def test_bad_latency_setting_fails_at_startup(monkeypatch):
+    monkeypatch.setenv("CASSETTE_LATENCY", "fast")
+    with pytest.raises(ValueError, match="CASSETTE_LATENCY"):
+        config._latency_env("CASSETTE_LATENCY")
+    monkeypatch.setenv("CASSETTE_LATENCY", " 25 ")
+    assert config._latency_env("CASSETTE_LATENCY") == "25"
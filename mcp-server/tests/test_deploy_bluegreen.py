@@ -0,0 +1,248 @@
+"""deploy_app — health-gated blue/green redeploys, and replicas.
+
+deploy_app used to remove the running container before starting the new
+one, so every redeploy took the app down, and a version that never came up
+stayed down. With strategy "blue-green" the new version now runs as
+hello-app-<env>-next first, and the live container is only swapped once that
+answers /health; the default "recreate" still needs no /health. With replicas > 1 the app runs as hello-app-<env>-1..N behind a
+balancer container that keeps serving across redeploys.
+"""
+
+import importlib
+import json
+
+import httpx
+import pytest
+from mcp.server.fastmcp import FastMCP
+
+from mcp_server import config
+from mcp_server.clients import registry_client
+from mcp_server.tools import deploy_tools
+
+
+class FakeLab:
+    """An engine that already holds the image and runs hello-app-dev, plus
+    the /health endpoint of each running container."""
+
+    def __init__(self, unhealthy: set[str] = frozenset()):
+        self.running = {"hello-app-dev"}
+        self.stopped: set[str] = set()
+        self.unhealthy = unhealthy
+        self.calls: list[tuple[str, str]] = []
+        self.created: dict[str, str] = {}  # container ID -> name
+        self.bodies: dict[str, dict] = {}  # name -> create body
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        host, path = request.url.host, request.url.path
+        if host.startswith("hello-app-"):
+            if host not in self.running or host in self.unhealthy:
+                raise httpx.ConnectError("connection refused", request=request)
+            return httpx.Response(200, json={"status": "ok"})
+        if host.startswith("registry-"):
+            return httpx.Response(200, content=b'{"schemaVersion": 2, "config": {"digest": "sha256:cfg"}}', headers={
+                "Content-Type": "application/vnd.oci.image.manifest.v1+json",
+                "Docker-Content-Digest": "sha256:m",
+            })
+        self.calls.append((request.method, path))
+        if path.startswith("/containers/") and path.endswith("/json"):
+            name = path.split("/")[2]
+            if name not in self.running | self.stopped:
+                return httpx.Response(404, json={"message": "no such container"})
+            return httpx.Response(200, json={"Image": "sha256:runner", "Config": self.bodies.get(name, {})})
+        if path.endswith("/rename"):
+            old, new = path.split("/")[2], request.url.params["name"]
+            state = self.running if old in self.running else self.stopped
+            state.remove(old)
+            state.add(new)
+            self.bodies[new] = self.bodies.pop(old, {})
+            return httpx.Response(204)
+        if path.endswith("/stop"):
+            name = path.split("/")[2]
+            if name not in self.running | self.stopped:
+                return httpx.Response(404, json={"message": "no such container"})
+            self.running.discard(name)
+            self.stopped.add(name)
+            return httpx.Response(204)
+        if path.endswith("/json"):
+            return httpx.Response(200, json={"Id": "sha256:cfg", "RootFS": {"Layers": []}})
+        if path.endswith("/tag"):
+            return httpx.Response(201)
+        if path == "/containers/create":
+            name = request.url.params["name"]
+            self.created[f"id-{name}"] = name
+            self.bodies[name] = json.loads(request.content)
+            return httpx.Response(201, json={"Id": f"id-{name}"})
+        if path.endswith("/start"):
+            ref = path.split("/")[2]
+            name = self.created.get(ref, ref)
+            self.stopped.discard(name)
+            self.running.add(name)
+            return httpx.Response(204)
+        if request.method == "DELETE":
+            name = path.split("/")[2]
+            if name not in self.running | self.stopped:
+                return httpx.Response(404, json={"message": "no such container"})
+            self.running.discard(name)
+            self.stopped.discard(name)
+            return httpx.Response(204)
+        return httpx.Response(404)
+
+    def deleted(self, name: str) -> bool:
+        return ("DELETE", f"/containers/{name}") in self.calls
+
+
+@pytest.fixture
+def lab_factory(monkeypatch, mock_http):
+    monkeypatch.setenv("CONTAINER_ENGINE_FORCE", "docker")
+    monkeypatch.setattr(config, "DEV_REGISTRY_URL", "http://registry-dev:5000")
+    monkeypatch.setattr(config, "DEPLOY_READY_TIMEOUT", 0.3)
+    monkeypatch.setattr(config, "BALANCER_IMAGE", "")
+    def make(**kwargs):
+        lab = FakeLab(**kwargs)
+
+        mock_http(lab.handler)
+        registry_client.clear_cache()
+        importlib.reload(deploy_tools)
+        mcp = FastMCP("test-bluegreen")
+        deploy_tools.register(mcp)
+        return lab, mcp._tool_manager._tools["deploy_app"].fn
+
+    yield make
+    registry_client.clear_cache()
+
+
+@pytest.mark.asyncio
+async def test_old_container_is_only_replaced_once_the_new_one_is_healthy(lab_factory):
+    lab, deploy_app = lab_factory()
+
+    out = json.loads(await deploy_app(tag="v2", strategy="blue-green"))
+
+    assert out["status"] == "success", out
+    assert out["strategy"] == "blue-green"
+    # The standby is checked by name; it takes no host port.
+    assert not lab.bodies["hello-app-dev-next"].get("HostConfig", {}).get("PortBindings")
+    assert out["time_to_ready_ms"] >= 0
+    assert 0 < out["downtime_ms"] < 1000
+    # -next was started (and checked) before the live container was touched …
+    assert lab.calls.index(("POST", "/containers/id-hello-app-dev-next/start")) \
+        < lab.calls.index(("POST", "/containers/hello-app-dev/stop"))
+    # … and it and the old container are gone afterwards, leaving the new
+    # container on the real name.
+    assert lab.running == {"hello-app-dev"} and not lab.stopped
+
+
+@pytest.mark.asyncio
+async def test_unhealthy_new_version_leaves_the_old_one_running(lab_factory):
+    lab, deploy_app = lab_factory(unhealthy={"hello-app-dev-next"})
+
+    out = json.loads(await deploy_app(tag="broken", strategy="blue-green"))
+
+    assert out["status"] == "error"
+    assert out["step"] == "readiness"
+    assert not lab.deleted("hello-app-dev")
+    assert lab.running == {"hello-app-dev"}  # the standby was cleaned up
+
+
+@pytest.mark.asyncio
+async def test_recreate_replaces_in_place_and_reports_the_downtime(lab_factory):
+    lab, deploy_app = lab_factory()
+
+    out = json.loads(await deploy_app(tag="v2", strategy="recreate", wait_ready=True))
+
+    assert out["status"] == "success", out
+    assert "id-hello-app-dev-next" not in lab.created
+    assert out["downtime_ms"] >= out["time_to_ready_ms"]
+
+
+@pytest.mark.asyncio
+async def test_default_deploy_does_not_need_a_health_endpoint(lab_factory):
+    lab, deploy_app = lab_factory(unhealthy={"hello-app-dev"})
+
+    out = json.loads(await deploy_app(tag="v2"))
+
+    assert out["status"] == "success", out
+    assert out["strategy"] == "recreate"
+    assert out["time_to_ready_ms"] is None
+    assert lab.running == {"hello-app-dev"} and not lab.stopped
+
+
+@pytest.mark.asyncio
+async def test_unhealthy_recreate_rolls_back_to_the_old_container(lab_factory):
+    lab, deploy_app = lab_factory()
+    lab.bodies["hello-app-dev"] = {"Image": "localhost/hello-app:v1-dev"}
+    lab.unhealthy = {"hello-app-dev"}
+
+    out = json.loads(await deploy_app(tag="broken", strategy="recreate", wait_ready=True))
+
+    assert out["status"] == "error"
+    assert out["step"] == "readiness"
+    assert "rolled back" in out["error"]
+    assert lab.running == {"hello-app-dev"} and not lab.stopped
+    assert lab.bodies["hello-app-dev"] == {"Image": "localhost/hello-app:v1-dev"}  # the old one, restarted
+
+
+@pytest.mark.asyncio
+async def test_blue_green_requires_the_health_check(lab_factory):
+    lab, deploy_app = lab_factory()
+    out = json.loads(await deploy_app(strategy="blue-green", wait_ready=False))
+    assert out["status"] == "error"
+    assert lab.calls == []
+
+
+@pytest.mark.asyncio
+async def test_first_deploy_has_no_downtime(lab_factory):
+    lab, deploy_app = lab_factory()
+    lab.running.clear()
+
+    out = json.loads(await deploy_app(tag="v1", environment="dev"))
+
+    assert out["status"] == "success", out
+    assert out["downtime_ms"] == 0
+
+
+@pytest.mark.asyncio
+async def test_replicas_run_behind_a_balancer_that_survives_redeploys(lab_factory, monkeypatch):
+    lab, deploy_app = lab_factory()
+    monkeypatch.setattr(deploy_tools.socket, "gethostname", lambda: "hello-app-dev")
+
+    out = json.loads(await deploy_app(tag="v1", replicas=3))
+
+    assert out["status"] == "success", out
+    assert out["replicas"] == ["hello-app-dev-1", "hello-app-dev-2", "hello-app-dev-3"]
+    assert lab.running == {"hello-app-dev", *out["replicas"]}
+    balancer = lab.bodies["hello-app-dev"]
+    assert balancer["Image"] == "sha256:runner"  # the runner's own image
+    assert balancer["Cmd"] == ["python", "-m", "mcp_server.balancer"]
+    assert "BALANCER_BACKENDS=hello-app-dev-pool:8080" in balancer["Env"]
+    assert balancer["HostConfig"]["PortBindings"] == {"8080/tcp": [{"HostPort": "9080"}]}
+    replica = lab.bodies["hello-app-dev-1"]
+    assert replica["NetworkingConfig"]["EndpointsConfig"]["mcp-lab_mcp-lab-net"]["Aliases"] == ["hello-app-dev-pool"]
+    assert "PortBindings" not in replica["HostConfig"] or not replica["HostConfig"]["PortBindings"]
+
+    # Scaling down to 2: the balancer stays up, the third replica goes.
+    lab.calls.clear()
+    out = json.loads(await deploy_app(tag="v2", replicas=2))
+
+    assert out["status"] == "success", out
+    assert out["downtime_ms"] == 0
+    assert not lab.deleted("hello-app-dev")
+    assert lab.running == {"hello-app-dev", "hello-app-dev-1", "hello-app-dev-2"}
+
+
+@pytest.mark.asyncio
+async def test_back_to_one_replica_removes_the_balancer_and_replicas(lab_factory):
+    lab, deploy_app = lab_factory()
+    lab.running |= {"hello-app-dev-1", "hello-app-dev-2"}
+
+    out = json.loads(await deploy_app(tag="v3"))
+
+    assert out["status"] == "success", out
+    assert lab.running == {"hello-app-dev"}
+
+
+@pytest.mark.asyncio
+async def test_too_many_replicas_is_rejected(lab_factory):
+    lab, deploy_app = lab_factory()
+    out = json.loads(await deploy_app(replicas=deploy_tools.MAX_REPLICAS + 1))
+    assert out["status"] == "error"
+    assert lab.calls == []
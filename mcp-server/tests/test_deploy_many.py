@@ -0,0 +1,172 @@
+"""deploy_many — one image out to several environments in one call.
+
+The image is loaded into the engine once (the other environments only tag
+it), the containers start concurrently, and an environment only reports
+success once its app answers /health.
+"""
+
+import hashlib
+import importlib
+import json
+
+import httpx
+import pytest
+from mcp.server.fastmcp import FastMCP
+
+from mcp_server import config
+from mcp_server.clients import registry_client
+from mcp_server.tools import deploy_tools
+
+
+def _sha(data: bytes) -> str:
+    return f"sha256:{hashlib.sha256(data).hexdigest()}"
+
+
+CONFIG = b'{"rootfs": {"type": "layers"}}'
+LAYERS = [b"base" * 300, b"app"]
+MANIFEST = json.dumps({
+    "schemaVersion": 2,
+    "mediaType": "application/vnd.oci.image.manifest.v1+json",
+    "config": {"digest": _sha(CONFIG), "size": len(CONFIG)},
+    "layers": [{"digest": _sha(x), "size": len(x)} for x in LAYERS],
+}).encode()
+
+
+class FakeLab:
+    """Both registries holding the same (promoted) image, an engine that
+    starts out without it, and the deployed apps' /health endpoints."""
+
+    def __init__(self, unhealthy: set[str] = frozenset()):
+        self.engine_images: set[str] = set()
+        self.blobs = {_sha(x): x for x in (CONFIG, *LAYERS)}
+        self.unhealthy = unhealthy
+        self.requests: list[httpx.Request] = []
+        self.running: set[str] = set()
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        host, path = request.url.host, request.url.path
+        if host.startswith("registry-"):
+            if "/manifests/" in path:
+                return httpx.Response(200, content=MANIFEST, headers={
+                    "Content-Type": "application/vnd.oci.image.manifest.v1+json",
+                    "Docker-Content-Digest": _sha(MANIFEST),
+                })
+            return httpx.Response(200, content=self.blobs[path.rsplit("/", 1)[1]])
+        if host.startswith("hello-app-"):
+            if host in self.unhealthy:
+                raise httpx.ConnectError("connection refused", request=request)
+            return httpx.Response(200, json={"status": "ok"})
+        # engine
+        if path.endswith("/json"):
+            image = path.split("/")[2]
+            if image in self.engine_images:
+                return httpx.Response(200, json={"Id": image, "RootFS": {"Layers": []}})
+            return httpx.Response(404, json={"message": "no such image"})
+        if path == "/images/load":
+            self.engine_images.add(_sha(CONFIG))
+            return httpx.Response(200, content=b'{"stream":"Loaded image: localhost/hello-app:v1-dev\\n"}\n')
+        if path.endswith("/tag"):
+            return httpx.Response(201)
+        if path == "/containers/create":
+            self.running.add(request.url.params["name"])
+            return httpx.Response(201, json={"Id": "c0ffee" * 10})
+        if path.endswith("/start"):
+            return httpx.Response(204)
+        if request.method == "DELETE":
+            name = path.split("/")[2]
+            if name not in self.running:
+                return httpx.Response(404, json={"message": "no such container"})
+            self.running.discard(name)
+            return httpx.Response(204)
+        return httpx.Response(404)
+
+    def count(self, method: str, path_suffix: str) -> int:
+        return sum(1 for r in self.requests if r.method == method and r.url.path.endswith(path_suffix))
+
+
+@pytest.fixture
+def lab_factory(monkeypatch, mock_http):
+    monkeypatch.setenv("CONTAINER_ENGINE_FORCE", "docker")
+    monkeypatch.setattr(config, "DEV_REGISTRY_URL", "http://registry-dev:5000")
+    monkeypatch.setattr(config, "PROD_REGISTRY_URL", "http://registry-prod:5000")
+    monkeypatch.setattr(config, "DEPLOY_READY_TIMEOUT", 0.3)
+    def make(**kwargs):
+        lab = FakeLab(**kwargs)
+
+        mock_http(lab.handler)
+        registry_client.clear_cache()
+        importlib.reload(deploy_tools)
+        mcp = FastMCP("test-deploy-many")
+        deploy_tools.register(mcp)
+        return lab, mcp._tool_manager._tools["deploy_many"].fn
+
+    yield make
+    registry_client.clear_cache()
+
+
+@pytest.mark.asyncio
+async def test_image_is_loaded_once_for_every_environment(lab_factory):
+    lab, deploy_many = lab_factory()
+
+    out = json.loads(await deploy_many(image_name="hello-app", tag="v1"))
+
+    assert out["status"] == "success", out
+    assert out["image_loads"] == 1
+    assert lab.count("POST", "/images/load") == 1
+    assert lab.count("POST", "/tag") == 2  # staging and prod reuse the loaded image
+    assert set(out["environments"]) == {"dev", "staging", "prod"}
+    prod = out["environments"]["prod"]
+    assert prod["app_url"] == "http://localhost:9082"
+    assert prod["digest"] == _sha(MANIFEST)
+    assert prod["ready_ms"] >= 0
+    assert lab.count("GET", "/health") == 3
+
+
+@pytest.mark.asyncio
+async def test_environment_that_never_gets_healthy_makes_the_result_partial(lab_factory):
+    lab, deploy_many = lab_factory(unhealthy={"hello-app-staging"})
+
+    out = json.loads(await deploy_many(environments=["dev", "staging"]))
+
+    assert out["status"] == "partial"
+    assert out["environments"]["dev"]["status"] == "success"
+    staging = out["environments"]["staging"]
+    assert staging["status"] == "error" and staging["step"] == "readiness"
+    assert lab.count("GET", "/health") > 2  # staging was retried until the timeout
+
+
+@pytest.mark.asyncio
+async def test_readiness_check_can_be_skipped(lab_factory):
+    lab, deploy_many = lab_factory(unhealthy={"hello-app-dev"})
+
+    out = json.loads(await deploy_many(environments=["dev"], wait_ready=False))
+
+    assert out["status"] == "success"
+    assert "ready_ms" not in out["environments"]["dev"]
+    assert lab.count("GET", "/health") == 0
+
+
+@pytest.mark.asyncio
+async def test_scaled_out_environment_is_replaced_entirely(lab_factory):
+    """A deploy_app with replicas left a balancer under the env's name,
+    replicas and maybe a standby; none of them may keep serving the old
+    image next to the new one."""
+    lab, deploy_many = lab_factory()
+    lab.running |= {"hello-app-dev", "hello-app-dev-1", "hello-app-dev-2", "hello-app-dev-next"}
+
+    out = json.loads(await deploy_many(environments=["dev"]))
+
+    assert out["status"] == "success", out
+    assert lab.running == {"hello-app-dev"}
+
+
+@pytest.mark.asyncio
+async def test_unknown_environment_is_rejected_before_anything_runs(lab_factory):
+    lab, deploy_many = lab_factory()
+
+    out = json.loads(await deploy_many(environments=["dev", "qa"]))
+
+    assert out["status"] == "error"
+    assert "qa" in out["error"]
+    assert lab.requests == []
@@ -0,0 +1,150 @@
+"""deploy_app — digest-aware pull, streamed into the engine.
+
+deploy_app used to `skopeo copy` the image into a temp docker-archive and
+`engine load` it on every call. It now resolves the manifest first, skips the
+pull when the engine already has that image ID, and otherwise streams a
+docker-archive assembled from registry blobs straight into /images/load.
+"""
+
+import asyncio
+import hashlib
+import importlib
+import io
+import json
+import tarfile
+
+import httpx
+import pytest
+from mcp.server.fastmcp import FastMCP
+
+from mcp_server import config
+from mcp_server.clients import registry_client
+from mcp_server.tools import deploy_tools
+
+
+def _sha(data: bytes) -> str:
+    return f"sha256:{hashlib.sha256(data).hexdigest()}"
+
+
+CONFIG = b'{"rootfs": {"type": "layers"}}'
+LAYERS = [b"base" * 300, b"app"]
+MANIFEST = json.dumps({
+    "schemaVersion": 2,
+    "mediaType": "application/vnd.oci.image.manifest.v1+json",
+    "config": {"digest": _sha(CONFIG), "size": len(CONFIG)},
+    "layers": [{"digest": _sha(x), "size": len(x)} for x in LAYERS],
+}).encode()
+
+
+class FakeLab:
+    def __init__(self, engine_images: set[str]):
+        self.engine_images = engine_images
+        self.blobs = {_sha(x): x for x in (CONFIG, *LAYERS)}
+        self.loaded: bytes | None = None
+        self.requests: list[httpx.Request] = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        path = request.url.path
+        if request.url.host.startswith("hello-app-"):
+            return httpx.Response(200, json={"status": "ok"})
+        if request.url.host == "registry-prod":
+            if "/manifests/" in path:
+                return httpx.Response(200, content=MANIFEST, headers={
+                    "Content-Type": "application/vnd.oci.image.manifest.v1+json",
+                    "Docker-Content-Digest": _sha(MANIFEST),
+                })
+            return httpx.Response(200, content=self.blobs[path.rsplit("/", 1)[1]])
+        # engine
+        if path.endswith("/json"):
+            image = path.split("/")[2]
+            if image in self.engine_images:
+                return httpx.Response(200, json={"Id": image, "RootFS": {"Layers": []}})
+            return httpx.Response(404, json={"message": "no such image"})
+        if path == "/images/load":
+            self.loaded = request.content
+            return httpx.Response(200, content=b'{"stream":"Loaded image: localhost/hello-app:v1-prod\\n"}\n')
+        if path.endswith("/tag"):
+            return httpx.Response(201)
+        if path == "/containers/create":
+            return httpx.Response(201, json={"Id": "c0ffee" * 10})
+        if path.endswith(("/start", "/stop", "/rename")):
+            return httpx.Response(204)
+        if request.method == "DELETE":
+            return httpx.Response(204)
+        return httpx.Response(404)
+
+    def calls(self) -> list[tuple[str, str]]:
+        return [(r.method, r.url.path) for r in self.requests]
+
+
+@pytest.fixture
+def lab_factory(monkeypatch, mock_http):
+    spawned: list[tuple] = []
+
+    async def fake_exec(*args, **kwargs):
+        spawned.append(args)
+        raise AssertionError(f"deploy_app spawned a process: {args}")
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", fake_exec)
+    monkeypatch.setenv("CONTAINER_ENGINE_FORCE", "docker")
+    monkeypatch.setattr(config, "PROD_REGISTRY_URL", "http://registry-prod:5000")
+    monkeypatch.setattr(config, "DEPLOY_READY_TIMEOUT", 0.3)
+    def make(engine_images: set[str]):
+        lab = FakeLab(engine_images)
+
+        mock_http(lab.handler)
+        registry_client.clear_cache()
+        importlib.reload(deploy_tools)
+        mcp = FastMCP("test-deploy")
+        deploy_tools.register(mcp)
+        return lab, mcp._tool_manager._tools["deploy_app"].fn
+
+    yield make
+    assert not spawned
+    registry_client.clear_cache()
+
+
+@pytest.mark.asyncio
+async def test_missing_image_is_streamed_into_engine_load(lab_factory):
+    lab, deploy_app = lab_factory(engine_images=set())
+
+    out = json.loads(await deploy_app(image_name="hello-app", tag="v1", environment="prod"))
+    assert out["status"] == "success", out
+
+    with tarfile.open(fileobj=io.BytesIO(lab.loaded)) as tar:
+        index = json.loads(tar.extractfile("manifest.json").read())
+        assert index[0]["RepoTags"] == ["localhost/hello-app:v1-prod"]
+        assert tar.extractfile(index[0]["Config"]).read() == CONFIG
+        assert [tar.extractfile(n).read() for n in index[0]["Layers"]] == LAYERS
+
+    # The old container is only stopped once the new image is in place.
+    calls = lab.calls()
+    assert calls.index(("POST", "/images/load")) < calls.index(("POST", "/containers/hello-app-prod/stop"))
+
+
+@pytest.mark.asyncio
+async def test_redeploy_of_present_digest_skips_pull(lab_factory):
+    lab, deploy_app = lab_factory(engine_images={_sha(CONFIG)})
+
+    out = json.loads(await deploy_app(image_name="hello-app", tag="v1", environment="prod"))
+    assert out["status"] == "success", out
+    assert any("skipped pull" in step for step in out["steps"])
+
+    assert lab.loaded is None
+    assert not any("/blobs/" in path for _, path in lab.calls())
+    tag = next(r for r in lab.requests if r.url.path.endswith("/tag"))
+    assert tag.url.path == f"/images/{_sha(CONFIG)}/tag"
+    assert dict(tag.url.params) == {"repo": "localhost/hello-app", "tag": "v1-prod"}
+
+
+@pytest.mark.asyncio
+async def test_containerd_store_image_is_found_by_manifest_digest(lab_factory):
+    # Docker's containerd image store knows the image by its manifest digest.
+    lab, deploy_app = lab_factory(engine_images={_sha(MANIFEST)})
+
+    out = json.loads(await deploy_app(image_name="hello-app", tag="v1", environment="prod"))
+    assert out["status"] == "success", out
+    assert lab.loaded is None
+    tag = next(r for r in lab.requests if r.url.path.endswith("/tag"))
+    assert tag.url.path == f"/images/{_sha(MANIFEST)}/tag"
@@ -0,0 +1,157 @@
+"""engine_client — Docker Engine / libpod REST API over the engine socket.
+
+build/save/load/rm/run used to be one CLI subprocess each. These tests stand
+a fake engine behind httpx.MockTransport and check that both API dialects
+get the paths and bodies they expect.
+"""
+
+import io
+import json
+import tarfile
+
+import httpx
+import pytest
+
+from mcp_server import engine
+from mcp_server.clients import engine_client
+
+
+class FakeEngine:
+    def __init__(self):
+        self.requests: list[httpx.Request] = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        path = request.url.path.removeprefix(engine_client.LIBPOD_PREFIX)
+        if path == "/build":
+            lines = [
+                {"stream": "Step 1/2 : FROM python:3.12-slim\n"},
+                {"stream": "Successfully built abc123\n"},
+                {"aux": {"ID": "sha256:abc123"}},
+            ]
+            return httpx.Response(200, content="\n".join(json.dumps(x) for x in lines).encode())
+        if path == "/images/load":
+            return httpx.Response(200, json={"stream": "Loaded image: localhost/x:y-prod\n"})
+        if path == "/containers/create":
+            return httpx.Response(201, json={"Id": "c0ffee" * 10, "Warnings": []})
+        if path.endswith("/start"):
+            return httpx.Response(204)
+        if request.method == "DELETE":
+            return httpx.Response(404, json={"message": "no such container"})
+        return httpx.Response(404)
+
+
+@pytest.fixture
+def fake_engine(monkeypatch, mock_http):
+    fake = FakeEngine()
+    mock_http(fake.handler)
+    monkeypatch.setenv("CONTAINER_ENGINE_FORCE", "docker")
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_build_streams_log_lines_and_returns_image_id(fake_engine, tmp_path):
+    (tmp_path / "Dockerfile").write_text("FROM python:3.12-slim\n")
+    (tmp_path / ".git").mkdir()
+    logs: list[str] = []
+
+    async def on_log(line):
+        logs.append(line)
+
+    image_id = await engine_client.build(str(tmp_path), "localhost/x:y", on_log=on_log)
+
+    assert image_id == "sha256:abc123"
+    assert logs == ["Step 1/2 : FROM python:3.12-slim", "Successfully built abc123"]
+    req = fake_engine.requests[0]
+    assert req.url.path == "/build"
+    assert req.url.params["t"] == "localhost/x:y"
+    with tarfile.open(fileobj=io.BytesIO(req.content)) as tar:
+        assert tar.getnames() == ["Dockerfile"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("dialect", ["docker", "podman"])
+async def test_build_passes_args_target_and_cache_from(fake_engine, monkeypatch, tmp_path, dialect):
+    monkeypatch.setenv("CONTAINER_ENGINE_FORCE", dialect)
+    (tmp_path / "Dockerfile").write_text("FROM scratch\n")
+
+    await engine_client.build(
+        str(tmp_path), "localhost/x:y",
+        build_args={"VERSION": "1.2"}, target="runtime", cache_from=["localhost/x:buildcache"],
+    )
+
+    params = fake_engine.requests[0].url.params
+    assert json.loads(params["buildargs"]) == {"VERSION": "1.2"}
+    assert params["target"] == "runtime"
+    if dialect == "docker":
+        assert json.loads(params["cachefrom"]) == ["localhost/x:buildcache"]
+    else:  # buildah already reuses layers from any image in its store
+        assert "cachefrom" not in params
+
+
+@pytest.mark.asyncio
+async def test_build_error_line_raises(monkeypatch, tmp_path):
+    def handler(request):
+        return httpx.Response(200, content=b'{"stream":"Step 1/2"}\n{"error":"no such image: nope"}\n')
+
+    monkeypatch.setenv("CONTAINER_ENGINE_FORCE", "docker")
+    (tmp_path / "Dockerfile").write_text("FROM nope\n")
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://engine") as c:
+        with pytest.raises(Exception, match="no such image"):
+            await engine_client.build(str(tmp_path), "x:y", client=c)
+
+
+@pytest.mark.asyncio
+async def test_run_container_docker_dialect(fake_engine):
+    container_id = await engine_client.run_container(
+        "hello-app-dev", "localhost/x:y", network="lab-net", ports={8080: 9080},
+    )
+    create, start = fake_engine.requests
+    assert create.url.path == "/containers/create"
+    assert create.url.params["name"] == "hello-app-dev"
+    body = json.loads(create.content)
+    assert body["HostConfig"]["PortBindings"] == {"8080/tcp": [{"HostPort": "9080"}]}
+    assert body["HostConfig"]["NetworkMode"] == "lab-net"
+    assert start.url.path == f"/containers/{container_id}/start"
+
+
+@pytest.mark.asyncio
+async def test_run_container_libpod_dialect(fake_engine, monkeypatch):
+    monkeypatch.setenv("CONTAINER_ENGINE_FORCE", "podman")
+    await engine_client.run_container(
+        "hello-app-dev", "localhost/x:y", network="lab-net", ports={8080: 9080},
+    )
+    create, start = fake_engine.requests
+    assert create.url.path == "/v4.0.0/libpod/containers/create"
+    spec = json.loads(create.content)
+    assert spec["name"] == "hello-app-dev"
+    assert spec["portmappings"] == [{"container_port": 8080, "host_port": 9080, "protocol": "tcp"}]
+    assert spec["Networks"] == {"lab-net": {}}
+    assert start.url.path.startswith("/v4.0.0/libpod/containers/")
+
+
+@pytest.mark.parametrize("dialect", ["docker", "podman"])
+@pytest.mark.asyncio
+async def test_create_container_passes_aliases_env_command_and_labels(fake_engine, monkeypatch, dialect):
+    monkeypatch.setenv("CONTAINER_ENGINE_FORCE", dialect)
+    await engine_client.create_container(
+        "hello-app-dev-1", "localhost/x:y", network="lab-net", aliases=["hello-app-dev-pool"],
+        env={"A": "1"}, command=["python", "-m", "x"], labels={"role": "r"},
+    )
+    body = json.loads(fake_engine.requests[0].content)
+    if dialect == "docker":
+        assert body["NetworkingConfig"] == {"EndpointsConfig": {"lab-net": {"Aliases": ["hello-app-dev-pool"]}}}
+        assert (body["Env"], body["Cmd"], body["Labels"]) == (["A=1"], ["python", "-m", "x"], {"role": "r"})
+    else:
+        assert body["Networks"] == {"lab-net": {"aliases": ["hello-app-dev-pool"]}}
+        assert (body["env"], body["command"], body["labels"]) == ({"A": "1"}, ["python", "-m", "x"], {"role": "r"})
+
+
+@pytest.mark.asyncio
+async def test_failed_call_invalidates_engine_detection(fake_engine, monkeypatch):
+    invalidated = []
+    monkeypatch.setattr(engine, "invalidate", lambda: invalidated.append(True))
+
+    with pytest.raises(Exception, match="HTTP 404"):
+        await engine_client.tag_image("sha256:abc", "localhost/x", "y")
+    assert invalidated
@@ -0,0 +1,115 @@
+"""engine.py — async, TTL-cached engine detection over a keep-alive socket.
+
+Detection used to be a blocking raw-socket probe cached for the life of the
+process, so an engine switch was never noticed. These tests put a small
+HTTP server on a unix socket and switch it between Docker and Podman.
+"""
+
+import asyncio
+import json
+import os
+
+import pytest
+
+from mcp_server import engine
+
+
+class FakeDaemon:
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.connections = 0
+        self.pings = 0
+
+    def response(self, path: str) -> tuple[dict, bytes]:
+        if self.kind == "docker":
+            headers = {"Server": "Docker/27.3.1 (linux)", "Api-Version": "1.47"}
+            version = {"Version": "27.3.1", "ApiVersion": "1.47"}
+        else:
+            headers = {"Server": "Libpod/5.2.2 (linux)", "Libpod-Api-Version": "5.2.2", "Api-Version": "1.41"}
+            version = {"Version": "5.2.2", "ApiVersion": "1.41"}
+        if path == "/_ping":
+            self.pings += 1
+            return headers, b"OK"
+        return headers, json.dumps(version).encode()
+
+    async def serve(self, reader, writer):
+        self.connections += 1
+        while True:
+            request = await reader.readuntil(b"\r\n\r\n")  # EOF ends the loop
+            path = request.split(b" ")[1].decode()
+            await asyncio.sleep(0.01)
+            headers, body = self.response(path)
+            head = "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+            writer.write(f"HTTP/1.1 200 OK\r\n{head}Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+
+
+@pytest.fixture
+async def daemon(tmp_path, monkeypatch):
+    monkeypatch.delenv("CONTAINER_ENGINE_FORCE", raising=False)
+    monkeypatch.delenv("CONTAINER_ENGINE", raising=False)
+    path = str(tmp_path / "engine.sock")
+    fake = FakeDaemon("docker")
+
+    async def handle(reader, writer):
+        try:
+            await fake.serve(reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    server = await asyncio.start_unix_server(handle, path)
+    detector = engine.EngineDetector(path, ttl=60)
+    yield fake, detector
+    await detector.aclose()
+    server.close()
+
+
+@pytest.mark.asyncio
+async def test_probe_reports_engine_and_versions(daemon):
+    fake, detector = daemon
+    info = await detector.get()
+    assert info == engine.EngineInfo("docker", "probe", "27.3.1", "1.47")
+
+    fake.kind = "podman"
+    info = await detector.get(refresh=True)
+    assert (info.name, info.version, info.api_version) == ("podman", "5.2.2", "5.2.2")
+
+
+@pytest.mark.asyncio
+async def test_result_is_cached_until_ttl_or_invalidate(daemon):
+    fake, detector = daemon
+    await detector.get()
+    fake.kind = "podman"
+    assert (await detector.get()).name == "docker"  # still within the TTL
+
+    detector.invalidate()  # e.g. an engine call just failed
+    assert (await detector.get()).name == "podman"
+    assert fake.pings == 2
+    assert fake.connections == 1  # both probes on one keep-alive connection
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_probe(daemon):
+    fake, detector = daemon
+    infos = await asyncio.gather(*(detector.get() for _ in range(10)))
+    assert {i.name for i in infos} == {"docker"}
+    assert fake.pings == 1
+
+
+@pytest.mark.asyncio
+async def test_forced_engine_wins_without_probing(daemon, monkeypatch):
+    fake, detector = daemon
+    monkeypatch.setenv("CONTAINER_ENGINE_FORCE", "podman")
+    assert await detector.get() == engine.EngineInfo("podman", "forced")
+    assert detector.cached().name == "podman"
+    assert fake.pings == 0
+
+
+@pytest.mark.asyncio
+async def test_dead_socket_falls_back_to_env(tmp_path, monkeypatch):
+    monkeypatch.delenv("CONTAINER_ENGINE_FORCE", raising=False)
+    monkeypatch.setenv("CONTAINER_ENGINE", "podman")
+    detector = engine.EngineDetector(os.path.join(tmp_path, "missing.sock"))
+    assert detector.cached() == engine.EngineInfo("podman", "env")  # no I/O before a probe
+    assert await detector.get() == engine.EngineInfo("podman", "env")
+    await detector.aclose()
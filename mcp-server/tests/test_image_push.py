@@ -0,0 +1,251 @@
+"""build_image's push step — engine export streamed straight into registry-dev.
+
+The old path was `engine save` → img.tar → `skopeo copy docker-archive:`,
+writing and re-reading the whole image on every build. push_image HEADs the
+image's layers first and streams the export only as far as it has to —
+manifest.json for the config digest, and any blobs the registry lacks —
+uploading just those members.
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import tarfile
+
+import httpx
+import pytest
+
+from mcp_server import config, image_transfer
+from mcp_server.clients import engine_client, registry_client
+
+
+def _sha(data: bytes) -> str:
+    return f"sha256:{hashlib.sha256(data).hexdigest()}"
+
+
+def _archive(members: dict[str, bytes]) -> bytes:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+class FakeLab:
+    """An engine holding one image, and an in-memory registry-dev."""
+
+    def __init__(self, layers: list[bytes], legacy_names: bool = False, image_id: str | None = None,
+                 compressed: bool = False):
+        self.config = json.dumps({"rootfs": {"diff_ids": [_sha(x) for x in layers]}}).encode()
+        self.layers = layers
+        self.image_id = image_id or _sha(self.config)
+        if compressed:
+            # Docker's containerd store: an OCI layout of the gzip blobs it
+            # holds, and the manifest digest as the image ID.
+            self.blobs_out = [gzip.compress(x, mtime=0) for x in layers]
+            config_name = f"blobs/sha256/{_sha(self.config)[7:]}"
+            layer_names = [f"blobs/sha256/{_sha(x)[7:]}" for x in self.blobs_out]
+            members = {config_name: self.config, "index.json": b"{}"}
+            members.update(zip(layer_names, self.blobs_out))
+            self.image_id = _sha(b"the engine's own manifest")
+        else:
+            self.blobs_out = layers
+            config_name = f"{_sha(self.config)[7:]}.json"
+            layer_names = [f"v1id{i}/layer.tar" if legacy_names else f"{_sha(x)[7:]}.tar"
+                           for i, x in enumerate(layers)]
+            members = {config_name: self.config, **dict(zip(layer_names, layers))}
+        members["manifest.json"] = json.dumps([
+            {"Config": config_name, "RepoTags": ["localhost/hello-app:latest"], "Layers": layer_names},
+        ]).encode()
+        self.export = _archive(members)
+        self.blobs: dict[str, bytes] = {}
+        self.uploads: dict[str, bytes] = {}
+        self.manifests: dict[str, bytes] = {}
+        self.requests: list[httpx.Request] = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.url.host == "engine":
+            return self.engine(request)
+        return self.registry(request)
+
+    def engine(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/json"):
+            return httpx.Response(200, json={
+                "Id": self.image_id,
+                "RootFS": {"Type": "layers", "Layers": [_sha(x) for x in self.layers]},
+            })
+        if request.url.path.endswith("/get"):
+            return httpx.Response(200, content=self.export)
+        return httpx.Response(404)
+
+    def registry(self, request: httpx.Request) -> httpx.Response:
+        parts = request.url.path.split("/")  # ['', 'v2', image, kind, ...]
+        kind = parts[3]
+        if kind == "manifests":
+            self.manifests[parts[4]] = request.content
+            return httpx.Response(201, headers={"Docker-Content-Digest": _sha(request.content)})
+        if kind == "blobs" and parts[4] != "uploads":
+            data = self.blobs.get(parts[4])
+            if data is None:
+                return httpx.Response(404)
+            return httpx.Response(200, headers={"Content-Length": str(len(data))})
+        # blob upload session: POST → PATCH → PUT ?digest= (or DELETE)
+        if request.method == "POST":
+            session = f"s{len(self.uploads)}"
+            self.uploads[session] = b""
+            return httpx.Response(202, headers={"Location": f"/v2/{parts[2]}/blobs/uploads/{session}?_state=x"})
+        session = parts[5]
+        if request.method == "PATCH":
+            self.uploads[session] += request.content
+            return httpx.Response(202, headers={"Location": f"/v2/{parts[2]}/blobs/uploads/{session}?_state=y"})
+        if request.method == "DELETE":
+            del self.uploads[session]
+            return httpx.Response(204)
+        data = self.uploads.pop(session)
+        assert request.url.params["_state"] == "y"
+        assert _sha(data) == request.url.params["digest"]
+        self.blobs[_sha(data)] = data
+        return httpx.Response(201)
+
+    def count(self, method: str, host: str = "registry-dev") -> int:
+        return sum(1 for r in self.requests if r.method == method and r.url.host == host)
+
+
+@pytest.fixture
+def install(monkeypatch, mock_http):
+    monkeypatch.setenv("CONTAINER_ENGINE_FORCE", "docker")
+    monkeypatch.setattr(config, "DEV_REGISTRY_URL", "http://registry-dev:5000")
+    registry_client.clear_cache()
+
+    def install(lab: FakeLab) -> None:
+        mock_http(lab.handler)
+
+    return install
+
+
+@pytest.mark.asyncio
+async def test_first_push_uploads_every_blob_and_an_oci_manifest(install):
+    lab = FakeLab([b"base layer" * 100, b"app layer"])
+    install(lab)
+
+    out = await image_transfer.push_image("localhost/hello-app:latest", "hello-app", "latest")
+
+    assert set(lab.blobs) == {_sha(lab.config), *(_sha(x) for x in lab.layers)}
+    manifest = json.loads(lab.manifests["latest"])
+    assert manifest["mediaType"] == image_transfer.OCI_MANIFEST
+    assert [layer["digest"] for layer in manifest["layers"]] == [_sha(x) for x in lab.layers]
+    assert manifest["config"] == {
+        "mediaType": image_transfer.OCI_CONFIG, "digest": _sha(lab.config), "size": len(lab.config),
+    }
+    assert out["digest"] == _sha(lab.manifests["latest"])
+    assert out["blobs_reused"] == 0
+
+
+@pytest.mark.asyncio
+async def test_rebuild_only_sends_the_changed_layer(install):
+    base = b"base layer" * 100
+    lab = FakeLab([base, b"app v2"])
+    lab.blobs[_sha(base)] = base
+    install(lab)
+
+    out = await image_transfer.push_image("localhost/hello-app:latest", "hello-app", "latest")
+
+    assert out["blobs_reused"] == 1
+    assert out["bytes_pushed"] == len(lab.config) + len(b"app v2")
+    assert lab.count("POST") == 2  # config + one layer
+
+
+@pytest.mark.asyncio
+async def test_unchanged_image_uploads_nothing(install):
+    lab = FakeLab([b"base", b"app"])
+    for blob in (lab.config, *lab.layers):
+        lab.blobs[_sha(blob)] = blob
+    install(lab)
+
+    out = await image_transfer.push_image("localhost/hello-app:latest", "hello-app", "v2")
+
+    assert lab.count("POST") == 0
+    assert out["bytes_pushed"] == 0
+    assert out["blobs_reused"] == 3
+    assert "v2" in lab.manifests
+
+
+@pytest.mark.asyncio
+async def test_config_digest_comes_from_the_export_not_the_image_id(install):
+    # Docker's containerd image store reports the manifest digest as the ID.
+    lab = FakeLab([b"base", b"app"], image_id=_sha(b"some manifest"))
+    install(lab)
+
+    await image_transfer.push_image("localhost/hello-app:latest", "hello-app", "latest")
+
+    manifest = json.loads(lab.manifests["latest"])
+    assert manifest["config"]["digest"] == _sha(lab.config)
+    assert _sha(lab.config) in lab.blobs
+
+
+@pytest.mark.asyncio
+async def test_compressed_layers_go_up_under_their_own_digest(install):
+    base = b"base layer" * 100
+    lab = FakeLab([base, b"app v2"], compressed=True)
+    lab.blobs[_sha(lab.blobs_out[0])] = lab.blobs_out[0]
+    install(lab)
+
+    out = await image_transfer.push_image("localhost/hello-app:latest", "hello-app", "latest")
+
+    manifest = json.loads(lab.manifests["latest"])
+    assert manifest["config"]["digest"] == _sha(lab.config)
+    assert manifest["layers"] == [
+        {"mediaType": image_transfer.OCI_LAYER_GZIP, "digest": _sha(b), "size": len(b)} for b in lab.blobs_out
+    ]
+    assert out["blobs_reused"] == 1
+    assert out["bytes_pushed"] == len(lab.config) + len(lab.blobs_out[1])
+    assert set(lab.blobs) == {_sha(lab.config), *(_sha(b) for b in lab.blobs_out)}
+
+
+@pytest.mark.asyncio
+async def test_legacy_layer_names_are_hashed_and_cancelled_if_present(install):
+    base = b"base layer" * 100
+    lab = FakeLab([base, b"app v2"], legacy_names=True)
+    lab.blobs[_sha(base)] = base
+    install(lab)
+
+    out = await image_transfer.push_image("localhost/hello-app:latest", "hello-app", "latest")
+
+    assert out["bytes_pushed"] == len(lab.config) + len(b"app v2")
+    assert lab.count("DELETE") == 1  # the base layer's upload, once its digest was known
+    assert set(lab.blobs) == {_sha(lab.config), *(_sha(x) for x in lab.layers)}
+
+
+@pytest.mark.asyncio
+async def test_streamed_tar_reader_handles_long_names_and_partial_reads():
+    long_name = "blobs/sha256/" + "a" * 64 + "/" + "x" * 120
+    data = _archive({long_name: b"payload" * 1000, "short": b"s"})
+
+    async def trickle():
+        for i in range(0, len(data), 333):
+            yield data[i:i + 333]
+
+    seen = {}
+    async for entry in engine_client._iter_tar(trickle()):
+        seen[entry.name] = await entry.read()
+    assert seen == {long_name: b"payload" * 1000, "short": b"s"}
+
+
+@pytest.mark.asyncio
+async def test_streamed_tar_reader_ignores_gnu_time_fields():
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w", format=tarfile.GNU_FORMAT) as tar:
+        info = tarfile.TarInfo("layer.tar")
+        info.size = 1
+        tar.addfile(info, io.BytesIO(b"x"))
+    data = bytearray(buf.getvalue())
+    data[345:357] = b"15000000000\0"  # GNU atime, where POSIX ustar has the name prefix
+
+    async def once():
+        yield bytes(data)
+
+    assert [entry.name async for entry in engine_client._iter_tar(once())] == ["layer.tar"]
@@ -0,0 +1,80 @@
+"""list_promotions — paged + filtered audit log.
+
+The promotion-service used to hand back the entire audit table, and the tool
+pasted all of it into the LLM context. The tool now forwards filters and a
+page size, surfaces the service's X-Next-Cursor header as `next_cursor`, and
+offers a one-line-per-row summary mode.
+"""
+
+import importlib
+import json
+
+import httpx
+import pytest
+from mcp.server.fastmcp import FastMCP
+
+
+def _registered_tools(mcp: FastMCP) -> dict:
+    tm = getattr(mcp, "_tool_manager", None)
+    inner = getattr(tm, "_tools", None) if tm is not None else None
+    if inner is None:
+        raise AssertionError("Could not locate FastMCP tool registry")
+    return {name: getattr(t, "fn", t) for name, t in inner.items()}
+
+
+ROWS = [
+    {
+        "id": 12, "image_name": "hello-app", "tag": "v1.0.0", "promoted_by": "alice",
+        "source_registry": "http://registry-dev:5000", "target_registry": "http://registry-prod:5000",
+        "digest": "sha256:" + "a" * 64, "status": "success", "policy_check": "skipped — success",
+        "promoted_at": "2026-05-01 10:00:00",
+    },
+    {
+        "id": 11, "image_name": "hello-app", "tag": "latest", "promoted_by": "bob",
+        "source_registry": "http://registry-dev:5000", "target_registry": "http://registry-prod:5000",
+        "digest": None, "status": "failed", "policy_check": "Image not found",
+        "promoted_at": "2026-04-30 09:00:00",
+    },
+]
+
+
+@pytest.fixture
+def promotion_service(monkeypatch, mock_http):
+    """Route httpx.AsyncClient at an in-memory promotion-service stub and
+    record every request it receives."""
+    seen: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, json=ROWS, headers={"X-Next-Cursor": "11"})
+
+    mock_http(handler)
+
+    from mcp_server.tools import promotion_tools
+    importlib.reload(promotion_tools)
+    mcp = FastMCP("test-promotion")
+    promotion_tools.register(mcp)
+    return _registered_tools(mcp), seen
+
+
+@pytest.mark.asyncio
+async def test_list_promotions_forwards_filters_and_page_size(promotion_service):
+    tools, seen = promotion_service
+    out = json.loads(await tools["list_promotions"](image_name="hello-app", status="success", limit=2))
+
+    params = seen[0].url.params
+    assert params["image_name"] == "hello-app"
+    assert params["status"] == "success"
+    assert params["limit"] == "2"
+    # Unset filters must not be sent as empty strings.
+    assert "tag" not in params and "cursor" not in params
+    assert out["next_cursor"] == 11
+    assert [r["id"] for r in out["promotions"]] == [12, 11]
+
+
+@pytest.mark.asyncio
+async def test_list_promotions_summary_is_one_line_per_row(promotion_service):
+    tools, _ = promotion_service
+    out = json.loads(await tools["list_promotions"](summary=True))
+    assert out["promotions"][0].startswith("#12 hello-app:v1.0.0 success by alice")
+    assert out["promotions"][1] == "#11 hello-app:latest failed by bob at 2026-04-30 09:00:00"
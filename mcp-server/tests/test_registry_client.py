@@ -0,0 +1,337 @@
+"""registry_client — manifest / tag caching against an in-memory registry.
+
+The LLM tends to ask about the same image several times in one turn (list
+tags → manifest → retag → manifest again). Manifests are cached by digest
+with their raw bytes preserved, so retagging is byte-exact and needs no GET
+once the manifest is known; tag lists and tag → digest resolutions live for
+a short TTL.
+"""
+
+import hashlib
+import json
+
+import httpx
+import pytest
+from mcp.server.fastmcp import FastMCP
+
+from mcp_server import config
+from mcp_server.clients import registry_client
+from mcp_server.tools import registry_tools
+
+
+# Deliberately non-canonical JSON (odd spacing, key order) — a json.dumps
+# round trip would produce different bytes and therefore a different digest.
+RAW_MANIFEST = (
+    b'{"schemaVersion": 2,  "mediaType": "application/vnd.docker.distribution.manifest.v2+json",'
+    b' "config": {"digest": "sha256:cfg", "size": 10},'
+    b' "layers": [{"size": 300, "digest": "sha256:l1"}]}'
+)
+DIGEST = f"sha256:{hashlib.sha256(RAW_MANIFEST).hexdigest()}"
+MANIFEST_TYPE = "application/vnd.docker.distribution.manifest.v2+json"
+
+
+class FakeRegistry:
+    def __init__(self):
+        self.requests: list[httpx.Request] = []
+        self.manifests = {"hello-app": {"latest": RAW_MANIFEST}}
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.url.path == "/v2/_catalog":
+            return self.catalog(request)
+        parts = request.url.path.split("/")  # ['', 'v2', image, kind, ref]
+        image, kind = parts[2], parts[3]
+        if kind == "blobs":
+            return httpx.Response(200, json={"created": "2026-05-01T10:00:00Z", "os": "linux", "architecture": "amd64"})
+        if kind == "tags":
+            return httpx.Response(200, json={"name": image, "tags": sorted(self.manifests.get(image, {}))})
+        ref = parts[4]
+        if request.method == "PUT":
+            self.manifests.setdefault(image, {})[ref] = request.content
+            return httpx.Response(201)
+        raw = self.manifests.get(image, {}).get(ref)
+        if raw is None:
+            return httpx.Response(404, json={"errors": [{"code": "MANIFEST_UNKNOWN"}]})
+        headers = {
+            "Content-Type": MANIFEST_TYPE,
+            "Docker-Content-Digest": f"sha256:{hashlib.sha256(raw).hexdigest()}",
+        }
+        return httpx.Response(200, content=b"" if request.method == "HEAD" else raw, headers=headers)
+
+    def catalog(self, request: httpx.Request) -> httpx.Response:
+        """Distribution-style paging: lexical order, `n` + `last`, Link header."""
+        n = int(request.url.params.get("n", 100))
+        last = request.url.params.get("last", "")
+        names = sorted(name for name in self.manifests if name > last)
+        page = names[:n]
+        headers = {}
+        if len(names) > n:
+            headers["Link"] = f'</v2/_catalog?last={page[-1]}&n={n}>; rel="next"'
+        return httpx.Response(200, json={"repositories": page}, headers=headers)
+
+    def count(self, method: str) -> int:
+        return sum(1 for r in self.requests if r.method == method)
+
+
+@pytest.fixture
+def registry(monkeypatch, mock_http):
+    fake = FakeRegistry()
+    mock_http(fake.handler)
+    monkeypatch.setattr(config, "DEV_REGISTRY_URL", "http://registry-dev:5000")
+    registry_client.clear_cache()
+    yield fake
+    registry_client.clear_cache()
+
+
+@pytest.mark.asyncio
+async def test_repeated_get_manifest_is_served_from_cache(registry):
+    first = await registry_client.get_manifest("hello-app", "latest")
+    second = await registry_client.get_manifest("hello-app", "latest")
+    assert first == second
+    assert first["digest"] == DIGEST
+    assert first["manifest"]["layers"][0]["digest"] == "sha256:l1"
+    assert registry.count("GET") == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_tag_revalidates_with_head_only(registry, monkeypatch):
+    monkeypatch.setattr(config, "REGISTRY_TAG_CACHE_TTL", 0.0)
+    await registry_client.get_manifest("hello-app", "latest")
+    await registry_client.get_manifest("hello-app", "latest")
+    # Second call re-resolves the tag (it may have moved) but the digest is
+    # already cached, so no manifest body is transferred again.
+    assert registry.count("GET") == 1
+    assert registry.count("HEAD") == 2
+
+
+@pytest.mark.asyncio
+async def test_tag_image_puts_original_bytes_without_refetching(registry):
+    await registry_client.get_manifest("hello-app", "latest")
+    assert await registry_client.tag_image("hello-app", "latest", "v1.0.0")
+
+    assert registry.manifests["hello-app"]["v1.0.0"] == RAW_MANIFEST
+    assert registry.count("GET") == 1  # only the initial inspection
+    put = next(r for r in registry.requests if r.method == "PUT")
+    assert put.headers["content-type"] == MANIFEST_TYPE
+
+    # The new tag resolves locally to the same digest.
+    data = await registry_client.get_manifest("hello-app", "v1.0.0")
+    assert data["digest"] == DIGEST
+    assert registry.count("GET") == 1
+
+
+@pytest.mark.asyncio
+async def test_tag_list_cached_and_invalidated_by_retag(registry):
+    assert await registry_client.list_tags("hello-app") == ["latest"]
+    assert await registry_client.list_tags("hello-app") == ["latest"]
+    assert sum(1 for r in registry.requests if r.url.path.endswith("/tags/list")) == 1
+
+    await registry_client.tag_image("hello-app", "latest", "v2")
+    assert await registry_client.list_tags("hello-app") == ["latest", "v2"]
+
+
+@pytest.mark.asyncio
+async def test_manifest_cache_is_lru_bounded(registry, monkeypatch):
+    monkeypatch.setattr(config, "REGISTRY_MANIFEST_CACHE_SIZE", 1)
+    other = json.dumps({"schemaVersion": 2, "layers": []}).encode()
+    registry.manifests["other"] = {"latest": other}
+
+    await registry_client.get_manifest("hello-app", "latest")
+    await registry_client.get_manifest("other", "latest")
+    assert [digest for _, _, digest in registry_client._manifests] == [f"sha256:{hashlib.sha256(other).hexdigest()}"]
+
+
+@pytest.mark.asyncio
+async def test_tag_caches_are_lru_bounded(registry, monkeypatch):
+    monkeypatch.setattr(config, "REGISTRY_MANIFEST_CACHE_SIZE", 1)
+    registry.manifests["other"] = {"latest": RAW_MANIFEST}
+
+    for image in ("hello-app", "other"):
+        await registry_client.get_manifest(image, "latest")
+        await registry_client.list_tags(image)
+    assert list(registry_client._tag_digests) == [("http://registry-dev:5000", "other", "latest")]
+    assert list(registry_client._tag_lists) == [("http://registry-dev:5000", "other")]
+
+
+@pytest.mark.asyncio
+async def test_cached_digest_is_only_served_for_the_repo_it_came_from(registry):
+    await registry_client.get_manifest("hello-app", "latest")
+    before = len(registry.requests)
+    assert (await registry_client.get_manifest("hello-app", DIGEST))["digest"] == DIGEST
+    assert len(registry.requests) == before
+
+    with pytest.raises(Exception):
+        await registry_client.get_manifest("other-repo", DIGEST)
+    with pytest.raises(Exception):
+        await registry_client.get_manifest("hello-app", DIGEST, "prod")
+
+
+# ─── catalog pagination ───
+
+
+@pytest.fixture
+def big_registry(registry, monkeypatch):
+    monkeypatch.setattr(config, "REGISTRY_CATALOG_PAGE_SIZE", 3)
+    registry.manifests = {f"app-{i:02d}": {} for i in range(10)}
+    registry.manifests.update({"team-a/api": {}, "team-a/web": {}, "zeta": {}})
+    return registry
+
+
+def _catalog_calls(registry) -> list[httpx.Request]:
+    return [r for r in registry.requests if r.url.path == "/v2/_catalog"]
+
+
+@pytest.mark.asyncio
+async def test_list_images_follows_link_header_past_first_page(big_registry):
+    images = await registry_client.list_images()
+    assert images == sorted(big_registry.manifests)
+    assert len(_catalog_calls(big_registry)) == 5  # 13 names / 3 per page
+
+
+@pytest.mark.asyncio
+async def test_prefix_walk_skips_ahead_and_stops_early(big_registry):
+    names = [n async for n in registry_client.iter_images(prefix="team-a/")]
+    assert names == ["team-a/api", "team-a/web"]
+    calls = _catalog_calls(big_registry)
+    assert calls[0].url.params["last"] == "team-a"
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_list_registry_images_tool_limits_and_continues(big_registry):
+    mcp = FastMCP("test-registry")
+    registry_tools.register(mcp)
+    tool = mcp._tool_manager._tools["list_registry_images"].fn
+
+    first = json.loads(await tool(limit=4))
+    assert first["images"] == ["app-00", "app-01", "app-02", "app-03"]
+    assert first["truncated"] is True
+    # Only the pages needed to fill the limit (+1 to detect truncation).
+    assert len(_catalog_calls(big_registry)) == 2
+
+    rest = json.loads(await tool(limit=100, start_after=first["next_start_after"]))
+    assert rest["images"][0] == "app-04"
+    assert rest["truncated"] is False
+
+
+# ─── describe_registry fan-out ───
+
+
+@pytest.mark.asyncio
+async def test_describe_registry_resolves_every_tag_in_one_call(registry):
+    registry.manifests["hello-app"]["v1.0.0"] = RAW_MANIFEST
+    registry.manifests["other"] = {"latest": b'{"schemaVersion": 2, "config": {"digest": "sha256:cfg2"}, "layers": [{"size": 5}, {"size": 7}]}'}
+
+    mcp = FastMCP("test-registry")
+    registry_tools.register(mcp)
+    out = json.loads(await mcp._tool_manager._tools["describe_registry"].fn())
+
+    assert out["truncated"] is False
+    hello = out["images"]["hello-app"]
+    assert set(hello) == {"latest", "v1.0.0"}
+    assert hello["latest"] == {"digest": DIGEST, "size": 300, "created": "2026-05-01T10:00:00Z"}
+    assert out["images"]["other"]["latest"]["size"] == 12
+    # Both hello-app tags share a config digest — its blob is fetched once.
+    blob_gets = [r for r in registry.requests if "/blobs/" in r.url.path]
+    assert sorted(r.url.path for r in blob_gets) == ["/v2/hello-app/blobs/sha256:cfg", "/v2/other/blobs/sha256:cfg2"]
+
+
+@pytest.mark.asyncio
+async def test_describe_registry_bounds_requests_in_flight(registry, monkeypatch, mock_http):
+    import asyncio
+
+    monkeypatch.setattr(config, "REGISTRY_FANOUT_CONCURRENCY", 2)
+    registry.manifests = {f"app-{i}": {"latest": RAW_MANIFEST, "v1": RAW_MANIFEST} for i in range(6)}
+    sync_handler = registry.handler
+    inflight = {"now": 0, "max": 0}
+
+    async def slow_handler(request):
+        inflight["now"] += 1
+        inflight["max"] = max(inflight["max"], inflight["now"])
+        await asyncio.sleep(0.01)
+        inflight["now"] -= 1
+        return sync_handler(request)
+
+    mock_http(slow_handler)
+    images, _ = await registry_client.describe_images()
+    assert len(images) == 6
+    assert inflight["max"] == 2
+
+
+# ─── diff_registries ───
+
+
+@pytest.fixture
+def dev_and_prod(monkeypatch, mock_http):
+    dev, prod = FakeRegistry(), FakeRegistry()
+    hosts = {"registry-dev": dev, "registry-prod": prod}
+    mock_http(lambda r: hosts[r.url.host].handler(r))
+    monkeypatch.setattr(config, "DEV_REGISTRY_URL", "http://registry-dev:5000")
+    monkeypatch.setattr(config, "PROD_REGISTRY_URL", "http://registry-prod:5000")
+    registry_client.clear_cache()
+    yield dev, prod
+    registry_client.clear_cache()
+
+
+@pytest.mark.asyncio
+async def test_diff_registries_reports_set_and_digest_differences(dev_and_prod):
+    dev, prod = dev_and_prod
+    rebuilt = RAW_MANIFEST.replace(b"sha256:l1", b"sha256:l2")
+    dev.manifests = {"hello-app": {"latest": rebuilt, "v1.0.0": RAW_MANIFEST, "v2": rebuilt}, "new-app": {"latest": RAW_MANIFEST}}
+    prod.manifests = {"hello-app": {"latest": RAW_MANIFEST, "v1.0.0": RAW_MANIFEST}, "old-app": {"v0": RAW_MANIFEST}}
+
+    mcp = FastMCP("test-registry")
+    registry_tools.register(mcp)
+    out = json.loads(await mcp._tool_manager._tools["diff_registries"].fn())
+
+    assert out["only_in_dev"] == ["hello-app:v2", "new-app:latest"]
+    assert out["only_in_prod"] == ["old-app:v0"]
+    assert out["in_sync"] == 1
+    [differs] = out["digest_differs"]
+    assert differs["ref"] == "hello-app:latest"
+    assert differs["prod"] == DIGEST[:19]
+    # A digest comparison never needs config blobs.
+    assert not any("/blobs/" in r.url.path for r in dev.requests + prod.requests)
+
+
+@pytest.mark.asyncio
+async def test_diff_registries_cached_until_catalog_changes(dev_and_prod):
+    dev, prod = dev_and_prod
+    prod.manifests = {}
+
+    first = await registry_client.diff_registries()
+    second = await registry_client.diff_registries()
+    assert first["cached"] is False and second["cached"] is True
+    assert second["only_in_dev"] == ["hello-app:latest"]
+
+    dev.manifests["another"] = {"latest": RAW_MANIFEST}
+    third = await registry_client.diff_registries()
+    assert third["cached"] is False
+    assert third["only_in_dev"] == ["another:latest", "hello-app:latest"]
+
+
+@pytest.mark.asyncio
+async def test_diff_registries_reports_unreadable_refs_instead_of_missing(dev_and_prod):
+    dev, prod = dev_and_prod
+    dev.manifests = {"hello-app": {"latest": RAW_MANIFEST, "v1": RAW_MANIFEST}}
+    prod.manifests = {"hello-app": {"latest": None, "v1": RAW_MANIFEST}}  # listed, but its manifest 404s
+
+    out = await registry_client.diff_registries()
+
+    assert out["only_in_dev"] == []
+    assert out["in_sync"] == 1
+    [error] = out["errors"]
+    assert (error["registry"], error["ref"]) == ("prod", "hello-app:latest")
+    assert (await registry_client.diff_registries())["cached"] is False
+
+
+@pytest.mark.asyncio
+async def test_build_cache_tag_is_not_listed(dev_and_prod):
+    dev, prod = dev_and_prod
+    dev.manifests = {"hello-app": {"latest": RAW_MANIFEST, config.BUILD_CACHE_TAG: RAW_MANIFEST}}
+    prod.manifests = {"hello-app": {"latest": RAW_MANIFEST}}
+
+    assert await registry_client.list_tags("hello-app") == ["latest"]
+    assert await registry_client.list_tags("hello-app") == ["latest"]  # from the tag-list cache
+    out = await registry_client.diff_registries()
+    assert out["only_in_dev"] == [] and out["in_sync"] == 1
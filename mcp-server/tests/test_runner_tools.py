@@ -8,6 +8,7 @@ import asyncio
 import importlib
 import inspect
 import json
+from pathlib import Path
 
 import pytest
 from mcp.server.fastmcp import FastMCP, Context
@@ -159,12 +160,23 @@ async def test_deploy_app_does_not_raise_attribute_error_without_ctx(monkeypatch
 
 @pytest.mark.asyncio
 async def test_scan_image_returns_valid_json(monkeypatch):
-    """scan_image is a pure mock; just confirm it runs without ctx and emits JSON."""
+    """scan_image runs without ctx and emits JSON; a CRITICAL finding fails it."""
+    from mcp_server import scanner
+
+    async def fake_scan(image_name, tag, ctx=None):
+        return {
+            "digest": "sha256:abc",
+            "vulnerabilities": [{"id": "CVE-1", "severity": "CRITICAL", "package": "openssl"}],
+            "packages": 1, "layers": 1, "layers_scanned": 1,
+        }
+
+    monkeypatch.setattr(scanner, "scan_image", fake_scan)
     tools = _fresh_runner_tools()
     out = await tools["scan_image"](image_name="sample-app", tag="v1.0.0")
     parsed = json.loads(out)
-    assert parsed["status"] in ("PASSED", "FAILED")
+    assert parsed["status"] == "FAILED"
     assert parsed["image"] == "sample-app:v1.0.0"
+    assert parsed["summary"]["critical"] == 1
 
 
 # ─── auth + default-repo fixes (the bug from the chat-ui transcript) ───
@@ -180,6 +192,15 @@ def test_build_image_default_repo_url_matches_seeded_repo():
     )
 
 
+
+def test_seeded_sample_app_matches_hello_app():
+    """build_image ships the app.py init-gitea.sh seeds into Gitea; it is a
+    copy of hello-app/app.py and must not drift from it."""
+    root = Path(__file__).resolve().parents[2]
+    script = (root / "scripts" / "_internal" / "init-gitea.sh").read_text()
+    seeded = script.split("<<'PYEOF'\n", 1)[1].split("\nPYEOF\n", 1)[0]
+    assert seeded == (root / "hello-app" / "app.py").read_text().rstrip("\n")
+
 def test_build_image_accepts_optional_username_password():
     """build_image follows the same per-call auth pattern as the gitea_* tools."""
     tools = _fresh_runner_tools()
@@ -0,0 +1,255 @@
+"""scan_image — package manifests from registry layers vs. the offline DB.
+
+scan_image used to be a random.random() mock. It now reads dpkg / apk /
+Python package metadata out of the image's layer blobs, stacks the layers
+(whiteouts included) and matches the result against a memory-mapped DB
+file. Layer results are indexed on disk by digest, so a second image on
+the same base only downloads its own layers.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import importlib
+import io
+import json
+import tarfile
+
+import httpx
+import pytest
+from mcp.server.fastmcp import FastMCP
+
+from mcp_server import config, scanner, vuln_db
+from mcp_server.clients import registry_client
+from mcp_server.tools import runner_tools
+
+
+def _sha(data: bytes) -> str:
+    return f"sha256:{hashlib.sha256(data).hexdigest()}"
+
+
+def _layer(files: dict[str, str], compress: bool = False) -> bytes:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        for name, text in files.items():
+            data = text.encode()
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return gzip.compress(buf.getvalue()) if compress else buf.getvalue()
+
+
+DPKG_STATUS = """\
+Package: libssl3
+Status: install ok installed
+Source: openssl (3.0.11-1~deb12u1)
+Version: 3.0.11-1~deb12u1
+
+Package: curl
+Status: install ok installed
+Version: 7.88.1-10+deb12u4
+Description: command line tool
+ with a continuation line: not a field
+
+Package: removed-pkg
+Status: deinstall ok config-files
+Version: 1.0
+"""
+
+BASE = _layer({
+    "etc/os-release": 'ID=debian\nVERSION_ID="12"\n',
+    "var/lib/dpkg/status": DPKG_STATUS,
+    "usr/local/lib/python3.12/site-packages/pip-23.2.1.dist-info/METADATA":
+        "Metadata-Version: 2.1\nName: pip\nVersion: 23.2.1\n\nlong description\n",
+}, compress=True)
+APP = _layer({
+    "app/.venv/lib/python3.12/site-packages/Requests-2.30.0.dist-info/METADATA":
+        "Name: Requests\nVersion: 2.30.0\n",
+    "usr/local/lib/python3.12/site-packages/.wh.pip-23.2.1.dist-info": "",
+})
+
+DB_RECORDS = [
+    {"id": "CVE-2024-0001", "summary": "openssl\tbug", "database_specific": {"severity": "CRITICAL"},
+     "affected": [{"package": {"ecosystem": "Debian:12", "name": "openssl"},
+                   "ranges": [{"type": "ECOSYSTEM", "events": [{"introduced": "0"}, {"fixed": "3.0.13-1~deb12u1"}]}]}]},
+    {"id": "CVE-2023-38545", "summary": "curl bug", "database_specific": {"severity": "HIGH"},
+     "affected": [{"package": {"ecosystem": "Debian:12", "name": "curl"},
+                   "ranges": [{"type": "ECOSYSTEM", "events": [{"introduced": "0"}, {"fixed": "7.88.1-10+deb12u4"}]}]}]},
+    {"id": "GHSA-pip", "summary": "pip bug", "database_specific": {"severity": "MODERATE"},
+     "affected": [{"package": {"ecosystem": "PyPI", "name": "pip"},
+                   "ranges": [{"type": "ECOSYSTEM", "events": [{"introduced": "0"}, {"fixed": "23.3"}]}]}]},
+    {"id": "GHSA-requests", "summary": "requests bug", "database_specific": {"severity": "MODERATE"},
+     "affected": [{"package": {"ecosystem": "PyPI", "name": "requests"},
+                   "ranges": [{"type": "ECOSYSTEM", "events": [{"introduced": "2.3.0"}, {"fixed": "2.31.0"}]}]}]},
+    {"id": "GHSA-unfixed", "summary": "no fix yet",
+     "affected": [{"package": {"ecosystem": "PyPI", "name": "requests"},
+                   "ranges": [{"type": "ECOSYSTEM", "events": [{"introduced": "2.0"}]}]}]},
+]
+
+
+class FakeRegistry:
+    def __init__(self):
+        self.images: dict[str, list[bytes]] = {}
+        self.blob_gets: list[str] = []
+
+    def push(self, tag: str, layers: list[bytes]) -> None:
+        self.images[tag] = layers
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if "/manifests/" in path:
+            layers = self.images.get(path.rsplit("/", 1)[1])
+            if layers is None:
+                return httpx.Response(404, json={"errors": [{"code": "MANIFEST_UNKNOWN"}]})
+            raw = json.dumps({
+                "schemaVersion": 2,
+                "config": {"digest": "sha256:cfg", "size": 2},
+                "layers": [{"digest": _sha(x), "size": len(x)} for x in layers],
+            }).encode()
+            return httpx.Response(200, content=raw, headers={
+                "Content-Type": "application/vnd.oci.image.manifest.v1+json",
+                "Docker-Content-Digest": _sha(raw),
+            })
+        digest = path.rsplit("/", 1)[1]
+        self.blob_gets.append(digest)
+        blob = next(x for layers in self.images.values() for x in layers if _sha(x) == digest)
+        return httpx.Response(200, content=blob)
+
+
+@pytest.fixture
+def scan(tmp_path, monkeypatch, mock_http):
+    db_path = tmp_path / "vulndb.tsv"
+    vuln_db.write_db(DB_RECORDS, str(db_path))
+    monkeypatch.setattr(config, "VULN_DB_PATH", str(db_path))
+    monkeypatch.setattr(config, "DEV_REGISTRY_URL", "http://registry-dev:5000")
+
+    registry = FakeRegistry()
+    mock_http(registry.handler)
+    registry_client.clear_cache()
+    scanner.clear_cache()
+    importlib.reload(runner_tools)
+    mcp = FastMCP("test-scan")
+    runner_tools.register(mcp)
+    tool = mcp._tool_manager._tools["scan_image"].fn
+
+    async def run(tag: str) -> dict:
+        return json.loads(await tool(image_name="hello-app", tag=tag))
+
+    yield registry, run
+    registry_client.clear_cache()
+    scanner.clear_cache()
+
+
+@pytest.mark.asyncio
+async def test_findings_come_from_the_stacked_layers(scan):
+    registry, run = scan
+    registry.push("v1", [BASE, APP])
+
+    out = await run("v1")
+
+    assert out["status"] == "FAILED"  # the CRITICAL openssl finding
+    found = {(v["id"], v["package"], v["installed_version"]) for v in out["vulnerabilities"]}
+    assert found == {
+        ("CVE-2024-0001", "openssl", "3.0.11-1~deb12u1"),   # matched by dpkg source package
+        ("GHSA-requests", "requests", "2.30.0"),            # name normalised
+        ("GHSA-unfixed", "requests", "2.30.0"),
+    }
+    # curl is at the fixed version; pip was whited out by the app layer.
+    assert out["vulnerabilities"][0]["severity"] == "CRITICAL"
+    assert out["summary"]["critical"] == 1 and out["summary"]["medium"] == 1
+    assert out["packages"] == 3
+    assert out["layers_scanned"] == 2
+
+
+@pytest.mark.asyncio
+async def test_shared_base_layer_is_only_read_once(scan):
+    registry, run = scan
+    other_app = _layer({"srv/site-packages/requests-2.31.0.dist-info/METADATA": "Name: requests\nVersion: 2.31.0\n"})
+    registry.push("v1", [BASE, APP])
+    registry.push("v2", [BASE, other_app])
+
+    await run("v1")
+    out = await run("v2")
+
+    assert out["layers_scanned"] == 1
+    assert registry.blob_gets.count(_sha(BASE)) == 1
+    ids = {v["id"] for v in out["vulnerabilities"]}
+    assert ids == {"CVE-2024-0001", "GHSA-pip", "GHSA-unfixed"}
+
+
+@pytest.mark.asyncio
+async def test_layer_index_persists_across_restarts(scan):
+    registry, run = scan
+    registry.push("v1", [BASE, APP])
+    first = await run("v1")
+
+    scanner.clear_cache()  # a fresh runner process, same RUNNER_CACHE_DIR
+    registry.blob_gets.clear()
+    second = await run("v1")
+
+    assert registry.blob_gets == []
+    assert second["layers_scanned"] == 0
+    assert second["vulnerabilities"] == first["vulnerabilities"]
+
+
+@pytest.mark.asyncio
+async def test_stale_index_format_is_rescanned(scan, monkeypatch):
+    registry, run = scan
+    registry.push("v1", [BASE])
+    await run("v1")
+
+    scanner.clear_cache()
+    monkeypatch.setattr(scanner, "INDEX_FORMAT", scanner.INDEX_FORMAT + 1)
+    out = await run("v1")
+    assert out["layers_scanned"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_scans_share_the_base_layer_read(scan):
+    registry, run = scan
+    apps = [_layer({f"srv/site-packages/app{i}-1.0.dist-info/METADATA": f"Name: app{i}\nVersion: 1.0\n"})
+            for i in range(4)]
+    for i, app in enumerate(apps):
+        registry.push(f"v{i}", [BASE, app])
+
+    outs = await asyncio.gather(*(run(f"v{i}") for i in range(4)))
+
+    assert registry.blob_gets.count(_sha(BASE)) == 1
+    assert sum(o["layers_scanned"] for o in outs) == 5  # the base once, plus each app layer
+    assert all(o["packages"] == 4 for o in outs)
+
+
+@pytest.mark.asyncio
+async def test_missing_image_reports_the_failing_step(scan):
+    _, run = scan
+    out = await run("nope")
+    assert out["status"] == "error"
+    assert out["step"] == "registry_manifest"
+
+
+def test_db_lookup_binary_searches_the_mapped_file(tmp_path):
+    names = [f"pkg{i:04d}" for i in range(500)]
+    records = [{"id": f"CVE-{n}", "affected": [{"package": {"ecosystem": "PyPI", "name": n},
+                "ranges": [{"type": "ECOSYSTEM", "events": [{"introduced": "0"}, {"fixed": "2.0"}]}]}]}
+               for n in names]
+    path = str(tmp_path / "db.tsv")
+    vuln_db.write_db(records, path)
+    db = vuln_db.VulnDB(path)
+    try:
+        for n in ("pkg0000", "pkg0257", "pkg0499"):
+            assert [e["id"] for e in db.match(n, "PyPI", "1.9")] == [f"CVE-{n}"]
+            assert db.match(n, "PyPI", "2.0") == []
+        assert db.entries("pkg", "PyPI") == [] and db.entries("zzz", "PyPI") == []
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("a, b, expected", [
+    ("1.10", "1.9", 1),
+    ("1.0~rc1", "1.0", -1),
+    ("1:9.2p1-2+deb12u3", "9.9", 1),
+    ("7.88.1-10+deb12u4", "7.88.1-10+deb12u10", -1),
+    ("3.1.4-r5", "3.1.4-r5", 0),
+])
+def test_compare_versions(a, b, expected):
+    assert vuln_db.compare_versions(a, b) == expected
@@ -0,0 +1,136 @@
+"""tracing — spans, traceparent propagation and the OTLP/JSON file export.
+
+The end-to-end case drives mcp-user's real streamable-HTTP app in-process
+with a traceparent header, the way chat-ui calls it, and checks that the
+tool span and the user-api request under it land in the caller's trace.
+"""
+
+import asyncio
+import importlib
+import json
+
+import httpx
+import pytest
+
+from mcp_server import config, tracing
+
+CALLER_TRACE = "4bf92f3577b34da6a3ce929d0e0e4736"
+CALLER_SPAN = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def traces(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_DIR", str(tmp_path))
+    monkeypatch.setattr(tracing, "SERVICE", "test-service")
+    return tmp_path
+
+
+def _lines(directory, service="test-service") -> list[dict]:
+    tracing.flush()
+    return [json.loads(line) for line in (directory / f"{service}.jsonl").read_text().splitlines()]
+
+
+def test_off_without_trace_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(tracing, "TRACE_DIR", "")
+    with tracing.span("work") as s:
+        assert tracing.traceparent() is None
+        s.set("ignored", 1)
+    assert tracing.inject({"a": "b"}) == {"a": "b"}
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_children_share_the_trace_and_export_once(traces):
+    with tracing.span("root", "server", route="/x") as root:
+        with tracing.span("child") as child:
+            assert tracing.traceparent() == f"00-{root.trace_id}-{child.span_id}-01"
+    [line] = _lines(traces)
+    resource = line["resourceSpans"][0]
+    assert resource["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": "test-service"}}]
+    spans = {s["name"]: s for s in resource["scopeSpans"][0]["spans"]}
+    assert spans["child"]["parentSpanId"] == spans["root"]["spanId"]
+    assert "parentSpanId" not in spans["root"]
+    assert spans["root"]["kind"] == 2
+    assert spans["root"]["attributes"] == [{"key": "route", "value": {"stringValue": "/x"}}]
+    assert int(spans["root"]["endTimeUnixNano"]) >= int(spans["child"]["endTimeUnixNano"])
+
+
+def test_exceptions_mark_the_span(traces):
+    with pytest.raises(RuntimeError):
+        with tracing.span("boom"):
+            raise RuntimeError("nope")
+    [span] = tracing.load_trace(_lines(traces)[0]["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["traceId"])
+    assert span["error"] == "RuntimeError: nope"
+
+
+def test_remote_parent_is_continued(traces):
+    with tracing.remote({"traceparent": f"00-{CALLER_TRACE}-{CALLER_SPAN}-01"}):
+        with tracing.span("handler"):
+            pass
+    [span] = tracing.load_trace(CALLER_TRACE)
+    assert span["parent_id"] == CALLER_SPAN
+    assert span["service"] == "test-service"
+
+
+@pytest.mark.parametrize("value", [None, "", "garbage", f"00-{'0' * 32}-{CALLER_SPAN}-01"])
+def test_invalid_traceparent_starts_a_new_trace(traces, value):
+    with tracing.remote({"traceparent": value} if value is not None else {}):
+        with tracing.span("handler") as s:
+            assert s.trace_id != CALLER_TRACE
+            assert s.parent_id == ""
+
+
+async def test_spans_in_concurrent_tasks_nest(traces):
+    async def leg(name):
+        with tracing.span(name):
+            await asyncio.sleep(0.01)
+
+    with tracing.span("fanout") as root:
+        await asyncio.gather(leg("a"), leg("b"))
+    spans = {s["name"]: s for s in tracing.load_trace(root.trace_id)}
+    assert spans["a"]["parent_id"] == spans["b"]["parent_id"] == root.span_id
+
+
+def test_rotation(traces, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_FILE_MAX_MB", 0.0001)
+    for _ in range(5):
+        with tracing.span("x", payload="y" * 100):
+            pass
+    tracing.flush()
+    assert (traces / "test-service.jsonl.1").exists()
+
+
+async def test_tool_call_continues_the_callers_trace(traces, monkeypatch):
+    def user_api(request: httpx.Request) -> httpx.Response:
+        assert request.headers["traceparent"].startswith(f"00-{CALLER_TRACE}-")
+        return httpx.Response(200, json=[{"id": 1, "username": "alice"}])
+
+    monkeypatch.setattr(httpx, "AsyncHTTPTransport", lambda *a, **kw: httpx.MockTransport(user_api))
+    monkeypatch.setattr(config, "USER_API_URL", "http://user-api:8001")
+    from mcp_server import server_user
+    server_user = importlib.reload(server_user)
+    mcp = server_user.mcp
+    assert tracing.SERVICE == "mcp-user"
+
+    app = mcp.streamable_http_app()
+    async with mcp.session_manager.run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://mcp-user") as client:
+            resp = await client.post("/mcp", json={
+                "jsonrpc": "2.0", "id": 1, "method": "tools/call",
+                "params": {"name": "list_users", "arguments": {}},
+            }, headers={
+                "Content-Type": "application/json",
+                "Accept": "application/json, text/event-stream",
+                "traceparent": f"00-{CALLER_TRACE}-{CALLER_SPAN}-01",
+            })
+    assert resp.status_code == 200
+    assert "alice" in resp.text
+
+    spans = {s["name"]: s for s in tracing.load_trace(CALLER_TRACE)}
+    tool = spans["tool list_users"]
+    assert tool["parent_id"] == CALLER_SPAN
+    assert tool["service"] == "mcp-user"
+    assert tool["kind"] == "server"
+    upstream = spans["GET user-api/users"]
+    assert upstream["parent_id"] == tool["span_id"]
+    assert upstream["attributes"]["http.response.status_code"] == 200
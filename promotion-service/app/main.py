@@ -1,8 +1,30 @@
-from fastapi import FastAPI, HTTPException
+from datetime import datetime, timezone
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from .models import PromoteRequest, PromotionResponse
 from .promote import init_db, get_db, promote_image
+# Tracing is shared with mcp-server: the image copies
+# mcp-server/mcp_server/tracing.py in (see Dockerfile).
+from mcp_server import tracing
 
 app = FastAPI(title="Promotion Service", version="1.0.0")
+tracing.set_service("promotion-service")
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Continue the caller's trace (mcp-promotion sends a traceparent)."""
+    if not tracing.TRACE_DIR or request.url.path == "/health":
+        return await call_next(request)
+    with tracing.remote(request.headers), tracing.span(
+        f"{request.method} {request.url.path}", "server",
+        **{"http.request.method": request.method, "url.path": request.url.path},
+    ) as span:
+        response = await call_next(request)
+        span.set("http.response.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.fail(f"HTTP {response.status_code}")
+    return response
 
 
 @app.on_event("startup")
@@ -21,11 +43,93 @@ async def promote(req: PromoteRequest):
     return result
 
 
+def _normalize_timestamp(value: str) -> str:
+    """Accept ISO-8601 (`2026-05-01T12:00:00Z`, `...+02:00`) as well as
+    SQLite's own `datetime('now')` format, and return the latter in UTC so
+    string comparison against `promoted_at` is ordered correctly. A bare
+    date is passed through for `until` to extend to the end of the day."""
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value.removesuffix("Z").removesuffix("z"))
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"invalid timestamp: {value!r}")
+    if len(value) == len("YYYY-MM-DD"):
+        return parsed.date().isoformat()
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime("%Y-%m-%d %H:%M:%S")
+
+
 @app.get("/promotions", response_model=list[PromotionResponse])
-def list_promotions():
+def list_promotions(
+    response: Response,
+    image_name: str | None = None,
+    tag: str | None = None,
+    status: str | None = None,
+    promoted_by: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    limit: int | None = Query(None, ge=1, le=500),
+    cursor: int | None = Query(None, ge=1),
+):
+    """Newest-first audit log, optionally paged with a keyset cursor.
+
+    Without `limit` or `cursor` every matching row is returned, as before
+    paging existed. `cursor` is the id to continue *below* (pages default to
+    50 rows); when more rows remain, the next value is returned in the
+    `X-Next-Cursor` response header. Keyset paging
+    (instead of OFFSET) keeps deep pages as cheap as the first one while
+    promotions are still being appended at the top.
+    """
+    conditions = []
+    params: list = []
+
+    if image_name is not None:
+        conditions.append("image_name = ?")
+        params.append(image_name)
+    if tag is not None:
+        conditions.append("tag = ?")
+        params.append(tag)
+    if status is not None:
+        conditions.append("status = ?")
+        params.append(status)
+    if promoted_by is not None:
+        conditions.append("promoted_by = ?")
+        params.append(promoted_by)
+    if since:
+        conditions.append("promoted_at >= ?")
+        params.append(_normalize_timestamp(since))
+    if until:
+        upper = _normalize_timestamp(until)
+        if len(upper) == len("YYYY-MM-DD"):
+            upper += " 23:59:59"  # a bare date means "through the end of that day"
+        conditions.append("promoted_at <= ?")
+        params.append(upper)
+    if cursor is not None:
+        conditions.append("id < ?")
+        params.append(cursor)
+
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    if limit is None and cursor is None:
+        db = get_db()
+        rows = db.execute(f"SELECT * FROM promotions{where} ORDER BY id DESC", params).fetchall()
+        db.close()
+        return [dict(r) for r in rows]
+    limit = limit or 50
+
     db = get_db()
-    rows = db.execute("SELECT * FROM promotions ORDER BY id DESC").fetchall()
+    # Fetch one extra row to learn whether another page exists without a
+    # separate COUNT(*) over the whole (filtered) table.
+    rows = db.execute(
+        f"SELECT * FROM promotions{where} ORDER BY id DESC LIMIT ?",
+        params + [limit + 1],
+    ).fetchall()
     db.close()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = str(rows[-1]["id"])
     return [dict(r) for r in rows]
 
 
@@ -2,6 +2,9 @@ import httpx
 import os
 import sqlite3
 
+# The image copies mcp-server/mcp_server/tracing.py in (see Dockerfile).
+from mcp_server import tracing
+
 USER_API_URL = os.environ.get("USER_API_URL", "http://user-api:8001")
 DEV_REGISTRY = os.environ.get("DEV_REGISTRY_URL", "http://registry-dev:5000")
 PROD_REGISTRY = os.environ.get("PROD_REGISTRY_URL", "http://registry-prod:5000")
@@ -31,13 +34,20 @@ def init_db():
             promoted_at TEXT NOT NULL DEFAULT (datetime('now'))
         )
     """)
+    # Filter columns for GET /promotions. SQLite secondary indexes carry the
+    # rowid (our `id`) as their trailing key, so each of these also serves
+    # the `ORDER BY id DESC` keyset walk without a separate sort step.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_promotions_image_tag ON promotions (image_name, tag)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_promotions_status ON promotions (status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_promotions_promoted_by ON promotions (promoted_by)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_promotions_promoted_at ON promotions (promoted_at)")
     conn.commit()
     conn.close()
 
 
 async def check_policy(username: str) -> tuple[bool, str]:
     """Verify user exists and has admin role."""
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(transport=tracing.instrument()) as client:
         try:
             resp = await client.get(f"{USER_API_URL}/users/by-username/{username}", timeout=10.0)
             if resp.status_code == 404:
@@ -57,7 +67,7 @@ async def check_policy(username: str) -> tuple[bool, str]:
 
 async def copy_image(image_name: str, tag: str) -> tuple[bool, str, str]:
     """Copy image manifest and blobs from dev to prod registry using Registry v2 API."""
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(transport=tracing.instrument()) as client:
         # Get manifest from dev
         manifest_url = f"{DEV_REGISTRY}/v2/{image_name}/manifests/{tag}"
         headers = {
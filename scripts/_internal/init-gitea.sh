@@ -52,46 +52,268 @@ curl -sf -X POST "$GITEA_URL/api/v1/user/repos" \
 
 echo "  [4/4] Adding app.py and Dockerfile to sample-app..."
 
-# --- app.py ---
+# --- app.py --- (a copy of hello-app/app.py; test_runner_tools checks they match)
 EXISTS=$(curl -sf "$GITEA_URL/api/v1/repos/$ADMIN_USER/sample-app/contents/app.py" \
   -u "$ADMIN_USER:$ADMIN_PASS" 2>/dev/null | jq -r '.name // empty')
 
 if [ -z "$EXISTS" ]; then
   APP_PY_CONTENT=$(cat <<'PYEOF'
-"""Minimal Hello World HTTP server for MCP Lab pipeline demos."""
+"""Minimal Hello World HTTP server for MCP Lab pipeline demos.
 
+Threaded and HTTP/1.1 with keep-alive, so one slow client doesn't hold up
+the rest and load generators can reuse connections; every response is
+encoded once at startup and sent with a single write. HELLO_WORKERS > 1
+forks that many server processes, each listening on the same port with
+SO_REUSEPORT so the kernel spreads connections across them.
+
+GET /metrics reports request counts, requests in flight and latency
+histograms per path in the Prometheus text format. Handler threads never
+share a counter: each connection checks a Shard out of a free list while
+it is open and updates only that, and /metrics adds the shards up, so
+counting takes no lock. With several workers a scrape lands on any one of
+them, so each worker also publishes its totals once a second to its slot
+in a memory map shared by the fork, and /metrics reports every worker's
+series (worker="N"): its own live, the others' as last published.
+
+Environment: HELLO_PORT (default 8080), HELLO_WORKERS (default 1).
+"""
+
+import bisect
+import collections
 import json
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import mmap
+import os
+import signal
+import socket
+import struct
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 
 VERSION = "1.0.0"
+PORT = int(os.environ.get("HELLO_PORT", "8080"))
+WORKERS = max(1, int(os.environ.get("HELLO_WORKERS", "1")))
+
+
+def _response(status: str, body: bytes) -> tuple[bytes, bytes]:
+    """The full response, as (keep-alive, closing) variants."""
+    head = (
+        f"HTTP/1.1 {status}\r\n"
+        f"Server: hello-app/{VERSION}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+    )
+    return (head + "\r\n").encode() + body, (head + "Connection: close\r\n\r\n").encode() + body
+
+
+ROUTES = {
+    "/health": _response("200 OK", json.dumps({"status": "ok"}).encode()),
+    "/": _response("200 OK", json.dumps({"message": "Hello from MCP Lab!", "version": VERSION}).encode()),
+}
+NOT_FOUND = _response("404 Not Found", b"")
+
+# Histogram upper bounds, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+worker = 0
+
+# Workers' published totals: one SLOT_SIZE slot each, a (sequence, length)
+# header then JSON. An odd sequence means a write is under way.
+SLOT_SIZE = 64 * 1024
+SLOT_HEADER = struct.Struct("<QI")
+PUBLISH_INTERVAL = 1.0
+shared = None
+
+
+class Shard:
+    """One connection's counters at a time; only its thread writes them."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = collections.Counter()  # (path, code) -> count
+        self.latency = {}  # path -> [count per bucket (last is +Inf), sum]
+
+    def observe(self, path, code, seconds):
+        self.requests[path, code] += 1
+        hist = self.latency.get(path)
+        if hist is None:
+            hist = self.latency[path] = [[0] * (len(BUCKETS) + 1), 0.0]
+        hist[0][bisect.bisect_left(BUCKETS, seconds)] += 1
+        hist[1] += seconds
+
+
+SHARDS = []  # every shard ever made; only grows to the peak connection count
+FREE = collections.deque()  # append/pop are atomic
+
+
+def checkout():
+    try:
+        return FREE.pop()
+    except IndexError:
+        shard = Shard()
+        SHARDS.append(shard)
+        return shard
+
+
+def totals():
+    """This process's counters, added up across shards."""
+    requests = collections.Counter()
+    latency = {}
+    in_flight = 0
+    for shard in list(SHARDS):
+        in_flight += shard.in_flight
+        requests.update(dict(shard.requests))  # a C-level copy: safe while it is written
+        for path, (counts, total) in list(shard.latency.items()):
+            acc = latency.setdefault(path, [[0] * (len(BUCKETS) + 1), 0.0])
+            acc[0] = [a + b for a, b in zip(acc[0], counts)]
+            acc[1] += total
+    return {"in_flight": in_flight, "requests": [[p, c, n] for (p, c), n in requests.items()], "latency": latency}
+
+
+def publish_loop():
+    seq = 0
+    offset = worker * SLOT_SIZE
+    while True:
+        data = json.dumps(totals()).encode()[:SLOT_SIZE - SLOT_HEADER.size]
+        SLOT_HEADER.pack_into(shared, offset, seq + 1, 0)
+        shared[offset + SLOT_HEADER.size:offset + SLOT_HEADER.size + len(data)] = data
+        seq += 2
+        SLOT_HEADER.pack_into(shared, offset, seq, len(data))
+        time.sleep(PUBLISH_INTERVAL)
+
+
+def published(i):
+    """Worker i's last published totals, or None before its first."""
+    offset = i * SLOT_SIZE
+    for _ in range(10):
+        seq, size = SLOT_HEADER.unpack_from(shared, offset)
+        if seq == 0:
+            return None
+        if seq % 2 == 0:
+            data = shared[offset + SLOT_HEADER.size:offset + SLOT_HEADER.size + size]
+            if SLOT_HEADER.unpack_from(shared, offset)[0] == seq:
+                return json.loads(data)
+        time.sleep(0.001)
+    return None
+
+
+def render_metrics():
+    per_worker = {worker: totals()}
+    if shared is not None:
+        for i in range(WORKERS):
+            if i != worker and (t := published(i)) is not None:
+                per_worker[i] = t
+
+    requests = []
+    in_flight = []
+    latency = []
+    for i, t in sorted(per_worker.items()):
+        w = f'worker="{i}"'
+        for path, code, n in sorted(t["requests"]):
+            requests.append(f'hello_app_requests_total{{{w},path="{path}",code="{code}"}} {n}')
+        in_flight.append(f"hello_app_requests_in_flight{{{w}}} {t['in_flight']}")
+        for path, (counts, total) in sorted(t["latency"].items()):
+            running = 0
+            for le, n in zip((*map(str, BUCKETS), "+Inf"), counts):
+                running += n
+                latency.append(f'hello_app_request_duration_seconds_bucket{{{w},path="{path}",le="{le}"}} {running}')
+            latency.append(f'hello_app_request_duration_seconds_sum{{{w},path="{path}"}} {total:.6f}')
+            latency.append(f'hello_app_request_duration_seconds_count{{{w},path="{path}"}} {running}')
+    lines = [
+        "# HELP hello_app_requests_total HTTP requests served.",
+        "# TYPE hello_app_requests_total counter",
+        *requests,
+        "# HELP hello_app_requests_in_flight Requests being served right now.",
+        "# TYPE hello_app_requests_in_flight gauge",
+        *in_flight,
+        "# HELP hello_app_request_duration_seconds Time to serve a request.",
+        "# TYPE hello_app_request_duration_seconds histogram",
+        *latency,
+    ]
+    return ("\n".join(lines) + "\n").encode()
 
 
 class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.shard = checkout()
+
+    def finish(self):
+        FREE.append(self.shard)
+        super().finish()
+
     def do_GET(self):
-        if self.path == "/health":
-            body = {"status": "ok"}
-        elif self.path == "/":
-            body = {"message": "Hello from MCP Lab!", "version": VERSION}
-        else:
-            self.send_response(404)
-            self.end_headers()
-            return
-
-        payload = json.dumps(body).encode()
-        self.send_response(200)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Content-Length", str(len(payload)))
-        self.end_headers()
-        self.wfile.write(payload)
+        start = time.perf_counter()
+        self.shard.in_flight += 1
+        try:
+            if self.path == "/metrics":
+                path, code = "/metrics", "200"
+                body = render_metrics()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            else:
+                path, code = (self.path, "200") if self.path in ROUTES else ("other", "404")
+                keep_alive, closing = ROUTES.get(self.path, NOT_FOUND)
+                self.wfile.write(closing if self.close_connection else keep_alive)
+        finally:
+            self.shard.in_flight -= 1
+            self.shard.observe(path, code, time.perf_counter() - start)
 
+    # Suppress per-request log lines
     def log_message(self, format, *args):
         pass
 
 
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if WORKERS > 1:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+
+def serve():
+    Server(("0.0.0.0", PORT), Handler).serve_forever()
+
+
+def serve_workers():
+    global worker, shared
+    shared = mmap.mmap(-1, SLOT_SIZE * WORKERS)  # anonymous and shared: every fork sees it
+    children = []
+    for i in range(WORKERS):
+        pid = os.fork()
+        if pid == 0:
+            worker = i
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            threading.Thread(target=publish_loop, daemon=True).start()
+            try:
+                serve()
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    # As PID 1 in the container we get the stop signal; pass it on.
+    def stop(signum, frame):
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for pid in children:
+        os.waitpid(pid, 0)
+
+
 if __name__ == "__main__":
-    server = HTTPServer(("0.0.0.0", 8080), Handler)
-    print(f"hello-app v{VERSION} listening on :8080")
-    server.serve_forever()
+    print(f"hello-app v{VERSION} listening on :{PORT} ({WORKERS} worker{'s' if WORKERS > 1 else ''})", flush=True)
+    if WORKERS > 1:
+        serve_workers()
+    else:
+        serve()
 PYEOF
   )
   APP_PY_B64=$(printf '%s' "$APP_PY_CONTENT" | base64 | tr -d '\n')